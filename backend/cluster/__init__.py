@@ -0,0 +1,30 @@
+"""
+Cluster Module
+
+Lets several server workers share one deployment:
+
+- Events: a Socket.IO client manager (MESSAGE_BUS_URL) relays every room
+  broadcast to the clients connected to the other workers.
+- State: a StateBackend (STATE_BACKEND_URL) holds each project's roster and
+  host so joins, leaves and host handover agree across workers.
+- Leases: every worker heartbeats into the state backend (WorkerHeartbeat),
+  so roster entries left behind by a crashed or restarted worker are pruned.
+
+Documents, files and terminals stay in the worker that serves a project, so
+the load balancer must pin a project to one worker: hash on the `project`
+query parameter (or a cookie set from it) and keep Socket.IO's long-polling
+requests on the same worker as the rest of that connection.
+"""
+from .bus import FileBusManager, create_client_manager
+from .state import StateBackend, MemoryStateBackend, FileStateBackend, create_state_backend
+from .workers import WorkerHeartbeat
+
+__all__ = [
+    'FileBusManager',
+    'create_client_manager',
+    'StateBackend',
+    'MemoryStateBackend',
+    'FileStateBackend',
+    'create_state_backend',
+    'WorkerHeartbeat'
+]
@@ -0,0 +1,144 @@
+"""
+Message Bus - Socket.IO client managers that fan events out across workers
+"""
+import asyncio
+import fcntl
+import json
+import os
+from typing import Optional
+import logging
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+logger = logging.getLogger(__name__)
+
+
+class FileBusManager(AsyncPubSubManager):
+    """
+    Pub/sub client manager backed by an append-only file on local disk.
+
+    Every worker appends the messages it publishes to the same file and tails
+    it for messages from the others. It needs no broker, which makes it a
+    convenient stand-in for Redis when running several workers on one host or
+    in tests. The file is rotated once it grows past `max_bytes`.
+
+    Appending takes a blocking file lock, so it runs in a worker thread;
+    publishes are appended one at a time in the order they were made.
+    """
+    name = 'filebus'
+
+    def __init__(
+        self,
+        path: str,
+        channel: str = 'socketio',
+        write_only: bool = False,
+        logger=None,
+        poll_interval: float = 0.01,
+        max_bytes: int = 16 * 1024 * 1024
+    ):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._publishing = asyncio.Lock()
+
+    async def _publish(self, data):
+        line = json.dumps({'channel': self.channel, 'message': data}, separators=(',', ':'))
+        async with self._publishing:
+            await asyncio.to_thread(self._append, (line + '\n').encode('utf-8'))
+
+    def _append(self, line: bytes):
+        """Append one message under an exclusive lock, rotating the file if it got too big"""
+        while True:
+            with open(self.path, 'ab') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # Another writer may have rotated the file while we waited for the lock
+                    if not self._is_current(f):
+                        continue
+                    f.write(line)
+                    f.flush()
+                    if f.tell() >= self.max_bytes:
+                        os.replace(self.path, self.path + '.1')
+                    return
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _is_current(self, f) -> bool:
+        try:
+            return os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return False
+
+    async def _listen(self):
+        open(self.path, 'ab').close()
+        f = open(self.path, 'rb')
+        f.seek(0, os.SEEK_END)
+        buffer = b''
+        try:
+            while True:
+                rotated = not self._is_current(f)
+                chunk = f.read()
+                if chunk:
+                    buffer += chunk
+                    *lines, buffer = buffer.split(b'\n')
+                    for line in lines:
+                        message = self._decode(line)
+                        if message is not None:
+                            yield message
+
+                if rotated:
+                    # The old file was drained above, continue with the new one
+                    f.close()
+                    open(self.path, 'ab').close()
+                    f = open(self.path, 'rb')
+                    buffer = b''
+                elif not chunk:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            f.close()
+
+    def _decode(self, line: bytes) -> Optional[dict]:
+        try:
+            envelope = json.loads(line)
+        except ValueError:
+            return None
+        if envelope.get('channel') != self.channel:
+            return None
+        return envelope.get('message')
+
+
+def create_client_manager(url: Optional[str] = None, local_manager_class: Optional[type] = None):
+    """
+    Build the Socket.IO client manager for a message bus URL
+
+    Supported URLs:
+        memory:// (or empty)   single process, no bus
+        file:///path/bus.log   FileBusManager shared by workers on one host
+        redis://host:port/db   python-socketio's Redis manager
+
+    Args:
+        url: Message bus URL
+        local_manager_class: Optional AsyncManager subclass that delivers to this
+            worker's clients; bus managers are combined with it
+
+    Returns:
+        A client manager, or None for python-socketio's in-process default
+    """
+    if not url or url.startswith('memory://'):
+        return local_manager_class() if local_manager_class else None
+    if url.startswith('file://'):
+        return _with_local(FileBusManager, local_manager_class)(url[len('file://'):])
+    if url.startswith(('redis://', 'rediss://')):
+        return _with_local(socketio.AsyncRedisManager, local_manager_class)(url)
+    raise ValueError(f"Unsupported message bus URL: {url}")
+
+
+def _with_local(manager_class: type, local_manager_class: Optional[type]) -> type:
+    """Slot local_manager_class under the bus so relayed messages are delivered through it"""
+    if local_manager_class is None:
+        return manager_class
+    return type(manager_class.__name__, (manager_class, local_manager_class), {})
@@ -0,0 +1,143 @@
+"""
+State Backends - Key/value stores for session state shared between workers
+"""
+import asyncio
+import fcntl
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import quote
+import copy
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StateBackend(ABC):
+    """Abstract key/value store holding JSON-serializable session state"""
+
+    @abstractmethod
+    async def get(self, key: str, default: Any = None) -> Any:
+        """Read a value"""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any):
+        """Write a value"""
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Remove a value"""
+        pass
+
+    @abstractmethod
+    async def update(self, key: str, fn: Callable[[Any], Any], default: Any = None) -> Any:
+        """
+        Atomically replace a value with fn(current) and return the new value.
+
+        `fn` receives a private copy of the current value (or `default`) and
+        must not await.
+        """
+        pass
+
+
+class MemoryStateBackend(StateBackend):
+    """State held in this process only; the default for single-worker deployments"""
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.data:
+            return copy.deepcopy(default)
+        return copy.deepcopy(self.data[key])
+
+    async def set(self, key: str, value: Any):
+        self.data[key] = copy.deepcopy(value)
+
+    async def delete(self, key: str):
+        self.data.pop(key, None)
+
+    async def update(self, key: str, fn: Callable[[Any], Any], default: Any = None) -> Any:
+        # fn never awaits, so the read-modify-write cannot interleave with another task
+        current = copy.deepcopy(self.data.get(key, default))
+        self.data[key] = fn(current)
+        return copy.deepcopy(self.data[key])
+
+
+class FileStateBackend(StateBackend):
+    """
+    State stored as one JSON file per key in a shared directory.
+
+    Updates take an exclusive flock on a per-key lock file, so workers on the
+    same host (or sharing a filesystem with working locks) see a consistent
+    view without running a separate service.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return await asyncio.to_thread(self._read, key, default)
+
+    async def set(self, key: str, value: Any):
+        await asyncio.to_thread(self._locked, key, lambda _: value, None)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+    async def update(self, key: str, fn: Callable[[Any], Any], default: Any = None) -> Any:
+        return await asyncio.to_thread(self._locked, key, fn, default)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, quote(key, safe='') + '.json')
+
+    def _read(self, key: str, default: Any) -> Any:
+        try:
+            with open(self._path(key), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return copy.deepcopy(default)
+
+    def _locked(self, key: str, fn: Callable[[Any], Any], default: Any) -> Any:
+        path = self._path(key)
+        with open(path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                value = fn(self._read(key, default))
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(value, f)
+                os.replace(tmp_path, path)
+                return value
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _delete(self, key: str):
+        path = self._path(key)
+        with open(path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def create_state_backend(url: Optional[str] = None) -> StateBackend:
+    """
+    Build the state backend for a URL
+
+    Supported URLs:
+        memory:// (or empty)   MemoryStateBackend
+        file:///path/to/dir    FileStateBackend
+    """
+    if not url or url.startswith('memory://'):
+        return MemoryStateBackend()
+    if url.startswith('file://'):
+        return FileStateBackend(url[len('file://'):])
+    raise ValueError(f"Unsupported state backend URL: {url}")
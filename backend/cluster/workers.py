@@ -0,0 +1,82 @@
+"""
+Worker Heartbeats - Leases that tell which workers sharing a state backend
+are still alive
+"""
+import asyncio
+import time
+import uuid
+from typing import Optional, Set
+import logging
+
+from .state import StateBackend
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerHeartbeat:
+    """
+    Advertises this worker in the `workers` key of the state backend and
+    reports which workers are alive.
+
+    Every `interval` seconds the worker stores the current time under its
+    id, which is new on every start. A worker not heard from for `ttl`
+    seconds (it crashed, or it was restarted and came back under another id)
+    is dead: the collaborators it registered can be dropped from rosters.
+    A worker shutting down cleanly removes itself right away.
+    """
+
+    KEY = 'workers'
+
+    def __init__(self, state: StateBackend, interval: float = 10.0, ttl: float = 30.0):
+        self.state = state
+        self.worker_id = uuid.uuid4().hex
+        self.interval = interval
+        self.ttl = max(ttl, interval * 2)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Announce this worker, then keep its lease fresh"""
+        await self.beat()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop beating and give up the lease"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        def leave(workers):
+            workers.pop(self.worker_id, None)
+            return workers
+
+        await self.state.update(self.KEY, leave, {})
+
+    async def beat(self):
+        """Renew this worker's lease and forget workers whose lease ran out"""
+        now = time.time()
+
+        def renew(workers):
+            workers = {worker: seen for worker, seen in workers.items() if seen > now - self.ttl}
+            workers[self.worker_id] = now
+            return workers
+
+        await self.state.update(self.KEY, renew, {})
+
+    async def live(self) -> Set[str]:
+        """Ids of the workers whose lease is current, this one included"""
+        cutoff = time.time() - self.ttl
+        workers = await self.state.get(self.KEY, {})
+        return {worker for worker, seen in workers.items() if seen > cutoff} | {self.worker_id}
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.beat()
+            except Exception as e:
+                logger.error(f"Worker heartbeat failed: {e}")
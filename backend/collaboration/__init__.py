@@ -0,0 +1,34 @@
+"""
+Collaboration Module
+"""
+from .activity import ActivityBatcher, ActivityLog, SQLiteActivitySpill
+from .batching import Batcher
+from .chat import ChatHistory, SQLiteChatStore
+from .document import Document, LineOperation, StaleRevisionError
+from .document_store import DocumentStore
+from .env_sync import EnvSyncDetector
+from .presence import PresenceAggregator
+from .session import SessionLimitError, SessionState, SessionRegistry
+from .snapshot import WorkspaceSnapshotter
+from .suggestions import Suggestion, SuggestionStore
+
+__all__ = [
+    'ActivityBatcher',
+    'ActivityLog',
+    'Batcher',
+    'ChatHistory',
+    'Document',
+    'DocumentStore',
+    'EnvSyncDetector',
+    'LineOperation',
+    'PresenceAggregator',
+    'SessionLimitError',
+    'SessionRegistry',
+    'SessionState',
+    'SQLiteActivitySpill',
+    'SQLiteChatStore',
+    'StaleRevisionError',
+    'Suggestion',
+    'SuggestionStore',
+    'WorkspaceSnapshotter'
+]
@@ -0,0 +1,217 @@
+"""
+Activity Log - Fixed-capacity project timeline with cursor pagination and an
+optional SQLite spill for entries that fall out of memory
+"""
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import json
+import logging
+
+from .batching import Batcher
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteActivitySpill:
+    """
+    Keeps activity entries evicted from memory in the `activity_logs` table.
+
+    Uses the shared Database from database/db.py; entries are keyed by project
+    and sequence number so pages can be read back with a simple range scan.
+    Every method blocks; ActivityLog calls them from a worker thread.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def last_seq(self, project_id: str) -> int:
+        """Highest sequence number stored for a project, or 0"""
+        with self.database.lock:
+            row = self.database.get_connection().execute(
+                "SELECT MAX(seq) FROM activity_logs WHERE project_id = ?",
+                (project_id,)
+            ).fetchone()
+        return row[0] or 0
+
+    def write(self, project_id: str, entries: List[Dict[str, Any]]):
+        with self.database.lock:
+            conn = self.database.get_connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO activity_logs (project_id, seq, entry) VALUES (?, ?, ?)",
+                [(project_id, entry['seq'], json.dumps(entry)) for entry in entries]
+            )
+            conn.commit()
+
+    def read_before(self, project_id: str, before: int, limit: int) -> List[Dict[str, Any]]:
+        """Up to `limit` entries with seq < before, oldest first"""
+        with self.database.lock:
+            rows = self.database.get_connection().execute(
+                "SELECT entry FROM activity_logs WHERE project_id = ? AND seq < ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (project_id, before, limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+
+class ActivityLog:
+    """
+    Ring buffer of the most recent activity entries for one project.
+
+    Every entry gets a monotonically increasing `seq`, which doubles as the
+    pagination cursor: a page holds the newest entries older than the cursor.
+    When the buffer is full the oldest entry is dropped, or handed to the
+    spill so older pages stay reachable; evicted entries are written to the
+    spill in batches by flush_spill().
+
+    With a spill, the sequence counter continues from the highest one stored.
+    It is read in a worker thread by load(), which must be awaited before
+    the first entry is appended; page() and flush_spill() also run their
+    spill I/O in a worker thread.
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        capacity: int = 500,
+        page_size: int = 50,
+        spill: Optional[SQLiteActivitySpill] = None
+    ):
+        self.project_id = project_id
+        self.page_size = max(1, page_size)
+        self.spill = spill
+        self.entries: deque = deque(maxlen=max(1, capacity))
+        self.seq = 0
+        # Evicted entries waiting to be written to the spill in one go
+        self.evicted: List[Dict[str, Any]] = []
+        self._loading: Optional[asyncio.Future] = None
+
+    async def load(self):
+        """Continue the sequence from the spill; only the first call reads it"""
+        if self.spill is None:
+            return
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+        try:
+            await asyncio.shield(self._loading)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Nothing was loaded; the next caller tries again
+            if self._loading.done():
+                self._loading = None
+            raise
+
+    def append(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Add an entry, assigning its sequence number"""
+        self.seq += 1
+        entry['seq'] = self.seq
+        if len(self.entries) == self.entries.maxlen and self.spill:
+            self.evicted.append(self.entries[0])
+        self.entries.append(entry)
+        return entry
+
+    async def flush_spill(self):
+        """Write evicted entries to the spill in a single batch in a worker thread"""
+        if not self.evicted:
+            return
+        evicted, self.evicted = self.evicted, []
+        try:
+            await asyncio.to_thread(self.spill.write, self.project_id, evicted)
+        except Exception as e:
+            logger.error(f"Activity spill error for {self.project_id}: {e}")
+
+    async def page(self, before: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Get the newest entries older than a cursor
+
+        Args:
+            before: Cursor from a previous page; None for the latest page
+            limit: Page size, capped at the configured page size
+
+        Returns:
+            {'logs': [...oldest first], 'cursor': next cursor, 'hasMore': bool}
+        """
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"Activity spill read error for {self.project_id}: {e}")
+        limit = min(max(1, limit or self.page_size), self.page_size)
+        before = self.seq + 1 if before is None else before
+
+        logs = [entry for entry in self.entries if entry['seq'] < before][-limit:]
+        if len(logs) < limit and self.spill:
+            await self.flush_spill()
+            oldest_in_memory = self.entries[0]['seq'] if self.entries else before
+            spill_before = min(before, oldest_in_memory)
+            try:
+                logs = await asyncio.to_thread(
+                    self.spill.read_before, self.project_id, spill_before, limit - len(logs)
+                ) + logs
+            except Exception as e:
+                logger.error(f"Activity spill read error for {self.project_id}: {e}")
+
+        cursor = logs[0]['seq'] if logs else None
+        return {
+            'logs': logs,
+            'cursor': cursor,
+            'hasMore': bool(cursor and cursor > self._first_seq())
+        }
+
+    async def _load(self):
+        last_seq = await asyncio.to_thread(self.spill.last_seq, self.project_id)
+        self.seq = max(self.seq, last_seq)
+
+    def _first_seq(self) -> int:
+        """Sequence number of the oldest entry still reachable"""
+        if self.spill:
+            return 1
+        return self.entries[0]['seq'] if self.entries else self.seq + 1
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class ActivityBatcher(Batcher):
+    """
+    Buffers new activity entries and broadcasts them as one `activity_batch`
+    per room per window instead of one event per entry.
+
+    Entries are appended to their project's ActivityLog as soon as they are
+    added, so sequence numbers follow call order and every batch lists its
+    entries in that order; batches are flushed one after another, so clients
+    see each user's actions in the order they happened. Each flush also writes
+    the entries evicted since the last one to the spill in a single insert.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[Dict[str, Any], str], Awaitable[Any]],
+        window: float = 0.25
+    ):
+        """
+        Args:
+            emit: Coroutine called as emit(batch, room) for every room with new entries
+            window: Seconds entries are buffered before they are broadcast
+        """
+        super().__init__(window)
+        self.emit = emit
+        # room -> (activity log, entries not broadcast yet)
+        self.pending: Dict[str, Tuple[ActivityLog, List[Dict[str, Any]]]] = {}
+
+    def add(self, log: ActivityLog, room: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Record an entry now and queue it for the room's next batch"""
+        entry = log.append(entry)
+        self.pending.setdefault(room, (log, []))[1].append(entry)
+        self.schedule()
+        return entry
+
+    async def flush(self):
+        """Broadcast and persist everything pending"""
+        pending, self.pending = self.pending, {}
+        for room, (log, entries) in pending.items():
+            await log.flush_spill()
+            try:
+                await self.emit({'logs': entries}, room)
+            except Exception as e:
+                logger.error(f"Activity flush error for room {room}: {e}")
@@ -0,0 +1,57 @@
+"""
+Batching - Shared flush loop for components that buffer updates and hand
+them over in one batch per window
+"""
+import asyncio
+from typing import Optional
+
+
+class Batcher:
+    """
+    Base class for buffers drained on a fixed window.
+
+    Subclasses keep their queued work in `pending` (any container that is
+    falsy when empty), implement flush() to hand all of it over, and call
+    schedule() after queueing something. The flush loop only runs while
+    there is something pending: it is started by schedule() and exits after
+    the first flush that leaves nothing behind. stop() cancels it and
+    flushes whatever is still queued.
+    """
+
+    def __init__(self, window: float):
+        """
+        Args:
+            window: Seconds work is buffered before it is flushed
+        """
+        self.window = window
+        self._task: Optional[asyncio.Task] = None
+
+    async def flush(self):
+        """Hand over everything pending"""
+        raise NotImplementedError
+
+    def schedule(self):
+        """
+        Make sure the flush loop is running
+
+        Raises:
+            RuntimeError: If called without a running event loop
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Cancel the flush loop and flush whatever is still pending"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while self.pending:
+            await asyncio.sleep(self.window)
+            await self.flush()
@@ -0,0 +1,226 @@
+"""
+Chat History - Per-project chat kept as a bounded in-memory tail backed by a
+batched SQLite store, paged by timestamp
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from .batching import Batcher
+
+logger = logging.getLogger(__name__)
+
+# Fields of a client's chat_message that are kept with the message
+MESSAGE_FIELDS = ('userId', 'userName', 'userColor', 'userAvatar', 'message')
+
+
+def message_key(message: Dict[str, Any]) -> Tuple[int, int]:
+    """Sort and pagination key: timestamp, then id for messages sent in the same millisecond"""
+    return (message['timestamp'], message['id'])
+
+
+class SQLiteChatStore(Batcher):
+    """
+    Stores chat messages of every project in the `chat_messages` table.
+
+    Uses the shared Database from database/db.py. New messages are buffered
+    and written with one insert and commit every `window` seconds, so a busy
+    room costs one transaction per window instead of one per message. Reads
+    walk the (project, timestamp, id) index; callers flush() the buffer first.
+
+    Writes queued from the event loop run in a worker thread; last_id() and
+    read_before() block and are meant to be called from one as well.
+    """
+
+    def __init__(self, database, window: float = 0.5):
+        super().__init__(window)
+        self.database = database
+        self.pending: List[Tuple[str, Dict[str, Any]]] = []
+        # Held while a batch is written, so a flush() also waits for a batch
+        # the write loop already took
+        self._writing = asyncio.Lock()
+
+    def last_id(self, project_id: str) -> int:
+        """Highest message id stored for a project, or 0"""
+        with self.database.lock:
+            row = self.database.get_connection().execute(
+                "SELECT MAX(id) FROM chat_messages WHERE project_id = ?",
+                (project_id,)
+            ).fetchone()
+        return row[0] or 0
+
+    def add(self, project_id: str, message: Dict[str, Any]):
+        """Queue a message for the next batched write"""
+        self.pending.append((project_id, message))
+        try:
+            self.schedule()
+        except RuntimeError:
+            # No running loop (e.g. scripts); write straight away
+            pending, self.pending = self.pending, []
+            self._write(pending)
+
+    async def flush(self):
+        """Write every queued message in a single transaction in a worker thread"""
+        async with self._writing:
+            pending, self.pending = self.pending, []
+            if pending:
+                await asyncio.to_thread(self._write, pending)
+
+    def read_before(
+        self,
+        project_id: str,
+        before: Optional[Tuple[int, int]],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Up to `limit` messages keyed before `before` (None for the newest), oldest first"""
+        if before is None:
+            query = "SELECT payload FROM chat_messages WHERE project_id = ? "
+            params: tuple = (project_id,)
+        else:
+            query = (
+                "SELECT payload FROM chat_messages WHERE project_id = ? "
+                "AND (timestamp < ? OR (timestamp = ? AND id < ?)) "
+            )
+            params = (project_id, before[0], before[0], before[1])
+        with self.database.lock:
+            rows = self.database.get_connection().execute(
+                query + "ORDER BY timestamp DESC, id DESC LIMIT ?",
+                params + (limit,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def _write(self, pending: List[Tuple[str, Dict[str, Any]]]):
+        if not pending:
+            return
+        try:
+            with self.database.lock:
+                conn = self.database.get_connection()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO chat_messages (project_id, id, timestamp, payload) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(project_id, m['id'], m['timestamp'], json.dumps(m)) for project_id, m in pending]
+                )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Chat history write error: {e}")
+
+
+class ChatHistory:
+    """
+    Chat of one project.
+
+    The newest `capacity` messages stay in memory, so sending and the first
+    page a joining client gets never touch the database; with a store,
+    every message is also persisted and older pages are read from it.
+
+    Messages get a per-project `id` and a server `timestamp` (ms). Pages are
+    keyset-paginated: a page holds the newest messages before a cursor of
+    the oldest message's timestamp and id, so paging stays correct while new
+    messages arrive.
+
+    The id counter and the newest messages are read from the store on first
+    use rather than on construction, and every store access runs in a worker
+    thread.
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        capacity: int = 200,
+        page_size: int = 50,
+        store: Optional[SQLiteChatStore] = None
+    ):
+        self.project_id = project_id
+        self.page_size = max(1, page_size)
+        self.store = store
+        self.messages: deque = deque(maxlen=max(1, capacity))
+        self.last_id = 0
+        self._loading: Optional[asyncio.Future] = None
+
+    async def load(self):
+        """Read the id counter and newest messages from the store; only the first call does"""
+        if self.store is None:
+            return
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+        try:
+            await asyncio.shield(self._loading)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Nothing was loaded; the next caller tries again
+            if self._loading.done():
+                self._loading = None
+            raise
+
+    async def append(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a message sent by a client and return it as broadcast"""
+        await self.load()
+        self.last_id += 1
+        message = {field: data.get(field) for field in MESSAGE_FIELDS}
+        message['id'] = self.last_id
+        message['timestamp'] = int(time.time() * 1000)
+        self.messages.append(message)
+        if self.store:
+            self.store.add(self.project_id, message)
+        return message
+
+    async def page(
+        self,
+        before: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Get the newest messages older than a cursor
+
+        Args:
+            before: Timestamp of the cursor; None for the latest page
+            before_id: Id of the cursor message; None for every message
+                strictly older than `before`
+            limit: Page size, capped at the configured page size
+
+        Returns:
+            {'messages': [...oldest first], 'cursor': {'timestamp', 'id'} or
+            None, 'hasMore': bool}
+        """
+        await self.load()
+        limit = min(max(1, limit or self.page_size), self.page_size)
+        key = None if before is None else (before, before_id if before_id is not None else 0)
+
+        # One extra message tells whether another page exists
+        older = [m for m in self.messages if key is None or message_key(m) < key]
+        messages = older[-(limit + 1):]
+        if len(messages) <= limit and self.store:
+            # Everything in memory before the cursor is already in the page;
+            # continue in the store from the oldest of it
+            boundary = message_key(messages[0]) if messages else key
+            try:
+                await self.store.flush()
+                messages = await asyncio.to_thread(
+                    self.store.read_before, self.project_id, boundary, limit + 1 - len(messages)
+                ) + messages
+            except Exception as e:
+                logger.error(f"Chat history read error for {self.project_id}: {e}")
+
+        has_more = len(messages) > limit
+        messages = messages[-limit:]
+        cursor = {'timestamp': messages[0]['timestamp'], 'id': messages[0]['id']} if messages else None
+        return {'messages': messages, 'cursor': cursor, 'hasMore': has_more}
+
+    async def _load(self):
+        def read():
+            return (
+                self.store.last_id(self.project_id),
+                self.store.read_before(self.project_id, None, self.messages.maxlen)
+            )
+
+        last_id, messages = await asyncio.to_thread(read)
+        self.last_id = last_id
+        self.messages.extend(messages)
+
+    def __len__(self) -> int:
+        return len(self.messages)
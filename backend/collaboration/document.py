@@ -0,0 +1,216 @@
+"""
+Collaborative Document - Authoritative server-side document model with
+line-level operational transformation
+"""
+from typing import Dict, List, Optional, Any
+from dataclasses import dataclass, field, replace
+from collections import deque
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StaleRevisionError(Exception):
+    """Raised when an operation is based on a revision the server no longer tracks"""
+    pass
+
+
+@dataclass
+class LineOperation:
+    """
+    A line splice: replace `remove_count` lines starting at `start` with `new_lines`.
+
+    This mirrors the `{start, removeCount, newLines}` delta produced by the editor
+    client, so transformed operations can be fanned out without re-encoding.
+    """
+    start: int
+    remove_count: int
+    new_lines: List[str] = field(default_factory=list)
+    user_id: Optional[str] = None
+    revision: int = 0
+
+    @classmethod
+    def from_delta(cls, delta: Dict[str, Any], user_id: Optional[str] = None) -> 'LineOperation':
+        """Build an operation from a client delta dict"""
+        return cls(
+            start=max(0, int(delta.get('start', 0))),
+            remove_count=max(0, int(delta.get('removeCount', 0))),
+            new_lines=list(delta.get('newLines') or []),
+            user_id=user_id
+        )
+
+    def to_delta(self) -> Dict[str, Any]:
+        """Serialize to the client delta format"""
+        return {
+            'type': 'delta',
+            'start': self.start,
+            'removeCount': self.remove_count,
+            'newLines': self.new_lines
+        }
+
+    @property
+    def is_noop(self) -> bool:
+        return self.remove_count == 0 and not self.new_lines
+
+
+def transform(op: LineOperation, applied: LineOperation) -> LineOperation:
+    """
+    Transform `op` so it applies on top of `applied`, where both were generated
+    against the same document revision.
+
+    Non-overlapping edits are shifted. When both edits touch the same lines, the
+    incoming operation replaces the region `applied` produced, so the later
+    writer wins only on the contested lines and every replica converges.
+    """
+    a_start, a_end = applied.start, applied.start + applied.remove_count
+    b_start, b_end = op.start, op.start + op.remove_count
+    shift = len(applied.new_lines) - applied.remove_count
+
+    # Concurrent inserts at the same line: the applied one goes first
+    if op.remove_count == 0 and applied.remove_count == 0 and b_start == a_start:
+        return replace(op, start=b_start + len(applied.new_lines))
+
+    # Entirely before the applied region
+    if b_end <= a_start:
+        return replace(op)
+
+    # Entirely after the applied region
+    if b_start >= a_end:
+        return replace(op, start=b_start + shift)
+
+    # Overlapping edits
+    new_start = min(b_start, a_start)
+    if b_end <= a_end:
+        new_end = a_start + len(applied.new_lines)
+    else:
+        new_end = b_end + shift
+    return replace(op, start=new_start, remove_count=new_end - new_start)
+
+
+def transform_remote(applied: LineOperation, pending: LineOperation) -> LineOperation:
+    """
+    Transform `applied`, an operation the server committed first, so it applies
+    on top of `pending`, a concurrent operation a client has applied locally
+    but the server has not seen yet.
+
+    This is the other half of transform(): the server turns `pending` into
+    transform(pending, applied), and a client holding `pending` applies the
+    result of this function, so both end up with the same lines. The editor
+    client mirrors it to rebase incoming updates past its unacknowledged edits.
+    """
+    a_start, a_end = applied.start, applied.start + applied.remove_count
+    b_start, b_end = pending.start, pending.start + pending.remove_count
+    shift = len(pending.new_lines) - pending.remove_count
+
+    # Concurrent inserts at the same line: the applied one goes first
+    if pending.remove_count == 0 and applied.remove_count == 0 and b_start == a_start:
+        return replace(applied)
+
+    # The pending edit is entirely before the applied region
+    if b_end <= a_start:
+        return replace(applied, start=a_start + shift)
+
+    # The pending edit is entirely after the applied region
+    if b_start >= a_end:
+        return replace(applied)
+
+    # Overlapping edits: the pending edit wins the whole contested region, so
+    # the applied one becomes a rewrite of that region to the pending lines
+    new_start = min(a_start, b_start)
+    removed = (b_start - new_start) + len(pending.new_lines) + (max(a_end, b_end) - b_end)
+    return replace(applied, start=new_start, remove_count=removed, new_lines=list(pending.new_lines))
+
+
+def diff_lines(old_lines: List[str], new_lines: List[str]) -> LineOperation:
+    """Compute the single splice that turns `old_lines` into `new_lines`"""
+    start = 0
+    while start < len(old_lines) and start < len(new_lines) and old_lines[start] == new_lines[start]:
+        start += 1
+
+    old_end = len(old_lines) - 1
+    new_end = len(new_lines) - 1
+    while old_end >= start and new_end >= start and old_lines[old_end] == new_lines[new_end]:
+        old_end -= 1
+        new_end -= 1
+
+    return LineOperation(
+        start=start,
+        remove_count=old_end - start + 1,
+        new_lines=new_lines[start:new_end + 1]
+    )
+
+
+class Document:
+    """
+    A single file held as a list of lines plus a bounded history of applied
+    operations used to transform late-arriving concurrent edits
+    """
+
+    def __init__(self, path: str, content: str = "", max_history: int = 1000):
+        self.path = path
+        self.lines: List[str] = content.split('\n')
+        self.revision = 0
+        self.history: deque = deque(maxlen=max_history)
+        self._content: Optional[str] = content
+
+    @property
+    def content(self) -> str:
+        """Full text of the document (joined lazily)"""
+        if self._content is None:
+            self._content = '\n'.join(self.lines)
+        return self._content
+
+    @property
+    def oldest_revision(self) -> int:
+        """Oldest base revision an incoming operation may still be transformed from"""
+        return self.revision - len(self.history)
+
+    def apply(self, op: LineOperation, base_revision: Optional[int] = None) -> LineOperation:
+        """
+        Transform `op` against everything applied since `base_revision`, apply
+        it and return the transformed operation stamped with its new revision.
+
+        A missing base revision means the client believes it is up to date.
+        """
+        if base_revision is None or base_revision > self.revision:
+            base_revision = self.revision
+        for applied in self.ops_since(base_revision):
+            op = transform(op, applied)
+
+        op = self._clamp(op)
+        if op.is_noop:
+            op.revision = self.revision
+            return op
+
+        # An emptied document stays at zero lines rather than becoming [''];
+        # that extra line would be an edit no other replica ever receives
+        self.lines[op.start:op.start + op.remove_count] = op.new_lines
+        self._content = None
+
+        self.revision += 1
+        op.revision = self.revision
+        self.history.append(op)
+        return op
+
+    def ops_since(self, revision: int) -> List[LineOperation]:
+        """Operations applied after `revision` (which must still be in history)"""
+        if revision < self.oldest_revision:
+            raise StaleRevisionError(
+                f"{self.path}: revision {revision} is older than {self.oldest_revision}"
+            )
+        skip = len(self.history) - (self.revision - revision)
+        return [op for index, op in enumerate(self.history) if index >= skip]
+
+    def replace_content(self, content: str, user_id: Optional[str] = None) -> LineOperation:
+        """Turn a full-content update into a delta against the current head and apply it"""
+        op = diff_lines(self.lines, content.split('\n'))
+        op.user_id = user_id
+        return self.apply(op)
+
+    def _clamp(self, op: LineOperation) -> LineOperation:
+        """Keep an operation inside the document bounds"""
+        start = min(op.start, len(self.lines))
+        remove_count = min(op.remove_count, len(self.lines) - start)
+        if start == op.start and remove_count == op.remove_count:
+            return op
+        return replace(op, start=start, remove_count=remove_count)
@@ -0,0 +1,146 @@
+"""
+Document Store - Authoritative documents backed by the virtual filesystem,
+with periodic snapshots and a bounded op log for late-joiner catch-up
+"""
+from typing import Dict, List, Optional, Any, Tuple
+import logging
+
+from transport.serializer import FileContent
+from .document import Document, LineOperation
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentStore:
+    """
+    Holds the authoritative document for every file being edited.
+
+    Every `snapshot_interval` operations the document content is written back
+    to the virtual filesystem and remembered as the file's snapshot. The op log
+    always covers at least the operations since that snapshot, so any client
+    can catch up with either an op tail or the snapshot plus a short tail.
+
+    Writes made to the filesystem behind the store's back are folded in as
+    ordinary operations and queued until pick_up_outside_writes() hands them
+    over, so clients holding the file can be sent the same edit.
+    """
+
+    def __init__(self, virtual_fs, snapshot_interval: int = 100, max_log: int = 1000):
+        self.virtual_fs = virtual_fs
+        self.snapshot_interval = max(1, snapshot_interval)
+        self.max_log = max(max_log, self.snapshot_interval)
+        self.documents: Dict[str, Document] = {}
+        # path -> (revision, content) of the last snapshot written to the filesystem
+        self.snapshots: Dict[str, tuple] = {}
+        # (path, operation) folded in from outside writes, not yet sent to clients
+        self.outside_writes: List[Tuple[str, LineOperation]] = []
+        # Operations committed to any document, outside writes included
+        self.changes = 0
+
+    def get(self, path: str) -> Document:
+        """Get the document for a file, loading it from the filesystem on first use"""
+        doc = self.documents.get(path)
+        if doc is None:
+            content = self.virtual_fs.files.get(path, '')
+            doc = Document(path, content, max_history=self.max_log)
+            self.documents[path] = doc
+            self.snapshots[path] = (doc.revision, content)
+            return doc
+
+        # Pick up writes made behind the store's back (e.g. npm updating package.json)
+        snapshot_content = self.snapshots[path][1]
+        fs_content = self.virtual_fs.files.get(path)
+        if fs_content is not None and fs_content is not snapshot_content:
+            op = doc.replace_content(fs_content)
+            self.snapshots[path] = (doc.revision, fs_content)
+            if not op.is_noop:
+                self.outside_writes.append((path, op))
+                self.changes += 1
+        return doc
+
+    def apply_delta(
+        self,
+        path: str,
+        delta: Dict[str, Any],
+        base_revision: Optional[int] = None,
+        user_id: Optional[str] = None
+    ) -> Optional[LineOperation]:
+        """
+        Apply a client delta to a file
+
+        Returns:
+            The transformed operation, or None if it had no effect
+        """
+        doc = self.get(path)
+        if delta.get('type') == 'full':
+            op = doc.replace_content(delta.get('content') or '', user_id=user_id)
+        else:
+            op = doc.apply(LineOperation.from_delta(delta, user_id=user_id), base_revision)
+        return self._committed(doc, op)
+
+    def apply_content(self, path: str, content: str, user_id: Optional[str] = None) -> Optional[LineOperation]:
+        """Apply a full-content update by diffing it against the current document"""
+        doc = self.get(path)
+        return self._committed(doc, doc.replace_content(content, user_id=user_id))
+
+    def changes_since(self, path: str, revision: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Everything a client at `revision` needs to reach the current head.
+
+        Returns an op tail when the revision is still covered by the op log,
+        otherwise the last snapshot plus the ops applied after it.
+        """
+        doc = self.get(path)
+        result = {'file': path, 'revision': doc.revision}
+
+        if revision is not None and doc.oldest_revision <= revision <= doc.revision:
+            result['ops'] = self._serialize(doc.ops_since(revision))
+            return result
+
+        snapshot_revision, snapshot_content = self.snapshots[path]
+        result['snapshot'] = {'revision': snapshot_revision, 'content': FileContent(snapshot_content)}
+        result['ops'] = self._serialize(doc.ops_since(snapshot_revision))
+        return result
+
+    def pick_up_outside_writes(self) -> List[Tuple[str, LineOperation]]:
+        """
+        Fold in outside writes to every tracked file
+
+        Returns:
+            The (path, operation) pairs applied for them since the last call,
+            in revision order, for broadcasting
+        """
+        for path in list(self.documents):
+            self.get(path)
+        picked_up, self.outside_writes = self.outside_writes, []
+        return picked_up
+
+    def revisions(self) -> Dict[str, int]:
+        """Current revision of every tracked document"""
+        return {path: doc.revision for path, doc in self.documents.items()}
+
+    def flush(self):
+        """Write every document that changed since its last snapshot to the filesystem"""
+        for path, doc in self.documents.items():
+            if doc.revision != self.snapshots[path][0]:
+                self._snapshot(doc)
+
+    def _committed(self, doc: Document, op: LineOperation) -> Optional[LineOperation]:
+        """Snapshot if due and filter out no-op results"""
+        if op.is_noop:
+            return None
+        self.changes += 1
+        if doc.revision - self.snapshots[doc.path][0] >= self.snapshot_interval:
+            self._snapshot(doc)
+        return op
+
+    def _snapshot(self, doc: Document):
+        """Persist the document content to the filesystem and record it as the snapshot"""
+        content = doc.content
+        self.virtual_fs.files[doc.path] = content
+        self.snapshots[doc.path] = (doc.revision, content)
+        logger.debug(f"Snapshot {doc.path} at revision {doc.revision}")
+
+    @staticmethod
+    def _serialize(ops: List[LineOperation]) -> List[Dict[str, Any]]:
+        return [{'revision': op.revision, 'delta': op.to_delta()} for op in ops]
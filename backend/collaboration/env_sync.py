@@ -0,0 +1,129 @@
+"""
+Env Sync Detector - Debounced detection of dependency changes in manifests
+being edited
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import logging
+
+from package_managers.manifest import ManifestDiff, diff_dependencies, is_env_file, manifest_kind, parse_dependencies
+
+logger = logging.getLogger(__name__)
+
+
+def _normalized(content: str) -> str:
+    return ' '.join((content or '').split())
+
+
+class EnvSyncDetector:
+    """
+    Decides when edits to a manifest call for an environment sync.
+
+    The first edit of a burst records the manifest as it was before (the state
+    everyone last synced to). Once edits have settled for `debounce` seconds the
+    manifest is parsed and its dependency sections compared with that baseline;
+    only an actual dependency difference raises `env_sync_required`, carrying
+    the added, removed and changed packages. Whitespace, formatting or
+    `description` edits never do. Reverting a change withdraws the request with
+    `env_sync_cleared`.
+
+    Manifests that cannot be diffed package by package (lock files, Pipfile,
+    go.mod) are compared on whitespace-normalized content instead.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[str, Dict[str, Any], str], Awaitable[Any]],
+        debounce: float = 1.0
+    ):
+        """
+        Args:
+            emit: Coroutine called as emit(event, payload, room)
+            debounce: Seconds without edits before a manifest is examined
+        """
+        self.emit = emit
+        self.debounce = debounce
+        # (project id, path) -> manifest content at the last sync
+        self.baselines: Dict[Tuple[str, str], str] = {}
+        # (project id, path) -> outstanding dependency diff
+        self.pending: Dict[Tuple[str, str], Optional[ManifestDiff]] = {}
+        self.editors: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def watches(self, path: str) -> bool:
+        return is_env_file(path)
+
+    def touch(self, session, path: str, user_id: str, user_name: str):
+        """
+        Note an edit to a manifest; call before the edit is applied so the
+        baseline is the content everyone already had
+        """
+        key = (session.project_id, path)
+        if key not in self.baselines:
+            self.baselines[key] = session.documents.get(path).content
+        self.editors[key] = {'requester': user_id, 'userName': user_name}
+
+        timer = self._timers.get(key)
+        if timer and not timer.done():
+            timer.cancel()
+        self._timers[key] = asyncio.get_running_loop().create_task(self._settle(session, path))
+
+    def pending_diff(self, project_id: str, path: str) -> Optional[ManifestDiff]:
+        """Dependency diff awaiting sync, if the manifest could be diffed"""
+        return self.pending.get((project_id, path))
+
+    def synced(self, project_id: str, path: str):
+        """The environment now matches the manifest; the next edit starts a new baseline"""
+        key = (project_id, path)
+        self.baselines.pop(key, None)
+        self.pending.pop(key, None)
+        self.editors.pop(key, None)
+
+    def forget(self, project_id: str):
+        """Drop everything tracked for a project, e.g. when its session is unloaded"""
+        for tracked in (self.baselines, self.pending, self.editors, self._timers):
+            for key in [key for key in tracked if key[0] == project_id]:
+                value = tracked.pop(key)
+                if tracked is self._timers and not value.done():
+                    value.cancel()
+
+    async def _settle(self, session, path: str):
+        key = (session.project_id, path)
+        try:
+            await asyncio.sleep(self.debounce)
+        except asyncio.CancelledError:
+            return
+        if self._timers.get(key) is asyncio.current_task():
+            del self._timers[key]
+        if key not in self.baselines:
+            # Synced while the timer was running
+            return
+
+        baseline = self.baselines[key]
+        content = session.documents.get(path).content
+        payload = {'file': path, **self.editors.get(key, {})}
+
+        if manifest_kind(path):
+            new = parse_dependencies(path, content)
+            if new is None:
+                # Not parseable mid-edit; wait for the next edit to settle
+                return
+            # An unparseable baseline counts as empty, so everything gets installed
+            old = parse_dependencies(path, baseline) or {}
+            diff = diff_dependencies(path, old, new)
+            changed = bool(diff)
+            payload.update(diff.to_dict())
+        else:
+            diff = None
+            changed = _normalized(content) != _normalized(baseline)
+
+        if not changed:
+            was_pending = key in self.pending
+            self.synced(*key)
+            if was_pending:
+                await self.emit('env_sync_cleared', {'file': path}, session.room)
+            return
+
+        self.pending[key] = diff
+        logger.info(f"Dependencies of {path} changed in {session.project_id}")
+        await self.emit('env_sync_required', payload, session.room)
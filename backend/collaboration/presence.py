@@ -0,0 +1,59 @@
+"""
+Presence Aggregator - Coalesces cursor and typing updates into one batched
+broadcast per room per tick
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+from .batching import Batcher
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceAggregator(Batcher):
+    """
+    Collects the latest presence state per user and flushes it on a fixed tick.
+
+    Updates that arrive between ticks overwrite each other field by field, so a
+    user dragging the cursor across fifty positions costs one entry per tick
+    instead of fifty broadcasts. The flush loop only runs while there is
+    something pending.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[Dict[str, Any], Optional[str]], Awaitable[Any]],
+        tick_interval: float = 0.04
+    ):
+        """
+        Args:
+            emit: Coroutine called as emit(batch, room) for every room with updates
+            tick_interval: Seconds between flushes
+        """
+        super().__init__(tick_interval)
+        self.emit = emit
+        # room -> user id -> latest presence fields
+        self.pending: Dict[Optional[str], Dict[str, Dict[str, Any]]] = {}
+
+    def update(self, user_id: str, room: Optional[str] = None, **fields):
+        """Record the latest presence fields (cursor, isTyping, ...) for a user"""
+        self.pending.setdefault(room, {}).setdefault(user_id, {}).update(fields)
+        self.schedule()
+
+    def discard(self, user_id: str, room: Optional[str] = None):
+        """Drop anything still pending for a user that left"""
+        users = self.pending.get(room)
+        if users:
+            users.pop(user_id, None)
+
+    async def flush(self):
+        """Emit one presence_batch per room with everything pending"""
+        pending, self.pending = self.pending, {}
+        for room, users in pending.items():
+            if not users:
+                continue
+            batch = {'updates': [{'userId': user_id, **fields} for user_id, fields in users.items()]}
+            try:
+                await self.emit(batch, room)
+            except Exception as e:
+                logger.error(f"Presence flush error for room {room}: {e}")
@@ -0,0 +1,368 @@
+"""
+Project Sessions - Isolated per-project collaboration state and the registry
+that maps connected clients to their project
+"""
+import asyncio
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+from filesystem.virtual_fs import VirtualFileSystem
+from package_managers.npm_manager import NPMManager
+from package_managers.pip_manager import PipManager
+from commands.executor import CommandExecutor
+from cluster.state import StateBackend, MemoryStateBackend
+from cluster.workers import WorkerHeartbeat
+from .activity import ActivityLog, SQLiteActivitySpill
+from .chat import ChatHistory, SQLiteChatStore
+from .document_store import DocumentStore
+from .suggestions import SuggestionStore
+
+logger = logging.getLogger(__name__)
+
+# Project ids come from clients; they name rooms, state keys and snapshot files
+PROJECT_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+
+class SessionLimitError(Exception):
+    """Raised when a new session would exceed the registry's max_sessions"""
+
+
+class SessionState:
+    """
+    Everything that belongs to one project: its collaborators and host, activity
+    log, chat, AI suggestions, files, package managers and documents.
+
+    Sessions never share mutable state except the registry client and resolver,
+    whose caches are safe (and useful) to share across projects.
+
+    The roster (users and host) lives in a StateBackend so workers serving the
+    same project agree on it; `users` and `host` are this worker's mirror of it,
+    refreshed on every roster change made here. Every change bumps
+    `roster_version`, which clients use to apply roster diffs in order.
+
+    With a WorkerHeartbeat, the roster also records which worker each
+    collaborator is connected to. Collaborators of workers that stopped
+    heartbeating (including this deployment's previous incarnation after a
+    restart) are pruned before every join and leave, so a dead host never
+    blocks the handover and the roster does not grow without bound.
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        registry_client,
+        dependency_resolver,
+        snapshot_interval: int = 100,
+        max_op_log: int = 1000,
+        state_backend: Optional[StateBackend] = None,
+        activity_capacity: int = 500,
+        activity_page_size: int = 50,
+        activity_spill: Optional[SQLiteActivitySpill] = None,
+        suggestion_ttl: float = 600.0,
+        suggestion_capacity: int = 50,
+        chat_capacity: int = 200,
+        chat_page_size: int = 50,
+        chat_store: Optional[SQLiteChatStore] = None,
+        heartbeat: Optional[WorkerHeartbeat] = None
+    ):
+        self.project_id = project_id
+        self.room = f"project:{project_id}"
+        self.state = state_backend or MemoryStateBackend()
+        self.roster_key = f"roster:{project_id}"
+        self.heartbeat = heartbeat
+
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.host: Optional[str] = None
+        self.roster_version = 0
+        # Changes no component counts itself, e.g. packages installed by a command
+        self.changes = 0
+        self.activity_logs = ActivityLog(
+            project_id,
+            capacity=activity_capacity,
+            page_size=activity_page_size,
+            spill=activity_spill
+        )
+        self.chat = ChatHistory(
+            project_id,
+            capacity=chat_capacity,
+            page_size=chat_page_size,
+            store=chat_store
+        )
+        self.ai_suggestions = SuggestionStore(ttl=suggestion_ttl, capacity=suggestion_capacity)
+
+        self.virtual_fs = VirtualFileSystem()
+        self.npm_manager = NPMManager(self.virtual_fs, registry_client, dependency_resolver)
+        self.pip_manager = PipManager(self.virtual_fs, registry_client, dependency_resolver)
+        self.command_executor = CommandExecutor(self.npm_manager, self.pip_manager, self.virtual_fs)
+        self.documents = DocumentStore(
+            self.virtual_fs,
+            snapshot_interval=snapshot_interval,
+            max_log=max_op_log
+        )
+
+    @property
+    def generation(self) -> Tuple[int, ...]:
+        """Differs whenever anything a workspace snapshot holds may have changed"""
+        return (
+            self.changes,
+            self.virtual_fs.changes,
+            self.documents.changes,
+            self.activity_logs.seq,
+            self.ai_suggestions.changes
+        )
+
+    def touch(self):
+        """Record a change to state the generation does not otherwise cover"""
+        self.changes += 1
+
+    async def refresh(self):
+        """Reload the roster mirror from the state backend"""
+        self._mirror(await self.state.get(self.roster_key, self._empty_roster()))
+
+    async def add_user(self, sid: str, user: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """
+        Add a collaborator; the first one in becomes the host. A sid that is
+        already in the roster keeps its role and only has its details updated.
+
+        Returns:
+            The stored user and the roster version this change produced; the
+            mirror may have moved on by the time the caller next runs
+        """
+        await self.prune()
+
+        def add(roster):
+            if roster['host'] == sid:
+                user['role'] = 'host'
+            elif roster['host'] not in roster['users']:
+                roster['host'] = sid
+                user['role'] = 'host'
+            else:
+                user['role'] = 'member'
+            roster['users'][sid] = user
+            if self.heartbeat is not None:
+                roster.setdefault('workers', {})[sid] = self.heartbeat.worker_id
+            roster['version'] = roster.get('version', 0) + 1
+            return roster
+
+        roster = await self.state.update(self.roster_key, add, self._empty_roster())
+        self._mirror(roster)
+        return roster['users'][sid], roster['version']
+
+    async def remove_user(self, sid: str) -> Tuple[Optional[str], int]:
+        """
+        Remove a collaborator, handing the host role over if needed
+
+        Returns:
+            The sid of the new host if a handover happened (else None) and the
+            roster version this change produced
+        """
+        await self.prune()
+        handover = []
+
+        def remove(roster):
+            roster['users'].pop(sid, None)
+            roster.get('workers', {}).pop(sid, None)
+            if roster['host'] == sid:
+                roster['host'] = next(iter(roster['users']), None)
+                if roster['host']:
+                    roster['users'][roster['host']]['role'] = 'host'
+                    handover.append(roster['host'])
+            roster['version'] = roster.get('version', 0) + 1
+            return roster
+
+        roster = await self.state.update(self.roster_key, remove, self._empty_roster())
+        self._mirror(roster)
+        return (handover[0] if handover else None), roster['version']
+
+    async def prune(self) -> List[str]:
+        """
+        Drop collaborators whose worker is no longer alive, handing the host
+        role over if the host was one of them
+
+        The pruning is a roster change of its own, so clients see a version
+        gap and fetch the whole roster.
+
+        Returns:
+            The sids that were dropped
+        """
+        if self.heartbeat is None:
+            return []
+        live = await self.heartbeat.live()
+        pruned = []
+
+        def prune(roster):
+            workers = roster.setdefault('workers', {})
+            pruned.extend(sid for sid in roster['users'] if workers.get(sid) not in live)
+            if not pruned:
+                return roster
+            for sid in pruned:
+                roster['users'].pop(sid, None)
+                workers.pop(sid, None)
+            if roster['host'] not in roster['users']:
+                roster['host'] = next(iter(roster['users']), None)
+                if roster['host']:
+                    roster['users'][roster['host']]['role'] = 'host'
+            roster['version'] = roster.get('version', 0) + 1
+            return roster
+
+        self._mirror(await self.state.update(self.roster_key, prune, self._empty_roster()))
+        if pruned:
+            logger.info(f"Pruned {len(pruned)} collaborator(s) of stopped workers from {self.project_id}")
+        return pruned
+
+    async def has_role(self, sid: str, role: str = 'host') -> bool:
+        """Check a collaborator's role against the shared roster"""
+        await self.refresh()
+        user = self.users.get(sid)
+        return bool(user) and user.get('role') == role
+
+    def user_list(self, local_sid: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Collaborators as sent to clients, optionally flagging the receiver"""
+        if local_sid is None:
+            return [{**user, 'id': uid} for uid, user in self.users.items()]
+        return [{**user, 'id': uid, 'isLocal': uid == local_sid} for uid, user in self.users.items()]
+
+    def _mirror(self, roster: Dict[str, Any]):
+        self.users = roster['users']
+        self.host = roster['host']
+        self.roster_version = roster.get('version', 0)
+
+    @staticmethod
+    def _empty_roster() -> Dict[str, Any]:
+        return {'host': None, 'users': {}, 'workers': {}, 'version': 0}
+
+
+class SessionRegistry:
+    """
+    Maps project ids to their SessionState and connected sids to their project.
+
+    Sessions outlive their last collaborator so a refresh or reconnect lands
+    back in the same workspace, but not forever: a session nobody on this
+    worker has joined for `idle_ttl` seconds is reported by idle() and can
+    be dropped with evict() (snapshot it first to keep its files). At most
+    `max_sessions` sessions are loaded at once, and project ids must match
+    PROJECT_ID_PATTERN, so clients cannot make the worker hold arbitrarily
+    many projects.
+
+    A new session is built by `session_factory` and then handed to the
+    awaited `restore` hook (e.g. WorkspaceSnapshotter.restore) before anyone
+    can use it; clients joining a project while it loads share the one load.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[str], SessionState],
+        idle_ttl: float = 0,
+        max_sessions: int = 0,
+        restore: Optional[Callable[[SessionState], Awaitable[Any]]] = None
+    ):
+        """
+        Args:
+            session_factory: Builds the empty session of a project id
+            idle_ttl: Seconds a session without clients is kept; 0 keeps it forever
+            max_sessions: Most sessions loaded at once; 0 for no limit
+            restore: Coroutine filling a new session with saved state
+        """
+        self.session_factory = session_factory
+        self.restore = restore
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.sessions: Dict[str, SessionState] = {}
+        self.sid_projects: Dict[str, str] = {}
+        # project id -> clients joined to it on this worker
+        self.members: Dict[str, int] = {}
+        # project id -> when it was last left by its final client
+        self.idle_since: Dict[str, float] = {}
+        # project id -> session being built and restored
+        self.loading: Dict[str, asyncio.Future] = {}
+
+    async def get_or_create(self, project_id: str) -> SessionState:
+        """
+        Raises:
+            ValueError: If the project id is malformed
+            SessionLimitError: If the session would exceed max_sessions
+        """
+        session = self.sessions.get(project_id)
+        if session is not None:
+            return session
+        loading = self.loading.get(project_id)
+        if loading is None:
+            if not PROJECT_ID_PATTERN.match(project_id):
+                raise ValueError(f"Invalid project id '{project_id[:80]}'")
+            loaded = len(self.sessions) + len(self.loading)
+            if self.max_sessions and loaded >= self.max_sessions:
+                raise SessionLimitError(f"{loaded} sessions already loaded")
+            loading = self.loading[project_id] = asyncio.ensure_future(self._create(project_id))
+        return await asyncio.shield(loading)
+
+    async def join(self, sid: str, project_id: str) -> SessionState:
+        """
+        Attach a client to a project; joining the project it is already in
+        changes nothing
+
+        Raises:
+            ValueError: If the project id is malformed
+            SessionLimitError: If the session would exceed max_sessions
+        """
+        if self.sid_projects.get(sid) == project_id:
+            return self.sessions[project_id]
+        session = await self.get_or_create(project_id)
+        self.sid_projects[sid] = project_id
+        self.members[project_id] = self.members.get(project_id, 0) + 1
+        self.idle_since.pop(project_id, None)
+        return session
+
+    def leave(self, sid: str) -> Optional[SessionState]:
+        """Detach a client; returns the session it was in, if any"""
+        project_id = self.sid_projects.pop(sid, None)
+        if project_id is None:
+            return None
+        self.members[project_id] -= 1
+        if not self.members[project_id]:
+            del self.members[project_id]
+            self.idle_since[project_id] = time.monotonic()
+        return self.sessions.get(project_id)
+
+    def for_sid(self, sid: str) -> Optional[SessionState]:
+        project_id = self.sid_projects.get(sid)
+        if project_id is None:
+            return None
+        return self.sessions.get(project_id)
+
+    def idle(self, now: Optional[float] = None) -> List[str]:
+        """Projects without clients here for at least `idle_ttl` seconds"""
+        if self.idle_ttl <= 0:
+            return []
+        now = time.monotonic() if now is None else now
+        return [
+            project_id for project_id, since in self.idle_since.items()
+            if now - since >= self.idle_ttl
+        ]
+
+    def evict(self, project_id: str) -> Optional[SessionState]:
+        """Unload a session without clients; returns it, or None if it is in use"""
+        if project_id not in self.idle_since:
+            return None
+        del self.idle_since[project_id]
+        session = self.sessions.pop(project_id, None)
+        if session:
+            logger.info(f"Evicted idle session for project {project_id}")
+        return session
+
+    async def _create(self, project_id: str) -> SessionState:
+        try:
+            session = self.session_factory(project_id)
+            if self.restore:
+                await self.restore(session)
+            self.sessions[project_id] = session
+            if not self.members.get(project_id):
+                self.idle_since[project_id] = time.monotonic()
+            logger.info(f"Created session for project {project_id}")
+            return session
+        finally:
+            del self.loading[project_id]
+
+    def __len__(self) -> int:
+        return len(self.sessions)
@@ -0,0 +1,207 @@
+"""
+Workspace Snapshots - Periodic on-disk images of project sessions so a
+restarted worker can pick them up where the old one left off
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+import logging
+
+from package_managers.base_manager import Package
+
+logger = logging.getLogger(__name__)
+
+# Bump when the image layout changes; images of other versions are ignored
+SNAPSHOT_VERSION = 2
+
+SUFFIX = '.json.gz'
+
+
+def _package_to_dict(pkg: Package) -> Dict[str, Any]:
+    data = asdict(pkg)
+    data['install_time'] = pkg.install_time.isoformat() if pkg.install_time else None
+    return data
+
+
+def _package_from_dict(data: Dict[str, Any]) -> Package:
+    data = dict(data)
+    if data.get('install_time'):
+        data['install_time'] = datetime.fromisoformat(data['install_time'])
+    return Package(**data)
+
+
+class WorkspaceSnapshotter:
+    """
+    Writes one gzipped JSON image per project to `directory` every `interval`
+    seconds and restores sessions from those images.
+
+    An image holds the project's files (with pending document edits flushed),
+    installed npm and pip packages, AI suggestions and the in-memory activity
+    timeline. Writes are incremental per project: a session whose generation
+    (see SessionState.generation) has not moved since its last image is
+    skipped without being captured, and an image is only rewritten when its
+    content digest changed. Encoding, hashing, compression and file IO run in
+    a worker thread. Files are replaced atomically, so a crash mid-write
+    leaves the previous image intact.
+
+    Restoring is lazy: pass restore() to the SessionRegistry and a project
+    is loaded from its image the first time a client asks for it. Reading,
+    decompressing and decoding the image run in a worker thread.
+    """
+
+    def __init__(self, sessions, directory: str, interval: float = 5.0):
+        """
+        Args:
+            sessions: SessionRegistry whose sessions are snapshotted
+            directory: Where images are kept
+            interval: Seconds between snapshot passes
+        """
+        self.sessions = sessions
+        self.directory = directory
+        self.interval = interval
+        # project id -> digest of the last image written or restored
+        self.digests: Dict[str, str] = {}
+        # project id -> session generation that image was taken at
+        self.generations: Dict[str, tuple] = {}
+        self._task: Optional[asyncio.Task] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, project_id: str) -> str:
+        return os.path.join(self.directory, quote(project_id, safe='') + SUFFIX)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic pass and write a final snapshot"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.snapshot_all()
+
+    def capture(self, session) -> Dict[str, Any]:
+        """State image of one session"""
+        session.documents.flush()
+        return {
+            'version': SNAPSHOT_VERSION,
+            'project': session.project_id,
+            'files': dict(session.virtual_fs.files),
+            'packages': {
+                'npm': [_package_to_dict(p) for p in session.npm_manager.installed_packages.values()],
+                'pip': [_package_to_dict(p) for p in session.pip_manager.installed_packages.values()]
+            },
+            'aiSuggestions': session.ai_suggestions.to_list(),
+            'activity': {
+                'seq': session.activity_logs.seq,
+                'entries': list(session.activity_logs.entries)
+            }
+        }
+
+    async def snapshot(self, session) -> bool:
+        """
+        Write the image of one session if it changed; returns whether it was written
+
+        Raises:
+            Exception: If the session could not be captured or encoded
+            OSError: If the image could not be written
+        """
+        project_id = session.project_id
+        generation = session.generation
+        if self.generations.get(project_id) == generation:
+            return False
+        # Captured on the loop so the image is consistent; the copy is then
+        # only read by the worker thread
+        image = self.capture(session)
+        encoded, digest = await asyncio.to_thread(self._encode, image)
+        written = self.digests.get(project_id) != digest
+        if written:
+            await asyncio.to_thread(self._write, self.path_for(project_id), encoded)
+            self.digests[project_id] = digest
+        self.generations[project_id] = generation
+        return written
+
+    async def snapshot_all(self) -> int:
+        """Write images of every session that changed; returns how many were written"""
+        written = 0
+        for project_id, session in list(self.sessions.sessions.items()):
+            try:
+                written += await self.snapshot(session)
+            except Exception as e:
+                logger.error(f"Snapshot of {project_id} failed: {e}")
+        return written
+
+    def forget(self, project_id: str):
+        """Drop what is known about an unloaded session's image; restore() learns it again"""
+        self.digests.pop(project_id, None)
+        self.generations.pop(project_id, None)
+
+    async def restore(self, session) -> bool:
+        """Load a session's state from its image, if there is a usable one"""
+        path = self.path_for(session.project_id)
+        try:
+            image, digest = await asyncio.to_thread(self._read, path)
+        except FileNotFoundError:
+            return False
+        except (OSError, EOFError, ValueError) as e:
+            logger.error(f"Reading snapshot of {session.project_id} failed: {e}")
+            return False
+
+        if image.get('version') != SNAPSHOT_VERSION:
+            logger.warning(f"Ignoring snapshot of {session.project_id} with version {image.get('version')}")
+            return False
+
+        session.virtual_fs.files = image['files']
+        for manager, packages in (
+            (session.npm_manager, image['packages']['npm']),
+            (session.pip_manager, image['packages']['pip'])
+        ):
+            manager.installed_packages = {p['name']: _package_from_dict(p) for p in packages}
+        session.ai_suggestions.load(image.get('aiSuggestions') or [])
+
+        activity = session.activity_logs
+        activity.entries.extend(image['activity']['entries'])
+        activity.seq = max(activity.seq, image['activity']['seq'])
+
+        # Unchanged sessions are not rewritten by the next pass
+        self.digests[session.project_id] = digest
+        self.generations[session.project_id] = session.generation
+        logger.info(f"Restored {session.project_id} from snapshot ({len(image['files'])} files)")
+        return True
+
+    @staticmethod
+    def _encode(image: Dict[str, Any]):
+        encoded = json.dumps(image, separators=(',', ':')).encode('utf-8')
+        return encoded, hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+    @staticmethod
+    def _read(path: str):
+        with open(path, 'rb') as f:
+            encoded = gzip.decompress(f.read())
+        return json.loads(encoded), hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+    def _write(self, path: str, encoded: bytes):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(encoded, compresslevel=5))
+        os.replace(tmp_path, path)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                written = await self.snapshot_all()
+                if written:
+                    logger.debug(f"Snapshotted {written} project(s)")
+            except Exception as e:
+                logger.error(f"Snapshot pass failed: {e}")
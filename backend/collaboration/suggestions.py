@@ -0,0 +1,217 @@
+"""
+Suggestion Store - Bounded, expiring set of AI suggestions under review with
+incremental vote tallies
+"""
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+APPROVE = 'approve'
+REJECT = 'reject'
+
+
+@dataclass
+class Suggestion:
+    """A code suggestion shared with the project for a vote"""
+    id: str
+    user_id: str
+    user_name: str
+    file: Optional[str]
+    code: str
+    description: str = ''
+    created: float = field(default_factory=time.time)
+    expires: float = 0.0
+    votes: Dict[str, str] = field(default_factory=dict)
+    approvals: int = 0
+    rejections: int = 0
+
+    def to_dict(self, members: Optional[int] = None) -> Dict[str, Any]:
+        data = {
+            'id': self.id,
+            'userId': self.user_id,
+            'userName': self.user_name,
+            'file': self.file,
+            'code': self.code,
+            'description': self.description,
+            'votes': dict(self.votes),
+            'approvals': self.approvals,
+            'rejections': self.rejections,
+            'timestamp': int(self.created * 1000),
+            'expiresAt': int(self.expires * 1000)
+        }
+        if members is not None:
+            data['required'] = SuggestionStore.required_approvals(members)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Suggestion':
+        votes = dict(data.get('votes') or {})
+        return cls(
+            id=data['id'],
+            user_id=data['userId'],
+            user_name=data.get('userName', 'User'),
+            file=data.get('file'),
+            code=data.get('code') or '',
+            description=data.get('description', ''),
+            created=data.get('timestamp', 0) / 1000,
+            expires=data.get('expiresAt', 0) / 1000,
+            votes=votes,
+            approvals=sum(1 for v in votes.values() if v == APPROVE),
+            rejections=sum(1 for v in votes.values() if v == REJECT)
+        )
+
+
+class SuggestionStore:
+    """
+    Open AI suggestions of one project.
+
+    Suggestions expire `ttl` seconds after they are shared and at most
+    `capacity` are kept; sharing one more drops the oldest. Ids are random,
+    so they stay unique across removals and restarts.
+
+    Approve and reject counts are kept up to date as votes come in (a changed
+    vote moves one count to the other), so deciding a vote never rescans the
+    ballot. The quorum is the project's own room: a suggestion passes with
+    approvals from more than half of the members present, and fails as soon
+    as enough members rejected that this can no longer happen.
+    """
+
+    def __init__(self, ttl: float = 600.0, capacity: int = 50):
+        self.ttl = ttl
+        self.capacity = max(1, capacity)
+        self.suggestions: 'OrderedDict[str, Suggestion]' = OrderedDict()
+        # Bumped whenever a suggestion or vote is added, changed or removed
+        self.changes = 0
+
+    @staticmethod
+    def required_approvals(members: int) -> int:
+        """Approvals needed for a majority of `members`"""
+        return max(1, members) // 2 + 1
+
+    def add(
+        self,
+        user_id: str,
+        user_name: str,
+        file: Optional[str],
+        code: str,
+        description: str = ''
+    ) -> Tuple[Suggestion, List[str]]:
+        """
+        Share a suggestion; its author's approval counts as the first vote
+
+        Returns:
+            The new suggestion and the ids of suggestions dropped to make room
+        """
+        now = time.time()
+        suggestion = Suggestion(
+            id=f"sug_{uuid.uuid4().hex[:12]}",
+            user_id=user_id,
+            user_name=user_name,
+            file=file,
+            code=code or '',
+            description=description,
+            created=now,
+            expires=now + self.ttl,
+            votes={user_id: APPROVE},
+            approvals=1
+        )
+        evicted = []
+        while len(self.suggestions) >= self.capacity:
+            suggestion_id, _ = self.suggestions.popitem(last=False)
+            logger.info(f"Dropped suggestion {suggestion_id}: capacity reached")
+            evicted.append(suggestion_id)
+        self.suggestions[suggestion.id] = suggestion
+        self.changes += 1
+        return suggestion, evicted
+
+    def get(self, suggestion_id: str) -> Optional[Suggestion]:
+        suggestion = self.suggestions.get(suggestion_id)
+        if suggestion is not None and suggestion.expires <= time.time():
+            return None
+        return suggestion
+
+    def vote(self, suggestion_id: str, user_id: str, vote: str) -> Optional[Suggestion]:
+        """Record or change a member's vote; None if the suggestion is gone"""
+        if vote not in (APPROVE, REJECT):
+            return None
+        suggestion = self.get(suggestion_id)
+        if suggestion is None:
+            return None
+        previous = suggestion.votes.get(user_id)
+        if previous == vote:
+            return suggestion
+        if previous == APPROVE:
+            suggestion.approvals -= 1
+        elif previous == REJECT:
+            suggestion.rejections -= 1
+        if vote == APPROVE:
+            suggestion.approvals += 1
+        else:
+            suggestion.rejections += 1
+        suggestion.votes[user_id] = vote
+        self.changes += 1
+        return suggestion
+
+    def outcome(self, suggestion: Suggestion, members: int) -> Optional[str]:
+        """'approved', 'rejected' or None while the vote is still open"""
+        required = self.required_approvals(members)
+        if suggestion.approvals >= required:
+            return 'approved'
+        if max(1, members) - suggestion.rejections < required:
+            return 'rejected'
+        return None
+
+    def remove(self, suggestion_id: str) -> Optional[Suggestion]:
+        self.changes += 1
+        return self.suggestions.pop(suggestion_id, None)
+
+    def withdraw_votes(self, user_id: str) -> List[Suggestion]:
+        """Drop a departing member's votes; returns the suggestions that changed"""
+        changed = []
+        for suggestion in self.suggestions.values():
+            vote = suggestion.votes.pop(user_id, None)
+            if vote == APPROVE:
+                suggestion.approvals -= 1
+            elif vote == REJECT:
+                suggestion.rejections -= 1
+            if vote is not None:
+                changed.append(suggestion)
+        self.changes += len(changed)
+        return changed
+
+    def expire(self) -> List[str]:
+        """Remove expired suggestions and return their ids"""
+        now = time.time()
+        expired = []
+        # Suggestions are kept in creation order and share one TTL, so expired
+        # ones are always at the front
+        while self.suggestions:
+            suggestion = next(iter(self.suggestions.values()))
+            if suggestion.expires > now:
+                break
+            self.suggestions.popitem(last=False)
+            expired.append(suggestion.id)
+        self.changes += len(expired)
+        return expired
+
+    def active(self) -> List[Suggestion]:
+        now = time.time()
+        return [s for s in self.suggestions.values() if s.expires > now]
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [s.to_dict() for s in self.suggestions.values()]
+
+    def load(self, items: List[Dict[str, Any]]):
+        """Restore suggestions saved with to_list()"""
+        for item in items:
+            suggestion = Suggestion.from_dict(item)
+            self.suggestions[suggestion.id] = suggestion
+        self.expire()
+
+    def __len__(self) -> int:
+        return len(self.suggestions)
@@ -2,5 +2,6 @@
 Commands Module
 """
 from .executor import CommandExecutor
+from .scheduler import Job, JobRejected, JobScheduler
 
-__all__ = ['CommandExecutor']
+__all__ = ['CommandExecutor', 'Job', 'JobRejected', 'JobScheduler']
@@ -2,12 +2,53 @@
 Command Execution Engine - Parses and executes terminal commands
 """
 import re
+import time
 import logging
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
+from package_managers.base_manager import OutputSink
+from monitoring.metrics import REGISTRY
+
 logger = logging.getLogger(__name__)
 
+COMMAND_SECONDS = REGISTRY.histogram(
+    'flux_command_duration_seconds',
+    'Terminal command latency by command type',
+    ['command']
+)
+COMMANDS_TOTAL = REGISTRY.counter(
+    'flux_commands_total',
+    'Terminal commands run, by command type and outcome',
+    ['command', 'status']
+)
+
+# Subcommand aliases folded into one metric label each
+NPM_SUBCOMMANDS = {
+    'install': 'install', 'i': 'install', 'add': 'install',
+    'uninstall': 'uninstall', 'remove': 'uninstall', 'rm': 'uninstall', 'un': 'uninstall',
+    'list': 'list', 'ls': 'list',
+    'update': 'update', 'upgrade': 'update',
+    'search': 'search'
+}
+PIP_SUBCOMMANDS = {'install', 'uninstall', 'list', 'search'}
+BUILTIN_COMMANDS = {
+    'ls': 'ls', 'dir': 'ls', 'cat': 'cat', 'type': 'cat', 'clear': 'clear', 'cls': 'clear',
+    'pwd': 'pwd', 'help': 'help', 'history': 'history', 'echo': 'echo'
+}
+
+
+def command_type(cmd: str, args: List[str]) -> str:
+    """Bounded label for a parsed command line, e.g. 'npm install' or 'ls'"""
+    if cmd in ['npm', 'yarn', 'pnpm']:
+        return f"npm {NPM_SUBCOMMANDS.get(args[0], 'other')}" if args else 'npm'
+    if cmd in ['pip', 'pip3', 'python', 'python3'] and (args and args[0] in ['-m', 'pip']):
+        if args[0] == '-m':
+            args = args[1:]
+        sub = args[1] if len(args) > 1 else None
+        return f"pip {sub if sub in PIP_SUBCOMMANDS else 'other'}" if sub else 'pip'
+    return BUILTIN_COMMANDS.get(cmd, 'unknown')
+
 
 class CommandExecutor:
     """
@@ -21,12 +62,18 @@ class CommandExecutor:
         self.command_history = []
         self.current_directory = "/"
     
-    async def execute(self, command: str) -> Dict:
+    async def execute(self, command: str, on_output: Optional[OutputSink] = None) -> Dict:
         """
         Execute a terminal command and return result
         
+        Args:
+            command: Command line to run
+            on_output: Optional coroutine receiving output chunks while the
+                command runs (package installs stream line by line)
+        
         Returns:
-            Dict with 'output', 'error', 'success' keys
+            Dict with 'output', 'error', 'success' keys; with `on_output`,
+            'output' only holds what was not already streamed
         """
         command = command.strip()
         
@@ -44,14 +91,26 @@ class CommandExecutor:
         cmd = parts[0].lower()
         args = parts[1:] if len(parts) > 1 else []
         
-        # Route to appropriate handler
+        label = command_type(cmd, args)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = await self._dispatch(cmd, args, on_output)
+            return result
+        finally:
+            COMMAND_SECONDS.observe(time.perf_counter() - start, label)
+            status = 'success' if result and result.get('success') else 'failure'
+            COMMANDS_TOTAL.inc(label, status)
+    
+    async def _dispatch(self, cmd: str, args: List[str], on_output: Optional[OutputSink] = None) -> Dict:
+        """Route a parsed command to its handler"""
         if cmd in ['npm', 'yarn', 'pnpm']:
-            return await self._handle_npm_command(cmd, args)
+            return await self._handle_npm_command(cmd, args, on_output)
         elif cmd in ['pip', 'pip3', 'python', 'python3'] and (args and args[0] in ['-m', 'pip']):
             # Handle "python -m pip install ..." format
             if args[0] == '-m' and len(args) > 1 and args[1] == 'pip':
-                return await self._handle_pip_command(args[1], args[2:])
-            return await self._handle_pip_command(cmd, args)
+                return await self._handle_pip_command(args[1], args[2:], on_output)
+            return await self._handle_pip_command(cmd, args, on_output)
         elif cmd == 'ls' or cmd == 'dir':
             return await self._handle_ls()
         elif cmd == 'cat' or cmd == 'type':
@@ -73,7 +132,7 @@ class CommandExecutor:
                 'success': False
             }
     
-    async def _handle_npm_command(self, cmd: str, args: List[str]) -> Dict:
+    async def _handle_npm_command(self, cmd: str, args: List[str], on_output: Optional[OutputSink] = None) -> Dict:
         """Handle npm/yarn/pnpm commands"""
         if not args:
             return {
@@ -87,7 +146,7 @@ class CommandExecutor:
         
         try:
             if subcmd in ['install', 'i', 'add']:
-                return await self._npm_install(rest_args)
+                return await self._npm_install(rest_args, on_output)
             elif subcmd in ['uninstall', 'remove', 'rm', 'un']:
                 return await self._npm_uninstall(rest_args)
             elif subcmd in ['list', 'ls']:
@@ -110,7 +169,7 @@ class CommandExecutor:
                 'success': False
             }
     
-    async def _handle_pip_command(self, cmd: str, args: List[str]) -> Dict:
+    async def _handle_pip_command(self, cmd: str, args: List[str], on_output: Optional[OutputSink] = None) -> Dict:
         """Handle pip commands"""
         if not args:
             return {
@@ -124,7 +183,7 @@ class CommandExecutor:
         
         try:
             if subcmd == 'install':
-                return await self._pip_install(rest_args)
+                return await self._pip_install(rest_args, on_output)
             elif subcmd == 'uninstall':
                 return await self._pip_uninstall(rest_args)
             elif subcmd == 'list':
@@ -145,7 +204,7 @@ class CommandExecutor:
                 'success': False
             }
     
-    async def _npm_install(self, args: List[str]) -> Dict:
+    async def _npm_install(self, args: List[str], on_output: Optional[OutputSink] = None) -> Dict:
         """Handle npm install"""
         if not args:
             # Install from package.json
@@ -167,9 +226,10 @@ class CommandExecutor:
         
         package_spec = package_args[0]
         
-        # Parse package@version
-        if '@' in package_spec and not package_spec.startswith('@'):
-            package_name, version = package_spec.split('@', 1)
+        # Parse package@version; a leading @ belongs to a scope (@types/node@^20)
+        at = package_spec.rfind('@')
+        if at > 0:
+            package_name, version = package_spec[:at], package_spec[at + 1:] or None
         else:
             package_name = package_spec
             version = None
@@ -178,15 +238,14 @@ class CommandExecutor:
             package_name,
             version,
             save_dev=save_dev,
-            global_install=global_install
+            global_install=global_install,
+            on_output=on_output
         )
         
-        output = '\n'.join(result.output_lines)
-        if result.warnings:
-            output += '\n' + '\n'.join(result.warnings)
+        output_lines = result.output_lines.unsent() + result.warnings
         
         return {
-            'output': output + '\n',
+            'output': '\n'.join(output_lines) + '\n' if output_lines else '',
             'error': '\n'.join(result.errors) if result.errors else '',
             'success': result.success
         }
@@ -250,7 +309,7 @@ class CommandExecutor:
         
         return {'output': output, 'error': '', 'success': True}
     
-    async def _pip_install(self, args: List[str]) -> Dict:
+    async def _pip_install(self, args: List[str], on_output: Optional[OutputSink] = None) -> Dict:
         """Handle pip install"""
         if not args:
             return {'output': '', 'error': 'ERROR: You must give at least one requirement to install\n', 'success': False}
@@ -264,10 +323,11 @@ class CommandExecutor:
             package_name = package_spec
             version = None
         
-        result = await self.pip_manager.install(package_name, version)
+        result = await self.pip_manager.install(package_name, version, on_output=on_output)
+        output_lines = result.output_lines.unsent()
         
         return {
-            'output': '\n'.join(result.output_lines) + '\n',
+            'output': '\n'.join(output_lines) + '\n' if output_lines else '',
             'error': '\n'.join(result.errors) if result.errors else '',
             'success': result.success
         }
@@ -0,0 +1,185 @@
+"""
+Job Scheduler - Runs terminal commands as cancellable jobs with per-session
+and global concurrency limits, sharing slots fairly between sessions
+"""
+import asyncio
+import itertools
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JobRejected(Exception):
+    """Raised when a session already has too many jobs waiting"""
+    pass
+
+
+@dataclass
+class Job:
+    """A command submitted to the scheduler"""
+    id: int
+    session_key: str
+    name: str
+    owner: Optional[str] = None
+    state: str = 'queued'  # queued, running, done, failed, cancelled
+    created: datetime = field(default_factory=datetime.now)
+    task: Optional[asyncio.Task] = None
+    slot: Optional[asyncio.Future] = None
+
+    @property
+    def active(self) -> bool:
+        return self.state in ('queued', 'running')
+
+
+class JobScheduler:
+    """
+    Bounded, fair scheduler for terminal jobs.
+
+    At most `max_per_session` jobs of one session and `max_concurrent` jobs
+    overall run at once. When a slot frees up it goes to the next session in
+    round-robin order that has a job waiting, so a session queueing a dozen
+    installs cannot starve another session's single `ls`.
+    """
+
+    def __init__(self, max_concurrent: int = 8, max_per_session: int = 2, max_queued_per_session: int = 16):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_session = max(1, max_per_session)
+        self.max_queued_per_session = max(0, max_queued_per_session)
+
+        self.waiting: Dict[str, Deque[Job]] = {}
+        self.running: Dict[str, List[Job]] = {}
+        # Sessions with waiting jobs, in the order they get the next free slot
+        self.turns: Deque[str] = deque()
+        self._ids = itertools.count(1)
+
+    def submit(
+        self,
+        session_key: str,
+        run: Callable[[], Awaitable[Any]],
+        name: str = '',
+        owner: Optional[str] = None
+    ) -> Job:
+        """
+        Queue a job; it starts as soon as the limits allow
+
+        Args:
+            session_key: Tenant the job is accounted to
+            run: Coroutine function doing the work
+            name: Label for logs (e.g. the command line)
+            owner: Who submitted it, used by cancel_owned()
+
+        Raises:
+            JobRejected: If the session's wait queue is full
+        """
+        queue = self.waiting.get(session_key)
+        if queue is not None and len(queue) >= self.max_queued_per_session:
+            raise JobRejected(f"Too many queued jobs for {session_key}")
+
+        job = Job(id=next(self._ids), session_key=session_key, name=name, owner=owner)
+        job.slot = asyncio.get_running_loop().create_future()
+        job.task = asyncio.get_running_loop().create_task(self._run(job, run))
+        # Bookkeeping happens here rather than in _run(): a task cancelled
+        # before it first runs never enters its coroutine at all
+        job.task.add_done_callback(lambda task: self._finish(job, task))
+
+        if queue is None:
+            queue = self.waiting[session_key] = deque()
+            self.turns.append(session_key)
+        queue.append(job)
+        self._dispatch()
+        return job
+
+    def cancel(self, job: Job) -> bool:
+        """Cancel a queued or running job"""
+        if not job.active:
+            return False
+        return job.task.cancel()
+
+    def cancel_owned(self, owner: str, session_key: Optional[str] = None) -> List[Job]:
+        """Cancel every active job submitted by `owner`, e.g. on Ctrl-C or disconnect"""
+        jobs = [
+            job for job in self.jobs(session_key)
+            if job.owner == owner and job.active
+        ]
+        for job in jobs:
+            self.cancel(job)
+        return jobs
+
+    def jobs(self, session_key: Optional[str] = None) -> List[Job]:
+        """Running and queued jobs, optionally for one session"""
+        keys = [session_key] if session_key is not None else set(self.running) | set(self.waiting)
+        result = []
+        for key in keys:
+            result.extend(self.running.get(key, []))
+            result.extend(self.waiting.get(key, []))
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'running': sum(len(jobs) for jobs in self.running.values()),
+            'queued': sum(len(queue) for queue in self.waiting.values()),
+            'sessions': len(set(self.running) | set(self.waiting))
+        }
+
+    async def _run(self, job: Job, run: Callable[[], Awaitable[Any]]) -> Any:
+        await job.slot
+        job.state = 'running'
+        return await run()
+
+    def _finish(self, job: Job, task: asyncio.Task):
+        if task.cancelled():
+            job.state = 'cancelled'
+            logger.info(f"Job {job.id} ({job.name}) cancelled")
+        elif task.exception() is not None:
+            job.state = 'failed'
+        else:
+            job.state = 'done'
+        self._release(job)
+
+    def _release(self, job: Job):
+        queue = self.waiting.get(job.session_key)
+        if queue is not None and job in queue:
+            queue.remove(job)
+            if not queue:
+                self._drop_turn(job.session_key)
+
+        running = self.running.get(job.session_key)
+        if running is not None and job in running:
+            running.remove(job)
+            if not running:
+                del self.running[job.session_key]
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiting jobs, one session at a time in turn"""
+        total = sum(len(jobs) for jobs in self.running.values())
+        skipped = 0
+        while total < self.max_concurrent and self.turns and skipped < len(self.turns):
+            session_key = self.turns[0]
+            self.turns.rotate(-1)
+            if len(self.running.get(session_key, [])) >= self.max_per_session:
+                skipped += 1
+                continue
+
+            queue = self.waiting[session_key]
+            job = queue.popleft()
+            if not queue:
+                self._drop_turn(session_key)
+            if job.slot.done():
+                # Cancelled while waiting; its task is about to clean up
+                continue
+            self.running.setdefault(session_key, []).append(job)
+            job.slot.set_result(None)
+            total += 1
+            skipped = 0
+
+    def _drop_turn(self, session_key: str):
+        self.waiting.pop(session_key, None)
+        try:
+            self.turns.remove(session_key)
+        except ValueError:
+            pass
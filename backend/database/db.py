@@ -1,5 +1,6 @@
 import sqlite3
 import os
+import threading
 from typing import Optional
 import logging
 
@@ -10,6 +11,9 @@ class Database:
         """Initialize database connection"""
         self.db_path = db_path
         self.connection: Optional[sqlite3.Connection] = None
+        # The connection is shared with worker threads; hold this around each
+        # statement-and-commit so their transactions do not interleave
+        self.lock = threading.RLock()
         
     def connect(self):
         """Connect to the database"""
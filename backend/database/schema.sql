@@ -20,3 +20,31 @@ CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions(token_hash);
 CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);
+
+CREATE TABLE IF NOT EXISTS activity_logs (
+    project_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (project_id, seq)
+);
+
+CREATE TABLE IF NOT EXISTS chat_messages (
+    project_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (project_id, id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_chat_messages_project_time ON chat_messages(project_id, timestamp, id);
+
+CREATE TABLE IF NOT EXISTS registry_cache (
+    registry TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    data TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    PRIMARY KEY (registry, name, version)
+);
@@ -33,6 +33,7 @@ class DependencyResolver:
         """
         Resolve all dependencies for a package
         Returns a list of all packages that need to be installed
+        Raises RegistryUnavailable if a dependency could not be looked up
         """
         # Import Package locally to avoid circular imports
         from dataclasses import dataclass
@@ -15,6 +15,8 @@ class VirtualFileSystem:
     
     def __init__(self):
         self.files: Dict[str, str] = {}
+        # Bumped by every write, so callers can tell whether anything changed
+        self.changes = 0
         self._init_default_files()
     
     def _init_default_files(self):
@@ -49,12 +51,14 @@ class VirtualFileSystem:
     async def write_file(self, path: str, content: str):
         """Write a file to the virtual filesystem"""
         self.files[path] = content
+        self.changes += 1
         logger.info(f"Wrote file: {path}")
     
     async def delete_file(self, path: str) -> bool:
         """Delete a file from the virtual filesystem"""
         if path in self.files:
             del self.files[path]
+            self.changes += 1
             logger.info(f"Deleted file: {path}")
             return True
         return False
@@ -86,6 +90,7 @@ class VirtualFileSystem:
     def reset(self):
         """Reset the filesystem to defaults"""
         self.files = {}
+        self.changes += 1
         self._init_default_files()
     
     def get_file_tree(self) -> Dict[str, Any]:
@@ -0,0 +1,6 @@
+"""
+Load Test Module
+"""
+from .harness import DEFAULT_MIX, LatencyRecorder, LoadTest, LoadTestConfig, SimulatedClient, format_report
+
+__all__ = ['DEFAULT_MIX', 'LatencyRecorder', 'LoadTest', 'LoadTestConfig', 'SimulatedClient', 'format_report']
@@ -0,0 +1,87 @@
+"""
+Load Test CLI - python -m loadtest [--clients N] [--rooms R] [--in-process] ...
+"""
+import argparse
+import asyncio
+import json
+import logging
+import socket
+from typing import Dict
+
+from .harness import DEFAULT_MIX, LoadTest, LoadTestConfig, format_report
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse 'cursor_move=0.7,chat_message=0.3'"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown event {name!r}, expected one of {sorted(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def run(args) -> dict:
+    config = LoadTestConfig(
+        url=args.url,
+        clients=args.clients,
+        rooms=args.rooms,
+        duration=args.duration,
+        rate=args.rate,
+        mix=args.mix or dict(DEFAULT_MIX),
+        connect_concurrency=args.connect_concurrency,
+        msgpack=args.msgpack,
+        seed=args.seed
+    )
+    if not args.in_process:
+        return await LoadTest(config).run()
+
+    # Serve socket_app from this process; clients and server then share one
+    # event loop, so latencies include the clients' own work
+    import uvicorn
+    from server import app
+
+    port = _free_port()
+    config.url = f'http://127.0.0.1:{port}'
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.05)
+    try:
+        return await LoadTest(config).run()
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m loadtest', description='Collaboration server load test')
+    parser.add_argument('--url', default='http://localhost:8000', help='server to test')
+    parser.add_argument('--in-process', action='store_true', help='start server:app in this process instead')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--rooms', type=int, default=5, help='projects the clients are spread over')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of steady-state load')
+    parser.add_argument('--rate', type=float, default=2.0, help='operations per client per second')
+    parser.add_argument('--mix', type=parse_mix, help='event weights, e.g. cursor_move=0.7,code_change=0.3')
+    parser.add_argument('--connect-concurrency', type=int, default=20)
+    parser.add_argument('--msgpack', action='store_true', help='negotiate MessagePack packets')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+"""
+Load Test Harness - Simulated collaborators driving the Socket.IO server to
+measure broadcast fan-out latency and throughput
+"""
+import asyncio
+import itertools
+import random
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import logging
+
+import aiohttp
+import socketio
+
+logger = logging.getLogger(__name__)
+
+# Share of operations per event type
+DEFAULT_MIX = {
+    'cursor_move': 0.6,
+    'code_change': 0.25,
+    'chat_message': 0.1,
+    'terminal_command': 0.05
+}
+
+PROBE_PATTERN = re.compile(r'probe:(\d+)')
+
+
+@dataclass
+class LoadTestConfig:
+    """Shape of a load test run"""
+    url: str = 'http://localhost:8000'
+    clients: int = 50
+    rooms: int = 5
+    duration: float = 30.0
+    # Operations per client per second (Poisson arrivals)
+    rate: float = 2.0
+    mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    connect_concurrency: int = 20
+    msgpack: bool = False
+    seed: Optional[int] = None
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, int(round(q / 100 * len(samples) + 0.5)) - 1))
+    return samples[rank]
+
+
+class LatencyRecorder:
+    """
+    Tracks probes sent by the simulated clients and the latency of every copy
+    delivered. Sender and receivers live in one process, so a probe's send time
+    is simply looked up when a copy arrives.
+    """
+
+    def __init__(self):
+        self.probes: Dict[int, tuple] = {}
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.sent: Dict[str, int] = defaultdict(int)
+        self.delivered: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._ids = itertools.count(1)
+
+    def probe(self, kind: str) -> int:
+        """Register an outgoing message and return its probe id"""
+        probe_id = next(self._ids)
+        self.probes[probe_id] = (kind, time.perf_counter())
+        self.sent[kind] += 1
+        return probe_id
+
+    def arrived(self, probe_id: int, kind: Optional[str] = None):
+        """Record one delivered copy of a probe"""
+        entry = self.probes.get(probe_id)
+        if entry is None:
+            return
+        probe_kind, sent_at = entry
+        kind = kind or probe_kind
+        self.samples[kind].append(time.perf_counter() - sent_at)
+        self.delivered[kind] += 1
+
+    def error(self, kind: str):
+        self.errors[kind] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for kind in sorted(set(self.sent) | set(self.samples) | set(self.errors)):
+            samples = sorted(self.samples.get(kind, []))
+            result[kind] = {
+                'sent': self.sent.get(kind, 0),
+                'delivered': self.delivered.get(kind, 0),
+                'errors': self.errors.get(kind, 0),
+                'deliveredPerSec': round(self.delivered.get(kind, 0) / elapsed, 1) if elapsed else 0.0,
+                'p50Ms': round(percentile(samples, 50) * 1000, 2),
+                'p95Ms': round(percentile(samples, 95) * 1000, 2),
+                'p99Ms': round(percentile(samples, 99) * 1000, 2),
+                'maxMs': round(samples[-1] * 1000, 2) if samples else 0.0
+            }
+        return result
+
+
+class SimulatedClient:
+    """One collaborator: joins a project and sends a random mix of events"""
+
+    def __init__(self, test: 'LoadTest', index: int, project: str):
+        self.test = test
+        self.recorder = test.recorder
+        self.index = index
+        self.name = f'load-{index}'
+        self.project = project
+        self.file = f'loadtest/{self.name}.txt'
+        self.sid: Optional[str] = None
+        self.is_host = False
+        self.joined = asyncio.Event()
+        self.sio = socketio.AsyncClient(
+            reconnection=False,
+            serializer='msgpack' if test.config.msgpack else 'default'
+        )
+        self._register_handlers()
+
+    def _register_handlers(self):
+        sio = self.sio
+
+        @sio.on('session_joined')
+        async def on_joined(data):
+            self.is_host = any(u.get('isLocal') and u.get('role') == 'host' for u in data.get('users', []))
+            self.joined.set()
+
+        @sio.on('presence_batch')
+        async def on_presence(data):
+            for update in data.get('updates', []):
+                probe_id = (update.get('cursor') or {}).get('probe')
+                if probe_id and update.get('userId') != self.sid:
+                    self.recorder.arrived(probe_id)
+
+        @sio.on('code_update')
+        async def on_code_update(data):
+            for line in (data.get('delta') or {}).get('newLines') or []:
+                match = PROBE_PATTERN.match(line)
+                if match:
+                    self.recorder.arrived(int(match.group(1)))
+
+        @sio.on('chat_message')
+        async def on_chat(data):
+            match = PROBE_PATTERN.match(data.get('message') or '')
+            if match and data.get('userId') != self.sid:
+                self.recorder.arrived(int(match.group(1)))
+
+        @sio.on('terminal_status')
+        async def on_terminal_status(data):
+            match = PROBE_PATTERN.search(data.get('command') or '')
+            if not match:
+                return
+            if data.get('rejected'):
+                self.recorder.error('terminal_command')
+            else:
+                self.recorder.arrived(int(match.group(1)))
+
+        # Rejected by the server's per-connection rate limits
+        @sio.on('rate_limited')
+        async def on_rate_limited(data):
+            self.recorder.error(data.get('event', 'unknown'))
+
+    async def connect(self):
+        url = self.test.config.url
+        if self.test.config.msgpack:
+            url += ('&' if '?' in url else '?') + 'serializer=msgpack'
+        await self.sio.connect(url, transports=['websocket'])
+        self.sid = self.sio.get_sid()
+
+        probe_id = self.recorder.probe('join_session')
+        await self.sio.emit('join_session', {'name': self.name, 'project': self.project})
+        await asyncio.wait_for(self.joined.wait(), timeout=10)
+        self.recorder.arrived(probe_id)
+
+    async def run(self, deadline: float):
+        config = self.test.config
+        # Only the project host may run terminal commands
+        kinds = [kind for kind in config.mix if kind != 'terminal_command' or self.is_host]
+        if not kinds:
+            return
+        weights = [config.mix[kind] for kind in kinds]
+        rng = self.test.rng
+        while True:
+            await asyncio.sleep(rng.expovariate(config.rate))
+            if time.perf_counter() >= deadline or not self.sio.connected:
+                return
+            kind = rng.choices(kinds, weights)[0]
+            try:
+                await self.send(kind)
+            except Exception as e:
+                self.recorder.error(kind)
+                logger.debug(f"{self.name} failed to send {kind}: {e}")
+
+    async def send(self, kind: str):
+        probe_id = self.recorder.probe(kind)
+        if kind == 'cursor_move':
+            await self.sio.emit('cursor_move', {
+                'cursor': {'lineNumber': 1, 'column': probe_id % 80 + 1, 'probe': probe_id}
+            })
+        elif kind == 'code_change':
+            await self.sio.emit('code_change', {
+                'file': self.file,
+                'delta': {'type': 'delta', 'start': 0, 'removeCount': 1, 'newLines': [f'probe:{probe_id}']}
+            })
+        elif kind == 'chat_message':
+            await self.sio.emit('chat_message', {
+                'userId': self.sid,
+                'userName': self.name,
+                'message': f'probe:{probe_id}'
+            })
+        elif kind == 'terminal_command':
+            await self.sio.emit('terminal_command', {'command': f'echo probe:{probe_id}'})
+        else:
+            raise ValueError(f"Unknown operation {kind}")
+
+    async def close(self):
+        if self.sio.connected:
+            await self.sio.disconnect()
+
+
+class LoadTest:
+    """
+    Connects `clients` simulated collaborators spread over `rooms` projects,
+    lets each send events at `rate` per second for `duration` seconds and
+    reports per-event fan-out latency percentiles and delivery throughput.
+
+    Fan-out latency is measured from the sender's emit to each other member of
+    the room receiving the broadcast (for terminal commands, which only the
+    host of each project sends: to the sender receiving terminal_status).
+    Cursor moves are coalesced per presence tick, so fewer of them arrive
+    than were sent by design.
+    """
+
+    def __init__(self, config: LoadTestConfig):
+        self.config = config
+        self.recorder = LatencyRecorder()
+        self.rng = random.Random(config.seed)
+        self.clients: List[SimulatedClient] = []
+
+    async def run(self) -> Dict[str, Any]:
+        config = self.config
+        rooms = max(1, config.rooms)
+        self.clients = [
+            SimulatedClient(self, i, f'loadtest-{i % rooms}')
+            for i in range(config.clients)
+        ]
+
+        connect_started = time.perf_counter()
+        limit = asyncio.Semaphore(max(1, config.connect_concurrency))
+
+        async def connect(client):
+            async with limit:
+                await client.connect()
+
+        results = await asyncio.gather(*(connect(c) for c in self.clients), return_exceptions=True)
+        failures = [r for r in results if isinstance(r, BaseException)]
+        for failure in failures[:3]:
+            logger.warning(f"Client failed to connect: {failure!r}")
+        connected = [c for c, r in zip(self.clients, results) if not isinstance(r, BaseException)]
+        connect_time = time.perf_counter() - connect_started
+
+        # Only the steady-state phase counts towards the event figures
+        join = self.recorder.summary(connect_time).pop('join_session', None)
+        self.recorder = LatencyRecorder()
+        for client in self.clients:
+            client.recorder = self.recorder
+
+        started = time.perf_counter()
+        await asyncio.gather(*(c.run(started + config.duration) for c in connected))
+        # Give in-flight broadcasts a moment to land before counting
+        await asyncio.sleep(0.5)
+        elapsed = time.perf_counter() - started
+
+        server_stats = await self._server_stats()
+        await asyncio.gather(*(c.close() for c in self.clients), return_exceptions=True)
+
+        events = self.recorder.summary(elapsed)
+        return {
+            'config': {
+                'clients': config.clients,
+                'rooms': rooms,
+                'duration': config.duration,
+                'rate': config.rate,
+                'serializer': 'msgpack' if config.msgpack else 'json'
+            },
+            'connected': len(connected),
+            'connectFailures': len(failures),
+            'connectSeconds': round(connect_time, 2),
+            'join': join,
+            'events': events,
+            'sentPerSec': round(sum(e['sent'] for e in events.values()) / elapsed, 1),
+            'deliveredPerSec': round(sum(e['delivered'] for e in events.values()) / elapsed, 1),
+            'server': server_stats
+        }
+
+    async def _server_stats(self) -> Optional[Dict[str, Any]]:
+        """Loop lag and outbound queue figures, if the server exposes them"""
+        stats = {}
+        try:
+            async with aiohttp.ClientSession() as http:
+                for key, path in (('loop', '/api/loop/stats'), ('transport', '/api/transport/stats')):
+                    async with http.get(self.config.url.rstrip('/') + path) as response:
+                        if response.status == 200:
+                            stats[key] = await response.json()
+        except Exception as e:
+            logger.debug(f"Could not read server stats: {e}")
+        if 'loop' in stats:
+            stats['loop'] = stats['loop'].get('lag')
+        return stats or None
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Human-readable table of a LoadTest.run() report"""
+    config = report['config']
+    lines = [
+        f"{report['connected']}/{config['clients']} clients in {config['rooms']} rooms "
+        f"({config['serializer']}), {config['rate']} ops/client/s for {config['duration']}s",
+        f"connect: {report['connectSeconds']}s, {report['connectFailures']} failures"
+    ]
+    if report.get('join'):
+        join = report['join']
+        lines.append(f"join: p50 {join['p50Ms']}ms p95 {join['p95Ms']}ms p99 {join['p99Ms']}ms")
+    lines.append('')
+    lines.append(f"{'event':<18}{'sent':>8}{'delivered':>11}{'errors':>8}{'deliv/s':>10}"
+                 f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for kind, stats in report['events'].items():
+        lines.append(
+            f"{kind:<18}{stats['sent']:>8}{stats['delivered']:>11}{stats['errors']:>8}"
+            f"{stats['deliveredPerSec']:>10}{stats['p50Ms']:>9}{stats['p95Ms']:>9}"
+            f"{stats['p99Ms']:>9}{stats['maxMs']:>9}"
+        )
+    lines.append('')
+    lines.append(f"throughput: {report['sentPerSec']} sent/s, {report['deliveredPerSec']} delivered/s")
+
+    server = report.get('server') or {}
+    if server.get('loop'):
+        loop = server['loop']
+        lines.append(f"server loop lag: avg {loop['avgMs']}ms max {loop['maxMs']}ms, {loop['stalls']} stalls")
+    if server.get('transport'):
+        transport = server['transport']
+        lines.append(
+            f"server outbound: max depth {transport['maxDepthSeen']}, "
+            f"dropped {sum(transport['dropped'].values())}, slow disconnects {transport['slowDisconnects']}"
+        )
+    return '\n'.join(lines)
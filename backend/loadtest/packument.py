@@ -0,0 +1,207 @@
+"""
+Packument Benchmark - python -m loadtest.packument [--versions N] [--runs R]
+
+Compares fetching npm metadata the old way (full packument, decoded whole)
+with the abbreviated, incrementally read packument the registry client uses,
+against a local stand-in registry serving a synthetic package.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from registry.npm_metadata import ABBREVIATED_ACCEPT, CHUNK_SIZE, read_packument
+from registry.registry_client import RegistryClient
+
+PACKAGE = 'bench-package'
+
+
+def build_packuments(versions: int, readme_kb: int = 64) -> Dict[str, bytes]:
+    """Full and abbreviated packuments shaped like those of a popular package"""
+    full_versions = {}
+    abbreviated_versions = {}
+    for i in range(versions):
+        number = f"{i // 100}.{i // 10 % 10}.{i % 10}"
+        dependencies = {f"dep-{j}": f"^{j}.{i % 7}.0" for j in range(12)}
+        dev_dependencies = {f"dev-dep-{j}": f"~{j}.0.{i % 5}" for j in range(20)}
+        dist = {
+            'tarball': f"https://registry.example/{PACKAGE}/-/{PACKAGE}-{number}.tgz",
+            'shasum': f"{i:040x}",
+            'integrity': f"sha512-{i:0128x}",
+            'fileCount': 40 + i % 13,
+            'unpackedSize': 100000 + i
+        }
+        full_versions[number] = {
+            'name': PACKAGE,
+            'version': number,
+            'description': 'A package used to benchmark registry metadata parsing',
+            'main': 'index.js',
+            'scripts': {'test': 'jest', 'build': 'tsc -p .', 'lint': 'eslint .'},
+            'repository': {'type': 'git', 'url': f"git+https://example.com/{PACKAGE}.git"},
+            'keywords': ['bench', 'registry', 'metadata'],
+            'author': {'name': 'Bench Author', 'email': 'author@example.com'},
+            'license': 'MIT',
+            'dependencies': dependencies,
+            'devDependencies': dev_dependencies,
+            'engines': {'node': '>=14'},
+            'gitHead': f"{i:040x}",
+            '_npmUser': {'name': 'publisher', 'email': 'publisher@example.com'},
+            'maintainers': [{'name': f"maintainer-{j}", 'email': f"m{j}@example.com"} for j in range(4)],
+            'dist': dist
+        }
+        abbreviated_versions[number] = {
+            'name': PACKAGE,
+            'version': number,
+            'dependencies': dependencies,
+            'devDependencies': dev_dependencies,
+            'engines': {'node': '>=14'},
+            'dist': dist
+        }
+    latest = number
+    full = {
+        '_id': PACKAGE,
+        'name': PACKAGE,
+        'description': 'A package used to benchmark registry metadata parsing',
+        'dist-tags': {'latest': latest},
+        'versions': full_versions,
+        'time': {number: '2024-01-01T00:00:00.000Z' for number in full_versions},
+        'maintainers': [{'name': 'publisher', 'email': 'publisher@example.com'}],
+        'readme': '# Bench package\n' + 'Lorem ipsum dolor sit amet. ' * (readme_kb * 1024 // 28),
+        'license': 'MIT'
+    }
+    abbreviated = {
+        'name': PACKAGE,
+        'modified': '2024-01-01T00:00:00.000Z',
+        'dist-tags': {'latest': latest},
+        'versions': abbreviated_versions
+    }
+    return {
+        'full': json.dumps(full).encode('utf-8'),
+        'abbreviated': json.dumps(abbreviated).encode('utf-8')
+    }
+
+
+def _serve(bodies: Dict[str, bytes], honor_accept: bool, ports: multiprocessing.Queue):
+    """Serve the packuments like registry.npmjs.org, choosing the form by Accept header"""
+    async def packument(request: web.Request) -> web.Response:
+        if honor_accept and 'application/vnd.npm.install-v1+json' in request.headers.get('Accept', ''):
+            return web.Response(body=bodies['abbreviated'], content_type='application/vnd.npm.install-v1+json')
+        return web.Response(body=bodies['full'], content_type='application/json')
+
+    async def serve():
+        app = web.Application()
+        app.router.add_get(f"/{PACKAGE}", packument)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        ports.put(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def start_registry(bodies: Dict[str, bytes], honor_accept: bool = True) -> Tuple[multiprocessing.Process, str]:
+    """
+    Run a stand-in registry in its own process, so neither its CPU time nor
+    its send buffers show up in the client's numbers
+    """
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(bodies, honor_accept, ports), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{ports.get(timeout=30)}"
+
+
+async def fetch_before(session: aiohttp.ClientSession, url: str, version: str) -> Dict[str, Any]:
+    """The client before abbreviated metadata: full document, decoded whole"""
+    async with session.get(f"{url}/{PACKAGE}") as response:
+        data = await response.json()
+    return data['versions'][version]
+
+
+async def fetch_streamed(session: aiohttp.ClientSession, url: str, version: str, accept: str) -> Dict[str, Any]:
+    async with session.get(f"{url}/{PACKAGE}", headers={'Accept': accept}) as response:
+        data = await read_packument(response.content.iter_chunked(CHUNK_SIZE), version)
+    return data['versions'][version]
+
+
+async def measure(fetch: Callable[[], Awaitable[Any]], runs: int) -> Dict[str, float]:
+    """Median/p95 latency over `runs` calls, then peak traced memory of one more call"""
+    await fetch()
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await fetch()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    tracemalloc.start()
+    try:
+        await fetch()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'medianMs': round(statistics.median(latencies), 2),
+        'p95Ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        'peakMiB': round(peak / 2 ** 20, 2)
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    bodies = build_packuments(args.versions)
+    version = '0.0.0'
+    full_registry, full_url = start_registry(bodies, honor_accept=False)
+    registry, url = start_registry(bodies)
+    client = RegistryClient(npm_url=url)
+    try:
+        async with aiohttp.ClientSession() as session:
+            scenarios = {
+                'before (full, json decode)': lambda: fetch_before(session, url, version),
+                'full, incremental read': lambda: fetch_streamed(session, full_url, version, 'application/json'),
+                'abbreviated, incremental read': lambda: fetch_streamed(session, url, version, ABBREVIATED_ACCEPT),
+                'RegistryClient (after)': lambda: client._fetch_npm_package(PACKAGE, version)
+            }
+            results = {name: await measure(fetch, args.runs) for name, fetch in scenarios.items()}
+    finally:
+        await client.close()
+        registry.terminate()
+        full_registry.terminate()
+    return {
+        'versions': args.versions,
+        'fullMiB': round(len(bodies['full']) / 2 ** 20, 2),
+        'abbreviatedMiB': round(len(bodies['abbreviated']) / 2 ** 20, 2),
+        'results': results
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"{report['versions']} versions: full packument {report['fullMiB']} MiB, "
+        f"abbreviated {report['abbreviatedMiB']} MiB",
+        f"{'scenario':<32}{'median ms':>11}{'p95 ms':>9}{'peak MiB':>10}"
+    ]
+    for name, result in report['results'].items():
+        lines.append(f"{name:<32}{result['medianMs']:>11}{result['p95Ms']:>9}{result['peakMiB']:>10}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark npm packument fetching and parsing')
+    parser.add_argument('--versions', type=int, default=3000, help='Versions in the synthetic package')
+    parser.add_argument('--runs', type=int, default=20, help='Timed fetches per scenario')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+"""
+Monitoring Module
+"""
+from .loop_monitor import HandlerStats, LoopMonitor
+
+__all__ = ['HandlerStats', 'LoopMonitor']
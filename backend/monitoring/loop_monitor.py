@@ -0,0 +1,225 @@
+"""
+Loop Monitor - Event-loop lag sampling and per-handler timing that points at
+code blocking the loop
+"""
+import asyncio
+import functools
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+import logging
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+EVENT_SECONDS = REGISTRY.histogram(
+    'flux_socket_event_duration_seconds',
+    'Socket.IO event handler latency',
+    ['event']
+)
+EVENT_ERRORS = REGISTRY.counter(
+    'flux_socket_event_errors_total',
+    'Socket.IO event handlers that raised',
+    ['event']
+)
+
+
+@dataclass
+class HandlerStats:
+    """Timing of one Socket.IO event handler"""
+    calls: int = 0
+    errors: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    # Longest stretch the handler ran without yielding to the loop
+    max_block: float = 0.0
+    blocked: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'avgMs': round(self.total_time / self.calls * 1000, 3) if self.calls else 0.0,
+            'maxMs': round(self.max_time * 1000, 3),
+            'maxBlockMs': round(self.max_block * 1000, 3),
+            'blocked': self.blocked
+        }
+
+
+class _TimedSteps:
+    """
+    Drives a coroutine step by step, timing each synchronous stretch between
+    two suspension points. A long step is time the loop could not run anything else.
+    """
+
+    def __init__(self, monitor: 'LoopMonitor', name: str, coro):
+        self.monitor = monitor
+        self.name = name
+        self.coro = coro
+        self.max_step = 0.0
+
+    def __await__(self):
+        send_value, error = None, None
+        while True:
+            self.monitor.current_handler = self.name
+            start = time.perf_counter()
+            try:
+                if error is not None:
+                    yielded = self.coro.throw(error)
+                else:
+                    yielded = self.coro.send(send_value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.monitor.current_handler = None
+                self.max_step = max(self.max_step, time.perf_counter() - start)
+
+            send_value, error = None, None
+            try:
+                send_value = yield yielded
+            except GeneratorExit:
+                self.coro.close()
+                raise
+            except BaseException as e:
+                error = e
+
+
+class LoopMonitor:
+    """
+    Watches the event loop for stalls.
+
+    A sampler task sleeps for `interval` and records how late it wakes up; the
+    excess is loop lag. A watchdog thread checks the sampler's heartbeat and,
+    when the loop has been stuck for longer than `block_threshold`, logs the
+    loop thread's current stack along with the handler that was running.
+
+    `instrument()` wraps Socket.IO event handlers to record their duration and
+    their longest uninterrupted step, and flags handlers that block.
+
+    Call start() once the loop runs (the server does so on startup); an
+    instrumented handler also starts it if that has not happened yet.
+    """
+
+    def __init__(self, interval: float = 0.1, block_threshold: float = 0.1):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.handlers: Dict[str, HandlerStats] = {}
+        self.current_handler: Optional[str] = None
+
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_avg = 0.0
+        self.samples = 0
+        self.stalls = 0
+
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start sampling on the running loop (idempotent)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        if self._watchdog is None or not self._watchdog.is_alive():
+            self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def instrument(self, name: str, handler: Callable) -> Callable:
+        """Wrap an async event handler with timing and block detection"""
+        stats = self.handlers.setdefault(name, HandlerStats())
+
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            self.start()
+            steps = _TimedSteps(self, name, handler(*args, **kwargs))
+            start = time.perf_counter()
+            try:
+                return await steps
+            except Exception:
+                stats.errors += 1
+                EVENT_ERRORS.inc(name)
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                stats.calls += 1
+                stats.total_time += elapsed
+                stats.max_time = max(stats.max_time, elapsed)
+                stats.max_block = max(stats.max_block, steps.max_step)
+                EVENT_SECONDS.observe(elapsed, name)
+                if steps.max_step >= self.block_threshold:
+                    stats.blocked += 1
+                    logger.warning(
+                        f"Handler {name} blocked the event loop for {steps.max_step * 1000:.0f}ms "
+                        f"(total {elapsed * 1000:.0f}ms)"
+                    )
+
+        return wrapper
+
+    def instrument_server(self, sio, namespace: str = '/'):
+        """Wrap every async handler registered on a Socket.IO server"""
+        handlers = sio.handlers.get(namespace, {})
+        for event, handler in list(handlers.items()):
+            if asyncio.iscoroutinefunction(handler) and not getattr(handler, '__wrapped__', None):
+                handlers[event] = self.instrument(event, handler)
+
+    def stats(self) -> Dict[str, Any]:
+        """Loop lag figures and per-handler timings"""
+        return {
+            'lag': {
+                'lastMs': round(self.lag_last * 1000, 3),
+                'avgMs': round(self.lag_avg * 1000, 3),
+                'maxMs': round(self.lag_max * 1000, 3),
+                'samples': self.samples,
+                'stalls': self.stalls
+            },
+            'handlers': {name: stats.to_dict() for name, stats in self.handlers.items()}
+        }
+
+    async def _sample(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self._heartbeat = time.monotonic()
+            self.samples += 1
+            self.lag_last = lag
+            self.lag_max = max(self.lag_max, lag)
+            # Exponential moving average over roughly the last 50 samples
+            self.lag_avg += (lag - self.lag_avg) * 0.02
+
+    def _watch(self):
+        reported = None
+        while not self._stopped.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            stuck_for = time.monotonic() - heartbeat - self.interval
+            if stuck_for < self.block_threshold or reported == heartbeat:
+                continue
+
+            reported = heartbeat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame else '<unavailable>'
+            logger.warning(
+                f"Event loop blocked for {stuck_for * 1000:.0f}ms+ "
+                f"in handler {self.current_handler or '<none>'}:\n{stack}"
+            )
@@ -1,7 +1,15 @@
 """
 Package Managers Module
 """
-from .base_manager import BasePackageManager, Package, InstallResult, DependencyConflict
+from .base_manager import (
+    BasePackageManager,
+    Package,
+    InstallResult,
+    DependencyConflict,
+    OutputLog,
+    OutputSink
+)
+from .manifest import DependencyChange, ManifestDiff, diff_dependencies, parse_dependencies
 from .npm_manager import NPMManager
 from .pip_manager import PipManager
 
@@ -10,6 +18,12 @@ __all__ = [
     'Package',
     'InstallResult',
     'DependencyConflict',
+    'OutputLog',
+    'OutputSink',
+    'DependencyChange',
+    'ManifestDiff',
+    'diff_dependencies',
+    'parse_dependencies',
     'NPMManager',
     'PipManager'
 ]
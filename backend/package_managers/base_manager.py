@@ -2,13 +2,42 @@
 Base Package Manager - Abstract interface for all package managers
 """
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any
+from typing import Awaitable, Callable, Dict, List, Optional, Any
 from dataclasses import dataclass
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Receives chunks of terminal output as they are produced
+OutputSink = Callable[[str], Awaitable[None]]
+
+
+class OutputLog(list):
+    """
+    Output lines of a command that can also be streamed to a sink.
+
+    Lines are appended as usual; `flush()` forwards the ones the sink has not
+    seen yet. Without a sink it is a plain list and `flush()` does nothing.
+    """
+
+    def __init__(self, sink: Optional[OutputSink] = None):
+        super().__init__()
+        self.sink = sink
+        self.sent = 0
+
+    async def flush(self):
+        """Send every line appended since the last flush"""
+        if self.sink is None or self.sent >= len(self):
+            return
+        chunk = '\n'.join(self[self.sent:]) + '\n'
+        self.sent = len(self)
+        await self.sink(chunk)
+
+    def unsent(self) -> List[str]:
+        """Lines the sink has not received"""
+        return self[self.sent:]
+
 
 @dataclass
 class Package:
@@ -62,9 +91,10 @@ class BasePackageManager(ABC):
         package_name: str, 
         version: Optional[str] = None,
         save_dev: bool = False,
-        global_install: bool = False
+        global_install: bool = False,
+        on_output: Optional[OutputSink] = None
     ) -> InstallResult:
-        """Install a package"""
+        """Install a package, streaming output lines to `on_output` if given"""
         pass
     
     @abstractmethod
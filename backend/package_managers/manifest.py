@@ -0,0 +1,137 @@
+"""
+Manifest Diff - Parses dependency manifests and computes which packages were
+added, removed or changed between two versions
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# Files whose edits can require an environment sync
+ENV_FILES = ['package.json', 'package-lock.json', 'requirements.txt', 'Pipfile', 'go.mod']
+
+# Manifests whose dependencies can be diffed package by package
+DIFFABLE_FILES = {'package.json': 'npm', 'requirements.txt': 'pip'}
+
+# name -> (version spec, is dev dependency)
+Dependencies = Dict[str, Tuple[str, bool]]
+
+REQUIREMENT_PATTERN = re.compile(r'^([A-Za-z0-9][A-Za-z0-9._-]*)(\[[^\]]*\])?\s*(.*)$')
+
+
+def manifest_name(path: str) -> str:
+    return path.rsplit('/', 1)[-1]
+
+
+def is_env_file(path: str) -> bool:
+    return any(path.endswith(name) for name in ENV_FILES)
+
+
+def manifest_kind(path: str) -> Optional[str]:
+    """'npm' or 'pip' for manifests that can be diffed, otherwise None"""
+    return DIFFABLE_FILES.get(manifest_name(path))
+
+
+def _normalize_pip_name(name: str) -> str:
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def parse_dependencies(path: str, content: str) -> Optional[Dependencies]:
+    """
+    Extract the dependencies declared in a manifest
+
+    Returns:
+        Dict of name -> (spec, dev), or None if the manifest cannot be parsed
+        (e.g. package.json in the middle of an edit) or is not diffable
+    """
+    kind = manifest_kind(path)
+    if kind == 'npm':
+        try:
+            data = json.loads(content or '{}')
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        deps = {}
+        for section, dev in (('devDependencies', True), ('dependencies', False)):
+            for name, spec in (data.get(section) or {}).items():
+                deps[name] = (str(spec), dev)
+        return deps
+
+    if kind == 'pip':
+        deps = {}
+        for line in (content or '').splitlines():
+            line = line.split('#', 1)[0].split(';', 1)[0].strip()
+            # Options (-r, -e, --index-url) and URLs are not package requirements
+            if not line or line.startswith('-') or '://' in line:
+                continue
+            match = REQUIREMENT_PATTERN.match(line)
+            if match:
+                deps[_normalize_pip_name(match.group(1))] = (match.group(3).replace(' ', ''), False)
+        return deps
+
+    return None
+
+
+@dataclass
+class DependencyChange:
+    """One package whose declaration differs between two manifest versions"""
+    name: str
+    old: Optional[str] = None
+    new: Optional[str] = None
+    dev: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'from': self.old, 'to': self.new, 'dev': self.dev}
+
+
+@dataclass
+class ManifestDiff:
+    """Dependency changes in one manifest since it was last synced"""
+    file: str
+    added: List[DependencyChange] = field(default_factory=list)
+    removed: List[DependencyChange] = field(default_factory=list)
+    changed: List[DependencyChange] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'added': [c.to_dict() for c in self.added],
+            'removed': [c.to_dict() for c in self.removed],
+            'changed': [c.to_dict() for c in self.changed]
+        }
+
+    def commands(self) -> List[str]:
+        """Terminal commands that apply exactly this diff"""
+        kind = manifest_kind(self.file)
+        commands = []
+        if kind == 'npm':
+            for change in self.added + self.changed:
+                spec = f"{change.name}@{change.new}" if change.new else change.name
+                commands.append(f"npm install {spec}" + (' --save-dev' if change.dev else ''))
+            for change in self.removed:
+                commands.append(f"npm uninstall {change.name}")
+        elif kind == 'pip':
+            for change in self.added + self.changed:
+                # The simulated pip only understands exact pins; anything else installs the latest
+                spec = f"{change.name}{change.new}" if change.new and change.new.startswith('==') else change.name
+                commands.append(f"python -m pip install {spec}")
+            for change in self.removed:
+                commands.append(f"python -m pip uninstall {change.name}")
+        return commands
+
+
+def diff_dependencies(path: str, old: Dependencies, new: Dependencies) -> ManifestDiff:
+    """Compare two parsed manifests"""
+    diff = ManifestDiff(file=path)
+    for name, (spec, dev) in new.items():
+        if name not in old:
+            diff.added.append(DependencyChange(name, None, spec, dev))
+        elif old[name] != (spec, dev):
+            diff.changed.append(DependencyChange(name, old[name][0], spec, dev))
+    for name, (spec, dev) in old.items():
+        if name not in new:
+            diff.removed.append(DependencyChange(name, spec, None, dev))
+    return diff
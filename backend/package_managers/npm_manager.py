@@ -6,7 +6,8 @@ import json
 import re
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-from .base_manager import BasePackageManager, Package, InstallResult
+from .base_manager import BasePackageManager, Package, InstallResult, OutputLog, OutputSink
+from registry.circuit import RegistryUnavailable
 
 import logging
 logger = logging.getLogger(__name__)
@@ -26,10 +27,11 @@ class NPMManager(BasePackageManager):
         package_name: str, 
         version: Optional[str] = None,
         save_dev: bool = False,
-        global_install: bool = False
+        global_install: bool = False,
+        on_output: Optional[OutputSink] = None
     ) -> InstallResult:
-        """Install npm package"""
-        output_lines = []
+        """Install npm package, streaming output lines to `on_output` as they are produced"""
+        output_lines = OutputLog(on_output)
         errors = []
         warnings = []
         installed_packages = []
@@ -41,6 +43,7 @@ class NPMManager(BasePackageManager):
             
             # Fetch package metadata from registry
             output_lines.append(f"\x1b[1mnpm\x1b[0m \x1b[2mhttp\x1b[0m fetch GET 200 https://registry.npmjs.org/{package_name} {self._random_ms()}ms")
+            await output_lines.flush()
             
             package_info = await self.registry_client.get_package_info(
                 "npm", package_name, version
@@ -66,6 +69,7 @@ class NPMManager(BasePackageManager):
             
             # Resolve dependencies
             output_lines.append(f"\x1b[1mnpm\x1b[0m \x1b[2mhttp\x1b[0m fetch GET 200 https://registry.npmjs.org/{package_name}/-/{package_name}-{pkg.version}.tgz {self._random_ms()}ms")
+            await output_lines.flush()
             
             all_packages = await self.resolver.resolve_dependencies(
                 pkg, self.installed_packages
@@ -94,6 +98,7 @@ class NPMManager(BasePackageManager):
                 )
                 self.installed_packages[dep_pkg.name] = dep_pkg
                 installed_packages.append(dep_pkg)
+            await output_lines.flush()
             
             # Update package.json
             await self._update_package_json(pkg, save_dev)
@@ -114,9 +119,15 @@ class NPMManager(BasePackageManager):
             else:
                 output_lines.append(f"")
                 output_lines.append(f"found \x1b[1;32m0 vulnerabilities\x1b[0m")
+            await output_lines.flush()
             
             return InstallResult(True, pkg, installed_packages, errors, warnings, output_lines)
             
+        except RegistryUnavailable as e:
+            errors.append(f"npm ERR! code EAI_AGAIN")
+            errors.append(f"npm ERR! network request to https://registry.npmjs.org/{package_name} failed: {e}")
+            errors.append(f"npm ERR! network This is a problem related to network connectivity; try again later.")
+            return InstallResult(False, None, [], errors, warnings, output_lines)
         except Exception as e:
             logger.error(f"NPM install error: {e}")
             errors.append(f"npm ERR! {str(e)}")
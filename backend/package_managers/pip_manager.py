@@ -4,7 +4,8 @@ Pip Package Manager - Simulates pip package management
 import asyncio
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-from .base_manager import BasePackageManager, Package, InstallResult
+from .base_manager import BasePackageManager, Package, InstallResult, OutputLog, OutputSink
+from registry.circuit import RegistryUnavailable
 
 import logging
 logger = logging.getLogger(__name__)
@@ -24,10 +25,11 @@ class PipManager(BasePackageManager):
         package_name: str, 
         version: Optional[str] = None,
         save_dev: bool = False,
-        global_install: bool = False
+        global_install: bool = False,
+        on_output: Optional[OutputSink] = None
     ) -> InstallResult:
-        """Install pip package"""
-        output_lines = []
+        """Install pip package, streaming output lines to `on_output` as they are produced"""
+        output_lines = OutputLog(on_output)
         errors = []
         warnings = []
         installed_packages = []
@@ -35,6 +37,7 @@ class PipManager(BasePackageManager):
         try:
             # Add initial output
             output_lines.append(f"Collecting {package_name}{('==' + version) if version else ''}")
+            await output_lines.flush()
             
             # Fetch package metadata from PyPI
             package_info = await self.registry_client.get_package_info(
@@ -57,6 +60,7 @@ class PipManager(BasePackageManager):
             )
             
             output_lines.append(f"  Downloading {package_name}-{pkg.version}-py3-none-any.whl ({self._random_size()} kB)")
+            await output_lines.flush()
             
             # Resolve dependencies
             all_packages = await self.resolver.resolve_dependencies(
@@ -80,9 +84,14 @@ class PipManager(BasePackageManager):
                 await self._update_requirements(pkg)
             
             output_lines.append(f"Successfully installed " + " ".join([f"{p.name}-{p.version}" for p in all_packages]))
+            await output_lines.flush()
             
             return InstallResult(True, pkg, installed_packages, errors, warnings, output_lines)
             
+        except RegistryUnavailable as e:
+            errors.append(f"ERROR: Could not fetch {package_name} from PyPI: {e}")
+            errors.append(f"ERROR: The package index is unreachable; try again later.")
+            return InstallResult(False, None, [], errors, warnings, output_lines)
         except Exception as e:
             logger.error(f"Pip install error: {e}")
             errors.append(f"ERROR: {str(e)}")
@@ -1,6 +1,23 @@
 """
 Registry Module
 """
+from .cache import CachedMetadata, CacheStats, LRUCache, RegistryMetadataCache, SQLiteMetadataStore
+from .circuit import CircuitBreaker, PackageNotFound, RegistryUnavailable
+from .npm_metadata import JSONStream, read_packument
 from .registry_client import RegistryClient
+from .singleflight import SingleFlight
 
-__all__ = ['RegistryClient']
+__all__ = [
+    'CachedMetadata',
+    'CacheStats',
+    'CircuitBreaker',
+    'JSONStream',
+    'LRUCache',
+    'PackageNotFound',
+    'RegistryClient',
+    'RegistryMetadataCache',
+    'RegistryUnavailable',
+    'read_packument',
+    'SingleFlight',
+    'SQLiteMetadataStore'
+]
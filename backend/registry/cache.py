@@ -0,0 +1,305 @@
+"""
+Registry Metadata Cache - Size-bounded in-memory LRU with TTL in front of a
+persistent SQLite store
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from monitoring.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CACHE_EVENTS_TOTAL = REGISTRY.counter(
+    'flux_registry_cache_events_total',
+    'Registry metadata cache lookups and evictions by tier',
+    ['tier', 'event']
+)
+
+# (registry, package name, version or 'latest')
+CacheKey = Tuple[str, str, str]
+
+
+def cache_key(registry_type: str, package_name: str, version: Optional[str] = None) -> CacheKey:
+    return (registry_type, package_name, version or 'latest')
+
+
+@dataclass
+class CachedMetadata:
+    """Package metadata with the HTTP validators of the response it came from"""
+    data: Dict[str, Any]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = field(default_factory=time.time)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers that turn a re-fetch into a revalidation"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def revalidated(self, etag: Optional[str], last_modified: Optional[str]) -> 'CachedMetadata':
+        """The same metadata, confirmed current by a 304 just now"""
+        return CachedMetadata(self.data, etag or self.etag, last_modified or self.last_modified)
+
+
+@dataclass
+class CacheStats:
+    """Counters of one cache tier"""
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        lookups = self.hits + self.misses
+        data['hitRatio'] = round(self.hits / lookups, 4) if lookups else 0.0
+        return data
+
+
+class LRUCache:
+    """
+    At most `capacity` entries, each valid for `ttl` seconds after it was
+    stored. Lookups move an entry to the most recently used end; storing past
+    capacity evicts from the least recently used end.
+
+    Expired entries are no longer returned by get() but stay until they are
+    evicted or replaced, so peek() can still hand them out for revalidation.
+    """
+
+    def __init__(self, capacity: int = 1000, ttl: float = 21600.0, tier: str = 'memory'):
+        self.capacity = max(1, capacity)
+        self.ttl = ttl
+        self.tier = tier
+        # key -> (expires at, value), least recently used first
+        self.entries: 'OrderedDict[CacheKey, Tuple[float, Any]]' = OrderedDict()
+        self.stats = CacheStats()
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self._count('misses', 'miss')
+            return None
+        if entry[0] <= time.time():
+            self._count('expirations', 'expired')
+            self._count('misses', 'miss')
+            return None
+        self.entries.move_to_end(key)
+        self._count('hits', 'hit')
+        return entry[1]
+
+    def peek(self, key: CacheKey) -> Optional[Any]:
+        """The stored value even if it expired, without touching recency or stats"""
+        entry = self.entries.get(key)
+        return entry[1] if entry else None
+
+    def set(self, key: CacheKey, value: Any, stored_at: Optional[float] = None):
+        """Store a value; `stored_at` keeps the age of a value loaded from elsewhere"""
+        expires = (stored_at or time.time()) + self.ttl
+        self.entries[key] = (expires, value)
+        self.entries.move_to_end(key)
+        self._count('writes', 'write')
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self._count('evictions', 'eviction')
+
+    def discard(self, key: CacheKey):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _count(self, field: str, event: str):
+        setattr(self.stats, field, getattr(self.stats, field) + 1)
+        CACHE_EVENTS_TOTAL.inc(self.tier, event)
+
+
+class SQLiteMetadataStore:
+    """
+    Package metadata in the `registry_cache` table, keyed by registry, name and
+    version, so a restarted worker starts warm instead of re-fetching every
+    package.
+
+    Rows older than `ttl` are not served as fresh but are kept, with their
+    validators, for revalidation until they are `retention` seconds old;
+    prune() deletes them after that. Uses the shared Database from
+    database/db.py, which is only touched once prepare() has been called.
+
+    Every method except record() blocks on SQLite; RegistryMetadataCache
+    calls them from a worker thread. They only report what happened, and the
+    caller passes that to record() back on the event loop, which is the only
+    thread that updates stats and metrics.
+    """
+
+    # Cache event -> CacheStats field it counts in
+    EVENT_FIELDS = {'hit': 'hits', 'miss': 'misses', 'expired': 'expirations', 'write': 'writes', 'eviction': 'evictions'}
+
+    def __init__(self, database, ttl: float = 21600.0, retention: float = 604800.0):
+        self.database = database
+        self.ttl = ttl
+        self.retention = max(ttl, retention)
+        self.stats = CacheStats()
+
+    def prepare(self) -> int:
+        """Bring the table up to date and prune it; returns how many rows were removed"""
+        self._migrate()
+        return self.prune()
+
+    def get(self, key: CacheKey, allow_stale: bool = False) -> Tuple[Optional[CachedMetadata], Tuple[str, ...]]:
+        """
+        Stored metadata if still fresh, or regardless of age with `allow_stale`
+
+        Returns:
+            The entry (or None) and the cache events of the lookup, to record();
+            lookups with `allow_stale` are not counted
+        """
+        try:
+            with self.database.lock:
+                row = self.database.get_connection().execute(
+                    "SELECT data, etag, last_modified, fetched_at FROM registry_cache "
+                    "WHERE registry = ? AND name = ? AND version = ?",
+                    key
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"Registry cache read error: {e}")
+            row = None
+        if allow_stale:
+            return (CachedMetadata(json.loads(row[0]), row[1], row[2], row[3]) if row else None), ()
+        if row is None:
+            return None, ('miss',)
+        if row[3] + self.ttl <= time.time():
+            return None, ('expired', 'miss')
+        return CachedMetadata(json.loads(row[0]), row[1], row[2], row[3]), ('hit',)
+
+    def set(self, key: CacheKey, entry: CachedMetadata) -> bool:
+        """Store an entry; returns whether it was written"""
+        try:
+            with self.database.lock:
+                conn = self.database.get_connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO registry_cache "
+                    "(registry, name, version, fetched_at, data, etag, last_modified) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    key + (entry.fetched_at, json.dumps(entry.data), entry.etag, entry.last_modified)
+                )
+                conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Registry cache write error: {e}")
+            return False
+
+    def prune(self) -> int:
+        """Delete rows past retention; returns how many were removed"""
+        with self.database.lock:
+            conn = self.database.get_connection()
+            cursor = conn.execute(
+                "DELETE FROM registry_cache WHERE fetched_at <= ?",
+                (time.time() - self.retention,)
+            )
+            conn.commit()
+        return cursor.rowcount
+
+    def record(self, event: str, amount: int = 1):
+        """Count a cache event in the stats and metrics; call from the event loop"""
+        field = self.EVENT_FIELDS[event]
+        setattr(self.stats, field, getattr(self.stats, field) + amount)
+        CACHE_EVENTS_TOTAL.inc('disk', event, amount=amount)
+
+    def _migrate(self):
+        """Add the validator columns to tables created before they existed"""
+        with self.database.lock:
+            conn = self.database.get_connection()
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(registry_cache)")}
+            for column in ('etag', 'last_modified'):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE registry_cache ADD COLUMN {column} TEXT")
+            conn.commit()
+
+
+class RegistryMetadataCache:
+    """
+    Two-tier cache for package metadata.
+
+    Lookups try the in-memory LRU first and fall back to the SQLite store;
+    a disk hit is promoted to memory with its original fetch time, so it
+    expires from both tiers together. Stores write through to both. The
+    store is only ever queried from a worker thread, so a memory hit costs
+    no thread hop and a disk lookup never blocks the event loop.
+
+    Entries carry the ETag and Last-Modified of their response. Once an entry
+    expires, stale() still returns it so the next fetch can be a conditional
+    request, and a 304 stores it again as fresh.
+
+    Packages the registry reported as missing are remembered in a separate,
+    short-lived `negative` LRU so repeated lookups of a typo do not go back
+    to the network; storing the package later clears the entry.
+    """
+
+    def __init__(
+        self,
+        memory: LRUCache,
+        store: Optional[SQLiteMetadataStore] = None,
+        negative: Optional[LRUCache] = None
+    ):
+        self.memory = memory
+        self.store = store
+        self.negative = negative if negative is not None else LRUCache(capacity=1000, ttl=60.0, tier='negative')
+
+    async def get(self, registry_type: str, package_name: str, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Fresh metadata, if cached"""
+        key = cache_key(registry_type, package_name, version)
+        entry = self.memory.get(key)
+        if entry is None and self.store is not None:
+            entry, events = await asyncio.to_thread(self.store.get, key)
+            for event in events:
+                self.store.record(event)
+            if entry is not None:
+                self.memory.set(key, entry, stored_at=entry.fetched_at)
+        return entry.data if entry is not None else None
+
+    async def stale(self, registry_type: str, package_name: str, version: Optional[str] = None) -> Optional[CachedMetadata]:
+        """The cached entry regardless of age, for revalidation"""
+        key = cache_key(registry_type, package_name, version)
+        entry = self.memory.peek(key)
+        if entry is None and self.store is not None:
+            entry, _ = await asyncio.to_thread(self.store.get, key, True)
+        return entry
+
+    async def set(self, registry_type: str, package_name: str, version: Optional[str], entry: CachedMetadata):
+        key = cache_key(registry_type, package_name, version)
+        self.memory.set(key, entry, stored_at=entry.fetched_at)
+        self.negative.discard(key)
+        if self.store is not None:
+            if await asyncio.to_thread(self.store.set, key, entry):
+                self.store.record('write')
+
+    def missing(self, registry_type: str, package_name: str, version: Optional[str] = None) -> bool:
+        """Whether the registry recently reported this package as not found"""
+        return self.negative.get(cache_key(registry_type, package_name, version)) is not None
+
+    def set_missing(self, registry_type: str, package_name: str, version: Optional[str] = None):
+        self.negative.set(cache_key(registry_type, package_name, version), True)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            'memory': {**self.memory.stats.to_dict(), 'entries': len(self.memory), 'capacity': self.memory.capacity}
+        }
+        if self.store is not None:
+            stats['disk'] = self.store.stats.to_dict()
+        stats['negative'] = {**self.negative.stats.to_dict(), 'entries': len(self.negative)}
+        return stats
+
+    def __len__(self) -> int:
+        return len(self.memory)
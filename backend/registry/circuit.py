@@ -0,0 +1,103 @@
+"""
+Circuit Breaker - Stops calling a registry that keeps failing and probes it
+with exponential backoff until it recovers
+"""
+import random
+import time
+from typing import Any, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class RegistryUnavailable(Exception):
+    """The registry could not answer (timeout, connection error, 5xx)"""
+
+
+class PackageNotFound(Exception):
+    """The registry answered that the package or version does not exist"""
+
+
+class CircuitBreaker:
+    """
+    Per-registry failure tracking.
+
+    Closed: calls go through; `failure_threshold` consecutive failures open
+    the circuit. Open: calls are refused without touching the network until
+    the backoff delay has passed. Half-open: exactly one probe call is let
+    through; success closes the circuit, failure opens it again with the
+    delay doubled (up to `max_delay`, with a little jitter so workers do not
+    probe in lockstep).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = CLOSED
+        self.failures = 0
+        # Consecutive times the circuit opened without recovering in between
+        self.opened = 0
+        self.retry_at = 0.0
+        self.probing = False
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go to the registry now"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() >= self.retry_at:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"Registry {self.name} recovered, closing circuit")
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.probing = False
+
+    def record_failure(self):
+        if self.state == OPEN:
+            # A call started before the circuit opened
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open()
+
+    def abandon(self):
+        """A call that was let through ended without an outcome (e.g. cancelled)"""
+        self.probing = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'retryInMs': max(0, int((self.retry_at - time.monotonic()) * 1000)) if self.state != CLOSED else 0,
+            'rejected': self.rejected
+        }
+
+    def _open(self):
+        delay = min(self.max_delay, self.base_delay * 2 ** self.opened)
+        delay *= random.uniform(0.9, 1.1)
+        self.opened += 1
+        self.state = OPEN
+        self.probing = False
+        self.retry_at = time.monotonic() + delay
+        logger.warning(f"Registry {self.name} circuit open after {self.failures} failure(s), retrying in {delay:.1f}s")
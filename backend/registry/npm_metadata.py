@@ -0,0 +1,145 @@
+"""
+npm Metadata - Requests abbreviated packuments and reads them incrementally,
+keeping only the version objects that are needed
+"""
+import codecs
+import json
+import re
+from typing import Any, AsyncIterator, Dict, Optional
+
+# Install-only metadata (no READMEs, no per-version descriptions); registries
+# that do not support it fall back to the full document
+ABBREVIATED_ACCEPT = 'application/vnd.npm.install-v1+json; q=1.0, application/json; q=0.8, */*'
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_TAIL = re.compile(r'[0-9.eE+\-]*')
+_decoder = json.JSONDecoder()
+
+
+class JSONStream:
+    """
+    Pull parser over a stream of UTF-8 byte chunks.
+
+    Only the unread part of the document is buffered. Values are decoded one
+    at a time with the C scanner of the json module; a value cut off by the
+    end of the buffer is retried once more of the stream has arrived, with
+    the read-ahead doubling so long values are still decoded in linear time.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self.chunks = chunks.__aiter__()
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    async def fill(self, at_least: int = 1) -> bool:
+        """Read at least `at_least` more characters; False once the stream is exhausted"""
+        parts = [self.buffer[self.pos:]]
+        read = 0
+        while read < at_least:
+            try:
+                chunk = await self.chunks.__anext__()
+            except StopAsyncIteration:
+                parts.append(self.decoder.decode(b'', final=True))
+                self.eof = True
+                break
+            text = self.decoder.decode(chunk)
+            parts.append(text)
+            read += len(text)
+        self.buffer = ''.join(parts)
+        self.pos = 0
+        return read > 0
+
+    async def peek(self) -> str:
+        """Next non-whitespace character, without consuming it"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not await self.fill():
+                raise ValueError('Unexpected end of JSON document')
+
+    async def expect(self, char: str):
+        found = await self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}, found '{found}'")
+        self.pos += 1
+
+    async def value(self) -> Any:
+        """Decode the next complete value"""
+        await self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # A number running up to the end of the buffer ('1', '1.', '1e')
+                # may continue in the next chunk
+                if self.eof or _NUMBER_TAIL.match(self.buffer, end).end() < len(self.buffer):
+                    self.pos = end
+                    return value
+            await self.fill(max(CHUNK_SIZE, len(self.buffer) - self.pos))
+
+    async def keys(self) -> AsyncIterator[str]:
+        """
+        Iterate over the keys of the object that starts next; the caller must
+        consume each key's value (value()) before asking for the next key
+        """
+        await self.expect('{')
+        if await self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = await self.value()
+            await self.expect(':')
+            yield key
+            separator = await self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or '}}' at offset {self.pos - 1}")
+
+
+async def read_packument(chunks: AsyncIterator[bytes], version: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Read the parts of a (full or abbreviated) packument needed to resolve one version
+
+    Args:
+        chunks: The response body as byte chunks
+        version: Requested version; the 'latest' dist-tag is kept as a fallback
+
+    Returns:
+        {'description', 'dist-tags', 'versions'} where 'versions' holds only the
+        requested and the latest version. Every other value is decoded and
+        dropped as soon as it has been read.
+    """
+    stream = JSONStream(chunks)
+    document: Dict[str, Any] = {'description': '', 'dist-tags': {}, 'versions': {}}
+
+    async for key in stream.keys():
+        if key == 'versions':
+            async for number in stream.keys():
+                latest = document['dist-tags'].get('latest')
+                # Registries send dist-tags first; if one does not, keep every
+                # version until it is known which one is latest
+                if number == version or number == latest or latest is None:
+                    document['versions'][number] = await stream.value()
+                else:
+                    await stream.value()
+        elif key in ('dist-tags', 'description'):
+            document[key] = await stream.value()
+        else:
+            await stream.value()
+
+    latest = document['dist-tags'].get('latest')
+    document['versions'] = {
+        number: data for number, data in document['versions'].items()
+        if number in (version, latest)
+    }
+    return document
@@ -2,13 +2,32 @@
 Registry Client - Interfaces with package registries (npm, PyPI)
 """
 import asyncio
+import time
 import aiohttp
-from typing import Dict, List, Optional, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 import logging
 import json
 
+from monitoring.metrics import REGISTRY
+from .cache import CachedMetadata, LRUCache, RegistryMetadataCache, cache_key
+from .circuit import CircuitBreaker, PackageNotFound, RegistryUnavailable
+from .npm_metadata import ABBREVIATED_ACCEPT, CHUNK_SIZE, read_packument
+from .singleflight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
+FETCHES_TOTAL = REGISTRY.counter(
+    'flux_registry_fetches_total',
+    'Package metadata lookups by registry and result '
+    '(hit, negative_hit, mock, miss, revalidated, not_found, error, circuit_open, shared)',
+    ['registry', 'result']
+)
+FETCH_SECONDS = REGISTRY.histogram(
+    'flux_registry_fetch_duration_seconds',
+    'Latency of package metadata fetched from the registry',
+    ['registry']
+)
+
 
 class RegistryClient:
     """Client for interacting with package registries"""
@@ -436,9 +455,31 @@ class RegistryClient:
         }
     }
     
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[RegistryMetadataCache] = None,
+        breakers: Optional[Dict[str, CircuitBreaker]] = None,
+        npm_url: str = 'https://registry.npmjs.org',
+        pypi_url: str = 'https://pypi.org/pypi'
+    ):
+        """
+        Args:
+            cache: Metadata cache for fetched packages; defaults to an
+                in-memory LRU without persistence
+            breakers: Circuit breaker per registry ('npm', 'pypi'); defaults
+                to breakers with default thresholds
+            npm_url: Base URL of the npm registry (or a local stand-in)
+            pypi_url: Base URL of the PyPI JSON API (or a local stand-in)
+        """
+        self.npm_url = npm_url.rstrip('/')
+        self.pypi_url = pypi_url.rstrip('/')
         self.session = None
-        self.cache = {}
+        self.cache = cache if cache is not None else RegistryMetadataCache(LRUCache())
+        self.breakers = breakers if breakers is not None else {
+            name: CircuitBreaker(name) for name in ('npm', 'pypi')
+        }
+        # Concurrent lookups of a package that is being fetched wait for that fetch
+        self.inflight = SingleFlight()
     
     async def get_package_info(
         self,
@@ -456,30 +497,89 @@ class RegistryClient:
         
         Returns:
             Package metadata dict or None if not found
+
+        Raises:
+            RegistryUnavailable: The registry could not be asked (its circuit
+                is open) or did not answer, so whether the package exists is
+                unknown
         """
-        cache_key = f"{registry_type}:{package_name}:{version or 'latest'}"
-        
-        if cache_key in self.cache:
-            return self.cache[cache_key]
-        
-        # Check mock data first
+        # Mock data is already in memory, so it is never cached
         if registry_type in self.MOCK_PACKAGES:
             if package_name.lower() in self.MOCK_PACKAGES[registry_type]:
-                pkg_data = self.MOCK_PACKAGES[registry_type][package_name.lower()]
-                self.cache[cache_key] = pkg_data
-                return pkg_data
+                FETCHES_TOTAL.inc(registry_type, 'mock')
+                return self.MOCK_PACKAGES[registry_type][package_name.lower()]
+
+        cached = await self.cache.get(registry_type, package_name, version)
+        if cached is not None:
+            FETCHES_TOTAL.inc(registry_type, 'hit')
+            return cached
+        if self.cache.missing(registry_type, package_name, version):
+            FETCHES_TOTAL.inc(registry_type, 'negative_hit')
+            return None
         
-        # Try real registry (with fallback)
+        key = cache_key(registry_type, package_name, version)
+        if self.inflight.running(key):
+            FETCHES_TOTAL.inc(registry_type, 'shared')
+        return await self.inflight.do(key, lambda: self._fetch(registry_type, package_name, version))
+
+    async def _fetch(
+        self,
+        registry_type: str,
+        package_name: str,
+        version: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Fetch from the real registry unless its circuit is open, and cache the outcome
+
+        Raises:
+            RegistryUnavailable: The circuit is open or the fetch failed
+        """
+        breaker = self.breakers.get(registry_type)
+        if breaker is None:
+            return None
+        if not breaker.allow():
+            FETCHES_TOTAL.inc(registry_type, 'circuit_open')
+            retry_in = breaker.to_dict()['retryInMs'] / 1000
+            raise RegistryUnavailable(f"{registry_type} registry is unavailable, retrying in {retry_in:.0f}s")
+
+        # An expired entry is revalidated rather than downloaded again
+        stale = await self.cache.stale(registry_type, package_name, version)
+        entry = None
+        result = 'error'
+        failure = None
+        start = time.perf_counter()
         try:
             if registry_type == 'npm':
-                return await self._fetch_npm_package(package_name, version)
-            elif registry_type == 'pypi':
-                return await self._fetch_pypi_package(package_name, version)
+                entry = await self._fetch_npm_package(package_name, version, stale)
+            else:
+                entry = await self._fetch_pypi_package(package_name, version, stale)
+            breaker.record_success()
+            result = 'revalidated' if stale is not None and entry.data is stale.data else 'miss'
+        except PackageNotFound:
+            # The registry is healthy; the package just does not exist
+            breaker.record_success()
+            self.cache.set_missing(registry_type, package_name, version)
+            result = 'not_found'
+        except asyncio.CancelledError:
+            breaker.abandon()
+            raise
         except Exception as e:
-            logger.error(f"Error fetching from {registry_type}: {e}")
-        
-        return None
-    
+            breaker.record_failure()
+            logger.warning(f"Failed to fetch {registry_type} package {package_name}: {e}")
+            failure = e
+        FETCH_SECONDS.observe(time.perf_counter() - start, registry_type)
+        FETCHES_TOTAL.inc(registry_type, result)
+
+        if failure is not None:
+            if isinstance(failure, RegistryUnavailable):
+                raise failure
+            raise RegistryUnavailable(f"{registry_type} registry request failed: {failure}") from failure
+
+        if entry is None:
+            return None
+        await self.cache.set(registry_type, package_name, version, entry)
+        return entry.data
+
     async def search(
         self,
         registry_type: str,
@@ -509,83 +609,122 @@ class RegistryClient:
         
         return results
     
+    async def _get_json(
+        self,
+        url: str,
+        cached: Optional[CachedMetadata] = None,
+        accept: str = 'application/json',
+        parse: Optional[Callable[[aiohttp.ClientResponse], Awaitable[Dict[str, Any]]]] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[str]]:
+        """
+        GET a registry JSON document, conditionally if a cached copy has validators
+
+        Args:
+            url: Document URL
+            cached: Cached copy to revalidate
+            accept: Accept header, e.g. to ask for an abbreviated document
+            parse: Reads the body of a 200 response; defaults to decoding it whole
+
+        Returns:
+            (document, ETag, Last-Modified); the document is None when the
+            registry answered 304 Not Modified
+
+        Raises:
+            PackageNotFound: The registry answered 404
+            RegistryUnavailable: Timeout, connection error or any other status
+        """
+        if not self.session:
+            self.session = aiohttp.ClientSession()
+        headers = {'Accept': accept, **(cached.conditional_headers() if cached else {})}
+        try:
+            async with self.session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                if response.status == 304 and cached:
+                    return None, etag, last_modified
+                if response.status == 404:
+                    raise PackageNotFound(url)
+                if response.status != 200:
+                    raise RegistryUnavailable(f"HTTP {response.status} from {url}")
+                document = await parse(response) if parse else await response.json()
+                return document, etag, last_modified
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise RegistryUnavailable(f"{type(e).__name__} fetching {url}: {e}") from e
+
     async def _fetch_npm_package(
         self,
         package_name: str,
-        version: Optional[str] = None
-    ) -> Optional[Dict[str, Any]]:
-        """Fetch package info from npm registry"""
-        url = f"https://registry.npmjs.org/{package_name}"
-        
-        try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
-            async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    # Get specific version or latest
-                    if version and version in data.get('versions', {}):
-                        version_data = data['versions'][version]
-                    else:
-                        latest_version = data.get('dist-tags', {}).get('latest')
-                        version_data = data.get('versions', {}).get(latest_version, {})
-                    
-                    return {
-                        'name': package_name,
-                        'version': version_data.get('version', version or '0.0.0'),
-                        'description': version_data.get('description', ''),
-                        'dependencies': version_data.get('dependencies', {}),
-                        'devDependencies': version_data.get('devDependencies', {})
-                    }
-        except Exception as e:
-            logger.warning(f"Failed to fetch npm package {package_name}: {e}")
-        
-        return None
+        version: Optional[str] = None,
+        cached: Optional[CachedMetadata] = None
+    ) -> CachedMetadata:
+        """
+        Fetch package info from npm registry, revalidating `cached` if given
+
+        Asks for the abbreviated (install-only) packument and reads it as it
+        arrives, keeping just the requested and latest version objects: a full
+        packument of a popular package runs to tens of megabytes, almost all
+        of it other versions and READMEs.
+        """
+        data, etag, last_modified = await self._get_json(
+            f"{self.npm_url}/{package_name}",
+            cached,
+            accept=ABBREVIATED_ACCEPT,
+            parse=lambda response: read_packument(response.content.iter_chunked(CHUNK_SIZE), version)
+        )
+        if data is None:
+            return cached.revalidated(etag, last_modified)
+
+        # Get specific version or latest
+        if version and version in data.get('versions', {}):
+            version_data = data['versions'][version]
+        else:
+            latest_version = data.get('dist-tags', {}).get('latest')
+            version_data = data.get('versions', {}).get(latest_version, {})
+
+        return CachedMetadata({
+            'name': package_name,
+            'version': version_data.get('version', version or '0.0.0'),
+            # Abbreviated packuments carry no descriptions; full ones have a top-level one
+            'description': version_data.get('description') or data.get('description') or '',
+            'dependencies': version_data.get('dependencies', {}),
+            'devDependencies': version_data.get('devDependencies', {})
+        }, etag, last_modified)
     
     async def _fetch_pypi_package(
         self,
         package_name: str,
-        version: Optional[str] = None
-    ) -> Optional[Dict[str, Any]]:
-        """Fetch package info from PyPI"""
+        version: Optional[str] = None,
+        cached: Optional[CachedMetadata] = None
+    ) -> CachedMetadata:
+        """Fetch package info from PyPI, revalidating `cached` if given"""
         if version:
-            url = f"https://pypi.org/pypi/{package_name}/{version}/json"
+            url = f"{self.pypi_url}/{package_name}/{version}/json"
         else:
-            url = f"https://pypi.org/pypi/{package_name}/json"
-        
-        try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
-            async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    info = data.get('info', {})
-                    
-                    # Parse dependencies from requires_dist
-                    dependencies = {}
-                    for req in info.get('requires_dist', []) or []:
-                        if ';' in req:  # Skip conditional dependencies
-                            req = req.split(';')[0].strip()
-                        match = req.split('(')[0].strip() if '(' in req else req
-                        parts = match.split()
-                        if parts:
-                            dep_name = parts[0]
-                            dep_version = parts[1] if len(parts) > 1 else '*'
-                            dependencies[dep_name] = dep_version
-                    
-                    return {
-                        'name': package_name,
-                        'version': info.get('version', version or '0.0.0'),
-                        'description': info.get('summary', ''),
-                        'dependencies': dependencies
-                    }
-        except Exception as e:
-            logger.warning(f"Failed to fetch PyPI package {package_name}: {e}")
-        
-        return None
+            url = f"{self.pypi_url}/{package_name}/json"
+
+        data, etag, last_modified = await self._get_json(url, cached)
+        if data is None:
+            return cached.revalidated(etag, last_modified)
+        info = data.get('info', {})
+
+        # Parse dependencies from requires_dist
+        dependencies = {}
+        for req in info.get('requires_dist', []) or []:
+            if ';' in req:  # Skip conditional dependencies
+                req = req.split(';')[0].strip()
+            match = req.split('(')[0].strip() if '(' in req else req
+            parts = match.split()
+            if parts:
+                dep_name = parts[0]
+                dep_version = parts[1] if len(parts) > 1 else '*'
+                dependencies[dep_name] = dep_version
+
+        return CachedMetadata({
+            'name': package_name,
+            'version': info.get('version', version or '0.0.0'),
+            'description': info.get('summary', ''),
+            'dependencies': dependencies
+        }, etag, last_modified)
     
     async def close(self):
         """Close the HTTP session"""
@@ -0,0 +1,75 @@
+"""
+Single Flight - Coalesces concurrent calls for the same key into one shared
+in-flight task
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; callers arriving while it is in
+    flight await the same task instead of starting their own.
+
+    Every caller sees the shared outcome: the result, or the exception the
+    call raised. Nothing is remembered once the call finishes, so the next
+    caller after a failure tries again.
+
+    Cancelling one caller only stops that caller's wait. The shared call is
+    cancelled when its last caller gives up, and cancelling the call itself
+    (e.g. on shutdown) cancels every caller.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, _Call] = {}
+        self.started = 0
+        self.shared = 0
+
+    def running(self, key: Hashable) -> bool:
+        return key in self.calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn() for `key`, joining a call already in flight if there is one"""
+        call = self.calls.get(key)
+        if call is None or call.task.done():
+            call = self.calls[key] = _Call(asyncio.get_running_loop().create_task(fn()))
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+            self.started += 1
+        else:
+            self.shared += 1
+
+        call.waiters += 1
+        try:
+            # Shielded so one caller's cancellation does not cancel the others' call
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # Forget the dying call now, so a caller arriving before its
+                # done callback runs starts afresh instead of joining it
+                if self.calls.get(key) is call:
+                    del self.calls[key]
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {'inFlight': len(self.calls), 'started': self.started, 'shared': self.shared}
+
+    def _finished(self, key: Hashable, call: _Call):
+        if self.calls.get(key) is call:
+            del self.calls[key]
+        # Mark the exception retrieved even if every caller already left
+        if not call.task.cancelled() and call.task.exception() and not call.waiters:
+            logger.debug(f"Call for {key} failed with no callers left: {call.task.exception()}")
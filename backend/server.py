@@ -1,9 +1,10 @@
 import os
+import time
 import asyncio
 import logging
 from datetime import datetime
 import socketio
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from starlette.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
@@ -11,12 +12,25 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import package management modules
-from filesystem.virtual_fs import VirtualFileSystem
 from registry.registry_client import RegistryClient
+from registry.cache import LRUCache, RegistryMetadataCache, SQLiteMetadataStore
+from registry.circuit import CircuitBreaker
 from dependency.resolver import DependencyResolver
-from package_managers.npm_manager import NPMManager
-from package_managers.pip_manager import PipManager
-from commands.executor import CommandExecutor
+from collaboration.document import StaleRevisionError
+from commands.scheduler import JobRejected, JobScheduler
+from collaboration.activity import ActivityBatcher, SQLiteActivitySpill
+from collaboration.chat import SQLiteChatStore
+from collaboration.env_sync import EnvSyncDetector
+from collaboration.presence import PresenceAggregator
+from collaboration.session import SessionLimitError, SessionState, SessionRegistry
+from collaboration.snapshot import WorkspaceSnapshotter
+from cluster.bus import create_client_manager
+from cluster.state import create_state_backend
+from cluster.workers import WorkerHeartbeat
+from transport.serializer import FileContent, NegotiatingManager, NegotiatingServer
+from transport.ratelimit import DEFAULT_COALESCED, DEFAULT_LIMITS, EventRateLimiter, parse_limits
+from monitoring.loop_monitor import LoopMonitor
+from monitoring.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,29 +49,251 @@ except Exception as e:
     ai_service = None
     logger.warning(f"AI Assistant disabled: {str(e)}")
 
-# Create Socket.IO server
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+# Create Socket.IO server; with a message bus configured, room broadcasts
+# also reach clients connected to the other workers. Clients connecting with
+# ?serializer=msgpack get MessagePack packets, everyone else JSON. Each client
+# gets a bounded send queue so a slow one cannot hold up its room.
+sio = NegotiatingServer(
+    async_mode='asgi',
+    cors_allowed_origins='*',
+    client_manager=create_client_manager(os.getenv('MESSAGE_BUS_URL'), NegotiatingManager),
+    outbound_options={
+        'max_queue': int(os.getenv('OUTBOUND_MAX_QUEUE', '256')),
+        'max_backlog': int(os.getenv('OUTBOUND_MAX_BACKLOG', '2048')),
+        'max_in_flight': int(os.getenv('OUTBOUND_MAX_IN_FLIGHT', '16'))
+    }
+)
 app = FastAPI()
 
-# Initialize package management system
-virtual_fs = VirtualFileSystem()
-registry_client = RegistryClient()
+# Project rosters are kept here so every worker sees the same users and host
+state_backend = create_state_backend(os.getenv('STATE_BACKEND_URL'))
+# Roster entries are leased to the worker holding the connection; entries of a
+# worker that stopped heartbeating (crashed or restarted) are pruned
+heartbeat = WorkerHeartbeat(
+    state_backend,
+    interval=int(os.getenv('WORKER_HEARTBEAT_MS', '10000')) / 1000,
+    ttl=int(os.getenv('WORKER_LEASE_TTL_S', '30'))
+)
+
+# Activity beyond the in-memory ring buffer is either dropped or spilled to SQLite;
+# chat history and fetched registry metadata are kept in the same database, a
+# file under DATA_DIR that is opened on startup rather than on import
+database = None
+activity_spill = None
+chat_store = None
+metadata_store = None
+spill_activity = os.getenv('ACTIVITY_SPILL', 'false').lower() == 'true'
+persist_chat = os.getenv('CHAT_PERSIST', 'true').lower() == 'true'
+persist_registry = os.getenv('REGISTRY_CACHE_PERSIST', 'true').lower() == 'true'
+registry_cache_ttl = int(os.getenv('REGISTRY_CACHE_TTL_S', '21600'))
+if spill_activity or persist_chat or persist_registry:
+    from database.db import db as database
+    database.db_path = os.path.join(os.getenv('DATA_DIR', 'data'), 'flux_ide.db')
+    if spill_activity:
+        activity_spill = SQLiteActivitySpill(database)
+    if persist_chat:
+        chat_store = SQLiteChatStore(database, window=int(os.getenv('CHAT_FLUSH_MS', '500')) / 1000)
+    if persist_registry:
+        metadata_store = SQLiteMetadataStore(
+            database,
+            ttl=registry_cache_ttl,
+            retention=int(os.getenv('REGISTRY_CACHE_RETENTION_S', '604800'))
+        )
+
+def open_database() -> int:
+    """Create the schema (and the data directory) and prune stale registry rows; returns how many were pruned"""
+    os.makedirs(os.path.dirname(database.db_path) or '.', exist_ok=True)
+    database.initialize()
+    if not metadata_store:
+        return 0
+    pruned = metadata_store.prepare()
+    if pruned:
+        logger.info(f"Pruned {pruned} registry cache row(s) past retention")
+    return pruned
+
+# Registry access is shared by every project so its cache is too. Packages a
+# registry reports missing are remembered briefly, and a registry that keeps
+# failing is skipped until a backed-off probe succeeds
+registry_client = RegistryClient(
+    RegistryMetadataCache(
+        LRUCache(capacity=int(os.getenv('REGISTRY_CACHE_SIZE', '1000')), ttl=registry_cache_ttl),
+        store=metadata_store,
+        negative=LRUCache(
+            capacity=int(os.getenv('REGISTRY_CACHE_SIZE', '1000')),
+            ttl=int(os.getenv('REGISTRY_NEGATIVE_TTL_S', '60')),
+            tier='negative'
+        )
+    ),
+    breakers={
+        name: CircuitBreaker(
+            name,
+            failure_threshold=int(os.getenv('REGISTRY_BREAKER_FAILURES', '5')),
+            base_delay=int(os.getenv('REGISTRY_BREAKER_BASE_MS', '1000')) / 1000,
+            max_delay=int(os.getenv('REGISTRY_BREAKER_MAX_MS', '60000')) / 1000
+        )
+        for name in ('npm', 'pypi')
+    },
+    npm_url=os.getenv('NPM_REGISTRY_URL', 'https://registry.npmjs.org'),
+    pypi_url=os.getenv('PYPI_REGISTRY_URL', 'https://pypi.org/pypi')
+)
 dependency_resolver = DependencyResolver(registry_client)
-npm_manager = NPMManager(virtual_fs, registry_client, dependency_resolver)
-pip_manager = PipManager(virtual_fs, registry_client, dependency_resolver)
-command_executor = CommandExecutor(npm_manager, pip_manager, virtual_fs)
 
-# Store active users and sessions
-active_users = {}
-project_host = None
-activity_logs = []
+# With SNAPSHOT_DIR set, sessions are periodically written to disk and a
+# restarted worker restores each project from its image on first use
+snapshots = None
+
+def create_session(project_id):
+    """Build the isolated state (files, package managers, documents) for a project"""
+    session = SessionState(
+        project_id,
+        registry_client,
+        dependency_resolver,
+        snapshot_interval=int(os.getenv('DOC_SNAPSHOT_INTERVAL', '100')),
+        max_op_log=int(os.getenv('DOC_MAX_OP_LOG', '1000')),
+        state_backend=state_backend,
+        activity_capacity=int(os.getenv('ACTIVITY_LOG_CAPACITY', '500')),
+        activity_page_size=int(os.getenv('ACTIVITY_PAGE_SIZE', '50')),
+        activity_spill=activity_spill,
+        suggestion_ttl=int(os.getenv('AI_SUGGESTION_TTL_S', '600')),
+        suggestion_capacity=int(os.getenv('AI_SUGGESTION_CAPACITY', '50')),
+        chat_capacity=int(os.getenv('CHAT_TAIL_SIZE', '200')),
+        chat_page_size=int(os.getenv('CHAT_PAGE_SIZE', '50')),
+        chat_store=chat_store,
+        heartbeat=heartbeat
+    )
+    return session
+
+# Every project gets its own Socket.IO room and SessionState; sessions nobody
+# has been in for SESSION_IDLE_TTL_S are snapshotted and unloaded
+sessions = SessionRegistry(
+    create_session,
+    idle_ttl=int(os.getenv('SESSION_IDLE_TTL_S', '1800')),
+    max_sessions=int(os.getenv('MAX_SESSIONS', '1000'))
+)
+eviction_task = None
+
+if os.getenv('SNAPSHOT_DIR'):
+    snapshots = WorkspaceSnapshotter(
+        sessions,
+        os.getenv('SNAPSHOT_DIR'),
+        interval=int(os.getenv('SNAPSHOT_INTERVAL_MS', '5000')) / 1000
+    )
+    sessions.restore = snapshots.restore
+
+# Terminal commands run as jobs, bounded per project and overall, with free
+# slots handed out to projects in turn
+scheduler = JobScheduler(
+    max_concurrent=int(os.getenv('TERMINAL_MAX_JOBS', '8')),
+    max_per_session=int(os.getenv('TERMINAL_MAX_JOBS_PER_SESSION', '1')),
+    max_queued_per_session=int(os.getenv('TERMINAL_MAX_QUEUED_PER_SESSION', '16'))
+)
+
+# Samples event-loop lag and times every event handler; handlers are wrapped
+# once all of them are registered, at the bottom of this module
+loop_monitor = LoopMonitor(
+    interval=int(os.getenv('LOOP_LAG_INTERVAL_MS', '100')) / 1000,
+    block_threshold=int(os.getenv('LOOP_BLOCK_THRESHOLD_MS', '100')) / 1000
+)
+
+async def notify_rate_limited(sid, error):
+    await sio.emit('rate_limited', error, to=sid)
+    if error['event'] != 'code_change' or not error.get('file'):
+        return
+
+    # The rejected edit never reached the document, so the sender's base is
+    # now ahead of the server; hand it the head to rebase its edits on
+    session = sessions.for_sid(sid)
+    if session is None:
+        return
+    await broadcast_outside_writes(session)
+    doc = session.documents.get(error['file'])
+    await sio.emit('code_resync', {
+        'file': error['file'],
+        'content': FileContent(doc.content),
+        'revision': doc.revision,
+        'retryAfterMs': error['retryAfterMs']
+    }, to=sid)
+
+# Per-connection token buckets in front of the handlers clients can flood;
+# RATE_LIMITS overrides individual events, e.g. "cursor_move=60/60"
+rate_limiter = EventRateLimiter(
+    {**parse_limits(DEFAULT_LIMITS), **parse_limits(os.getenv('RATE_LIMITS', ''))},
+    coalesce=DEFAULT_COALESCED,
+    notify=notify_rate_limited
+)
+
+GIT_OP_SECONDS = REGISTRY.histogram(
+    'flux_git_operation_duration_seconds',
+    'Git operation latency',
+    ['operation']
+)
+GIT_OPS_TOTAL = REGISTRY.counter(
+    'flux_git_operations_total',
+    'Git operations by outcome (success, failure, error)',
+    ['operation', 'status']
+)
+
+def _cache_entries():
+    loaded = list(sessions.sessions.values())
+    return {
+        ('registry',): len(registry_client.cache),
+        ('documents',): sum(len(s.documents.documents) for s in loaded),
+        ('op_log',): sum(len(doc.history) for s in loaded for doc in s.documents.documents.values()),
+        ('activity',): sum(len(s.activity_logs.entries) for s in loaded)
+    }
+
+REGISTRY.gauge('flux_active_users', 'Clients joined to a project on this worker',
+               lambda: len(sessions.sid_projects))
+REGISTRY.gauge('flux_rooms', 'Projects with at least one client on this worker',
+               lambda: len(set(sessions.sid_projects.values())))
+REGISTRY.gauge('flux_sessions', 'Project sessions loaded on this worker', lambda: len(sessions))
+REGISTRY.gauge('flux_vfs_bytes', 'UTF-8 size of all virtual filesystem files',
+               lambda: sum(len(content.encode('utf-8'))
+                           for s in sessions.sessions.values()
+                           for content in s.virtual_fs.files.values()))
+REGISTRY.gauge('flux_cache_entries', 'Entries held in in-memory caches', _cache_entries, ['cache'])
+REGISTRY.gauge('flux_registry_circuit_open', 'Whether calls to a registry are being refused (1) or not (0)',
+               lambda: {(name,): int(b.state == 'open') for name, b in registry_client.breakers.items()},
+               ['registry'])
+
+async def emit_to_room(event, payload, room):
+    await sio.emit(event, payload, room=room)
+
+# Manifest edits raise env_sync_required only once they settle and only if
+# the dependencies actually changed
+env_sync = EnvSyncDetector(
+    emit_to_room,
+    debounce=int(os.getenv('ENV_SYNC_DEBOUNCE_MS', '1000')) / 1000
+)
+
+async def emit_activity(batch, room):
+    await sio.emit('activity_batch', batch, room=room)
+
+# Activity entries are broadcast (and spilled) in batches per room
+activity = ActivityBatcher(
+    emit_activity,
+    window=int(os.getenv('ACTIVITY_BATCH_MS', '250')) / 1000
+)
+
+async def emit_presence(batch, room=None):
+    await sio.emit('presence_batch', batch, room=room)
+
+# Cursor/typing updates are coalesced and flushed once per tick
+presence = PresenceAggregator(
+    emit_presence,
+    tick_interval=int(os.getenv('PRESENCE_TICK_MS', '40')) / 1000
+)
 
 import uuid
 
-async def log_activity(action, details=None, user_id=None):
+def log_activity(action, details=None, user_id=None, session=None):
+    session = session or sessions.for_sid(user_id)
+    if session is None:
+        return
+
     user_name = 'System'
-    if user_id and user_id in active_users:
-        user_name = active_users[user_id]['name']
+    if user_id and user_id in session.users:
+        user_name = session.users[user_id]['name']
     
     log = {
         'id': str(uuid.uuid4()),
@@ -68,9 +304,8 @@ async def log_activity(action, details=None, user_id=None):
         'userName': user_name
     }
     
-    activity_logs.append(log)
-    # Broadcast to all clients
-    await sio.emit('activity_update', log)
+    # Recorded now, broadcast to the project's room with the next batch
+    activity.add(session.activity_logs, session.room, log)
 
 user_colors = [
     {'color': '#3B82F6', 'name': 'blue'},
@@ -98,84 +333,197 @@ async def connect(sid, environ):
 
 @sio.event
 async def join_session(sid, data):
-    global project_host
-    user_name = data.get('name', f'User-{len(active_users) + 1}')
-    color = user_colors[len(active_users) % len(user_colors)]
-    avatar = get_avatar_url(len(active_users))
-    
-    # Assign Roles: First user is Host, others are Members
-    if not project_host:
-        project_host = sid
-        role = 'host'
-    else:
-        role = 'member'
+    project_id = str(data.get('project') or 'default')
+
+    # Switching projects on the same connection leaves the old room first
+    current = sessions.for_sid(sid)
+    if current and current.project_id != project_id:
+        await leave_session(sid)
 
+    try:
+        session = await sessions.join(sid, project_id)
+    except (ValueError, SessionLimitError) as e:
+        logger.warning(f"Refused join of {sid} to {project_id[:80]}: {e}")
+        await sio.emit('session_error', {'project': project_id, 'error': str(e)}, to=sid)
+        return
+    await sio.enter_room(sid, session.room)
+    await session.refresh()
+    # Sequence numbers of the entries logged below continue from the spill
+    try:
+        await session.activity_logs.load()
+    except Exception as e:
+        logger.error(f"Activity spill read error for {project_id}: {e}")
+
+    user_name = data.get('name', f'User-{len(session.users) + 1}')
+    color = user_colors[len(session.users) % len(user_colors)]
+    avatar = get_avatar_url(len(session.users))
     initial_cursor = data.get('cursor', {'lineNumber': 1, 'column': 1})
     
-    active_users[sid] = {
+    # Assign Roles: First user is Host, others are Members
+    user, roster_version = await session.add_user(sid, {
         'id': sid,
         'name': user_name,
         'color': color,
         'avatar': avatar,
         'cursor': initial_cursor,
-        'isTyping': False,
-        'role': role
-    }
-    
-    logger.info(f"User joined: {user_name} ({sid}) as {role}")
+        'isTyping': False
+    })
     
-    await log_activity('joined the session', user_id=sid)
+    logger.info(f"User joined {project_id}: {user_name} ({sid}) as {user['role']}")
     
+    # The roster list has to match roster_version; later joins and leaves
+    # reach this client as diffs
+    users = session.user_list(local_sid=sid)
+    log_activity('joined the session', user_id=sid)
+
+    # Only the latest page of activity; older pages come from get_activity_logs
+    activity = await session.activity_logs.page()
     await sio.emit('session_joined', {
         'userId': sid,
-        'users': [{**user, 'id': uid, 'isLocal': uid == sid} for uid, user in active_users.items()],
-        'activityLogs': activity_logs
+        'project': project_id,
+        'users': users,
+        'rosterVersion': roster_version,
+        'activityLogs': activity['logs'],
+        'activityCursor': activity['cursor'],
+        'activityHasMore': activity['hasMore'],
+        'documents': session.documents.revisions(),
+        'aiSuggestions': [s.to_dict(len(session.users)) for s in session.ai_suggestions.active()]
     }, to=sid)
     
-    # Broadcast new user to others (legacy, keeping for safety)
-    await sio.emit('user_joined', {**active_users[sid], 'id': sid}, skip_sid=sid)
-
-    # Broadcast full updated list to everyone (Best Practice)
-    # Note: isLocal is NOT sent here because it depends on the receiver.
-    await sio.emit('users_update', {
-        'users': [{**user, 'id': uid} for uid, user in active_users.items()]
-    })
+    # Everyone else only gets the new entry, keyed by roster version
+    await sio.emit('roster_diff', {
+        'version': roster_version,
+        'added': [{**user, 'id': sid}]
+    }, room=session.room, skip_sid=sid)
+
+async def leave_session(sid):
+    """Remove a client from its project, handing the host role over if needed"""
+    session = sessions.leave(sid)
+    if session is None or sid not in session.users:
+        return
 
-def check_permission(sid, required_role='host'):
-    user = active_users.get(sid)
-    if not user:
+    user_name = session.users[sid]['name']
+    log_activity('left the session', user_id=sid, session=session)
+
+    new_host, roster_version = await session.remove_user(sid)
+    new_host_name = session.users[new_host]['name'] if new_host else None
+    presence.discard(sid, room=session.room)
+    await sio.leave_room(sid, session.room)
+
+    # Role Handover if Host leaves
+    if new_host:
+        logger.info(f"Host handed over to: {new_host_name}")
+        log_activity(f"became project host (handover)", user_id=new_host)
+
+    logger.info(f"User left {session.project_id}: {user_name} ({sid})")
+    diff = {'version': roster_version, 'removed': [sid]}
+    if new_host:
+        diff['modified'] = [{'id': new_host, 'role': 'host'}]
+    await sio.emit('roster_diff', diff, room=session.room)
+
+    # Open votes are decided against the members still present
+    withdrawn = {s.id for s in session.ai_suggestions.withdraw_votes(sid)}
+    for suggestion in session.ai_suggestions.active():
+        if suggestion.id in withdrawn:
+            await sio.emit('ai_suggestion_update', suggestion.to_dict(len(session.users)), room=session.room)
+        await decide_suggestion(session, suggestion)
+
+async def broadcast_outside_writes(session):
+    """Send the room the edits folded in from writes made outside the editor (e.g. npm rewriting package.json)"""
+    for path, op in session.documents.pick_up_outside_writes():
+        await sio.emit('code_update', {
+            'userId': None,
+            'operation': 'delta',
+            'file': path,
+            'delta': op.to_delta(),
+            'revision': op.revision
+        }, room=session.room)
+
+async def check_permission(sid, required_role='host'):
+    session = sessions.for_sid(sid)
+    if not session:
         return False
-    if user.get('role') != required_role:
-        return False
-    return True
+    return await session.has_role(sid, required_role)
+
+async def run_terminal_command(sid, session, command):
+    """
+    Run a command for a client as a scheduled job, streaming output chunks as
+    they are produced and finishing with a terminal_status event
+
+    `command` may also be a list of commands, run in order as one job until
+    the first one fails.
+
+    Returns:
+        The executor result, or None if the job was rejected or interrupted
+    """
+    commands = [command] if isinstance(command, str) else list(command)
+    command = ' && '.join(commands)
+
+    async def send_chunk(chunk):
+        await sio.emit('terminal_output', {'output': chunk, 'partial': True}, to=sid)
+
+    async def execute():
+        # Execute command against up-to-date file contents
+        session.documents.flush()
+        for step in commands:
+            if len(commands) > 1:
+                await send_chunk(f"$ {step}\n")
+            try:
+                result = await session.command_executor.execute(step, on_output=send_chunk)
+            finally:
+                # Installed packages are not counted by any generation counter
+                session.touch()
+
+            output = result['output']
+            if result['error']:
+                output += result['error']
+            if output:
+                await send_chunk(output)
+            if not result['success']:
+                break
+        return result
+
+    try:
+        job = scheduler.submit(session.project_id, execute, name=command, owner=sid)
+    except JobRejected:
+        await send_chunk("\x1b[1;31mToo many commands queued for this project, try again shortly.\x1b[0m\n")
+        await sio.emit('terminal_status', {'command': command, 'success': False, 'rejected': True}, to=sid)
+        return None
+
+    if not job.slot.done():
+        await send_chunk("\x1b[2mWaiting for a free job slot...\x1b[0m\n")
+
+    try:
+        result = await job.task
+    except asyncio.CancelledError:
+        if job.state != 'cancelled':
+            raise
+        await broadcast_outside_writes(session)
+        await send_chunk("^C\n")
+        await sio.emit('terminal_status', {'command': command, 'success': False, 'interrupted': True}, to=sid)
+        return None
+
+    # Package managers may have rewritten open files (package.json, lock files)
+    await broadcast_outside_writes(session)
+    await sio.emit('terminal_status', {'command': command, 'success': result['success']}, to=sid)
+    return result
 
 @sio.event
 async def terminal_command(sid, data):
     """Handle terminal command execution with package management"""
-    if not check_permission(sid, 'host'):
+    if not await check_permission(sid, 'host'):
         await sio.emit('terminal_output', {
             'output': "\x1b[1;31mPermission Denied: Only the Host can execute commands.\x1b[0m\n",
             'success': False
         }, to=sid)
         return
 
+    session = sessions.for_sid(sid)
     command = data.get('command', '')
     logger.info(f"Terminal command from {sid}: {command}")
     
     try:
-        # Execute command
-        result = await command_executor.execute(command)
-        
-        # Send output back to client
-        output = result['output']
-        if result['error']:
-            output += result['error']
-        
-        await sio.emit('terminal_output', {
-            'output': output,
-            'success': result['success']
-        }, to=sid)
-        
+        await run_terminal_command(sid, session, command)
     except Exception as e:
         logger.error(f"Error executing command: {e}")
         await sio.emit('terminal_output', {
@@ -183,12 +531,27 @@ async def terminal_command(sid, data):
             'success': False
         }, to=sid)
 
+@sio.event
+async def terminal_interrupt(sid, data=None):
+    """Ctrl-C: cancel the client's running and queued commands"""
+    session = sessions.for_sid(sid)
+    if session is None:
+        return
+
+    jobs = scheduler.cancel_owned(sid, session.project_id)
+    logger.info(f"Terminal interrupt from {sid}: cancelled {len(jobs)} job(s)")
+
 @sio.event
 async def terminal_input(sid, data):
     """Handle terminal input - deprecated, use terminal_command instead"""
     input_text = data.get('input', '')
     logger.info(f"Terminal input from {sid}: {input_text[:50]}")
-    
+
+    # Runs a command, so it spends from the terminal_command allowance too
+    error = await rate_limiter.charge(sid, 'terminal_command', data)
+    if error:
+        return error
+
     # Route to terminal_command
     await terminal_command(sid, {'command': input_text})
 
@@ -202,139 +565,208 @@ async def terminal_resize(sid, data):
 
 @sio.event
 async def disconnect(sid):
-    if sid in active_users:
-        user_name = active_users[sid]['name']
-        active_users.pop(sid)
-        
-        # Role Handover if Host leaves
-        global project_host
-        if project_host == sid:
-            if active_users:
-                project_host = list(active_users.keys())[0]
-                active_users[project_host]['role'] = 'host'
-                logger.info(f"Host handed over to: {active_users[project_host]['name']}")
-                asyncio.create_task(log_activity(f"became project host (handover)", user_id=project_host))
-            else:
-                project_host = None
-        
-        asyncio.create_task(log_activity('left the session', user_id=sid))
-        logger.info(f"User disconnected: {user_name} ({sid})")
-        await sio.emit('user_left', {'userId': sid})
-        # Broadcast updated user list with new roles
-        await sio.emit('users_update', {
-            'users': [{**user, 'id': uid} for uid, user in active_users.items()]
-        })
+    logger.info(f"Client disconnected: {sid}")
+    scheduler.cancel_owned(sid)
+    rate_limiter.forget(sid)
+    await leave_session(sid)
 
 @sio.event
 async def cursor_move(sid, data):
-    if sid in active_users:
-        active_users[sid]['cursor'] = data.get('cursor', {'lineNumber': 1, 'column': 0})
-        await sio.emit('cursor_update', {
-            'userId': sid, 
-            'cursor': active_users[sid]['cursor']
-        }, skip_sid=sid)
+    session = sessions.for_sid(sid)
+    if session and sid in session.users:
+        session.users[sid]['cursor'] = data.get('cursor', {'lineNumber': 1, 'column': 0})
+        presence.update(sid, room=session.room, cursor=session.users[sid]['cursor'])
 
 @sio.event
 async def typing_status(sid, data):
-    if sid in active_users:
-        active_users[sid]['isTyping'] = data.get('isTyping', False)
-        await sio.emit('typing_update', {
-            'userId': sid,
-            'isTyping': active_users[sid]['isTyping']
-        }, skip_sid=sid)
+    session = sessions.for_sid(sid)
+    if session and sid in session.users:
+        session.users[sid]['isTyping'] = data.get('isTyping', False)
+        presence.update(sid, room=session.room, isTyping=session.users[sid]['isTyping'])
 
 @sio.event
 async def code_change(sid, data):
+    session = sessions.for_sid(sid)
+    if session is None:
+        return
+
     file_name = data.get('file', '')
+    documents = session.documents
+    # Clients must have any outside write before the op transformed past it
+    await broadcast_outside_writes(session)
     
-    # Detect environment changes
-    env_files = ['package.json', 'package-lock.json', 'requirements.txt', 'Pipfile', 'go.mod']
-    if any(file_name.endswith(ef) for ef in env_files):
-        # Broadcast environment sync requirement
-        await sio.emit('env_sync_required', {
+    # Manifest edits are checked for dependency changes once they settle
+    if env_sync.watches(file_name):
+        env_sync.touch(session, file_name, sid, session.users.get(sid, {}).get('name', 'User'))
+
+    # Apply the edit to the authoritative document; full-content updates are
+    # diffed server-side so only a delta is ever fanned out
+    delta = data.get('delta')
+    try:
+        if delta:
+            op = documents.apply_delta(file_name, delta, data.get('revision'), user_id=sid)
+        elif data.get('content') is not None:
+            op = documents.apply_content(file_name, data['content'], user_id=sid)
+        else:
+            return
+    except StaleRevisionError:
+        doc = documents.get(file_name)
+        await sio.emit('code_resync', {
             'file': file_name,
-            'requester': sid,
-            'userName': active_users.get(sid, {}).get('name', 'User')
-        })
+            'content': FileContent(doc.content),
+            'revision': doc.revision
+        }, to=sid)
+        return
 
     # Log significant file changes
     if data.get('operation') == 'update':
-        asyncio.create_task(log_activity(f"updated file: {file_name}", user_id=sid))
+        log_activity(f"updated file: {file_name}", user_id=sid)
+
+    revision = op.revision if op else documents.get(file_name).revision
+    await sio.emit('code_ack', {'file': file_name, 'revision': revision}, to=sid)
+
+    if op is None:
+        return
 
     await sio.emit('code_update', {
         'userId': sid,
-        'operation': data.get('operation'),
+        'operation': 'delta',
         'file': file_name,
-        'content': data.get('content'),
-        'delta': data.get('delta')
-    }, skip_sid=sid)
+        'delta': op.to_delta(),
+        'revision': op.revision
+    }, room=session.room, skip_sid=sid)
+
+@sio.event
+async def sync_documents(sid, data):
+    """Catch a joining or reconnecting client up on the files it holds
+
+    Expects {'files': {path: revision}}; a null revision (or one that fell out
+    of the op log) is answered with the last snapshot plus the ops after it.
+    """
+    session = sessions.for_sid(sid)
+    if session is None:
+        return
+
+    await broadcast_outside_writes(session)
+    files = data.get('files') or {}
+    await sio.emit('documents_sync', {
+        'documents': [session.documents.changes_since(path, revision) for path, revision in files.items()]
+    }, to=sid)
 
 @sio.event
 async def env_sync_execute(sid, data):
     """Execute environment sync (e.g., npm install)"""
-    if not check_permission(sid, 'host'):
+    if not await check_permission(sid, 'host'):
         await sio.emit('terminal_output', {
             'output': "\x1b[1;31mPermission Denied: Only the Host can sync environment.\x1b[0m\n",
             'success': False
         }, to=sid)
         return
 
+    session = sessions.for_sid(sid)
     file_name = data.get('file', '')
     logger.info(f"Env sync requested by {sid} for {file_name}")
     
-    command = ""
-    if file_name.endswith('package.json') or file_name.endswith('package-lock.json'):
-        command = "npm install"
-    elif file_name.endswith('requirements.txt'):
-        command = "pip install -r requirements.txt"
-    elif file_name.endswith('Pipfile'):
-        command = "pipenv install"
-    elif file_name.endswith('go.mod'):
-        command = "go mod tidy"
+    # Install just the packages that changed since the last sync; without a
+    # known diff (e.g. a lock file) fall back to syncing the whole manifest
+    diff = env_sync.pending_diff(session.project_id, file_name)
+    commands = diff.commands() if diff else []
+    if not commands:
+        if file_name.endswith('package.json') or file_name.endswith('package-lock.json'):
+            commands = ["npm install"]
+        elif file_name.endswith('requirements.txt'):
+            commands = ["pip install -r requirements.txt"]
+        elif file_name.endswith('Pipfile'):
+            commands = ["pipenv install"]
+        elif file_name.endswith('go.mod'):
+            commands = ["go mod tidy"]
     
-    if command:
-        await log_activity(f"started environment sync: {command}", user_id=sid)
-        await sio.emit('terminal_output', {'output': f"\x1b[1;36m>> Syncing Environment: {command}...\x1b[0m\n"}, to=sid)
+    if commands:
+        command = ' && '.join(commands)
+        log_activity(f"started environment sync: {command}", user_id=sid)
+        await sio.emit('terminal_output', {
+            'output': f"\x1b[1;36m>> Syncing Environment: {command}...\x1b[0m\n",
+            'partial': True
+        }, to=sid)
         
         try:
-            result = await command_executor.execute(command)
-            output = result['output']
-            if result['error']:
-                output += result['error']
-                
-            await sio.emit('terminal_output', {'output': output, 'success': result['success']}, to=sid)
+            result = await run_terminal_command(sid, session, commands)
             
-            if result['success']:
+            if result and result['success']:
+                env_sync.synced(session.project_id, file_name)
                 await sio.emit('env_sync_complete', {
                     'success': True, 
                     'file': file_name,
                     'command': command
-                })
-                await log_activity(f"completed environment sync: {command}", user_id=sid)
+                }, room=session.room)
+                log_activity(f"completed environment sync: {command}", user_id=sid)
         except Exception as e:
             logger.error(f"Sync error: {e}")
             await sio.emit('terminal_output', {'output': f"\x1b[1;31mSync Error: {str(e)}\x1b[0m\n", 'success': False}, to=sid)
 
+@sio.event
+async def roster_sync(sid, data=None):
+    """Full roster for a client that missed a roster_diff version"""
+    session = sessions.for_sid(sid)
+    if session is None:
+        return
+
+    await session.refresh()
+    await sio.emit('roster_snapshot', {
+        'version': session.roster_version,
+        'users': session.user_list(local_sid=sid)
+    }, to=sid)
+
+@sio.event
+async def get_activity_logs(sid, data=None):
+    """Page backwards through the project timeline using the cursor from the previous page"""
+    session = sessions.for_sid(sid)
+    if session is None:
+        return
+
+    data = data or {}
+    before = data.get('cursor')
+    page = await session.activity_logs.page(
+        before=int(before) if before is not None else None,
+        limit=data.get('limit')
+    )
+    await sio.emit('activity_logs', page, to=sid)
+
 @sio.event
 async def chat_message(sid, data):
     """Handle chat messages between collaborators"""
+    session = sessions.for_sid(sid)
+    if session is None:
+        return
+
     logger.info(f"Chat message from {sid}: {data.get('message', '')[:50]}")
-    
-    # Broadcast message to all users including sender
-    await sio.emit('chat_message', {
-        'userId': data.get('userId'),
-        'userName': data.get('userName'),
-        'userColor': data.get('userColor'),
-        'userAvatar': data.get('userAvatar'),
-        'message': data.get('message'),
-        'timestamp': data.get('timestamp')
-    })
+
+    # Stored with a server id and timestamp, then broadcast to the project's users including sender
+    message = await session.chat.append({'userId': sid, **data})
+    await sio.emit('chat_message', message, room=session.room)
+
+@sio.event
+async def chat_history(sid, data=None):
+    """Page through a project's chat, newest first, keyed by timestamp"""
+    session = sessions.for_sid(sid)
+    if session is None:
+        return
+
+    data = data or {}
+    before, before_id = data.get('before'), data.get('beforeId')
+    page = await session.chat.page(
+        before=int(before) if before is not None else None,
+        before_id=int(before_id) if before_id is not None else None,
+        limit=data.get('limit')
+    )
+    await sio.emit('chat_history', page, to=sid)
 
 @sio.event
 async def extension_install(sid, data):
     """Handle extension installation"""
+    session = sessions.for_sid(sid)
     extension = data.get('extension')
-    if not extension:
+    if not extension or session is None:
         return
 
     logger.info(f"Installing extension request from {sid}: {extension.get('name')}")
@@ -343,19 +775,20 @@ async def extension_install(sid, data):
     ext_config_path = ".flux/extensions.json"
     
     # Read existing extensions
-    current_config = await virtual_fs.read_json(ext_config_path) or {"extensions": []}
+    current_config = await session.virtual_fs.read_json(ext_config_path) or {"extensions": []}
     
     # Check if already installed
     existing = next((e for e in current_config['extensions'] if e['id'] == extension['id']), None)
     if not existing:
         current_config['extensions'].append({**extension, 'installedBy': sid, 'installedAt': str(datetime.now())})
-        await virtual_fs.write_json(ext_config_path, current_config)
+        await session.virtual_fs.write_json(ext_config_path, current_config)
+        await broadcast_outside_writes(session)
         
-        asyncio.create_task(log_activity(f"installed extension: {extension.get('name')}", user_id=sid))
-        # Broadcast update to all clients
+        log_activity(f"installed extension: {extension.get('name')}", user_id=sid)
+        # Broadcast update to the project's clients
         await sio.emit('extensions_update', {
             'extensions': current_config['extensions']
-        })
+        }, room=session.room)
         
         # Send detailed log to installer
         await sio.emit('terminal_output', {
@@ -366,14 +799,15 @@ async def extension_install(sid, data):
 @sio.event
 async def extension_uninstall(sid, data):
     """Handle extension uninstallation"""
+    session = sessions.for_sid(sid)
     ext_id = data.get('id')
-    if not ext_id:
+    if not ext_id or session is None:
         return
 
     logger.info(f"Uninstalling extension request from {sid}: {ext_id}")
     
     ext_config_path = ".flux/extensions.json"
-    current_config = await virtual_fs.read_json(ext_config_path)
+    current_config = await session.virtual_fs.read_json(ext_config_path)
     
     if current_config and 'extensions' in current_config:
         # Filter out the extension
@@ -381,13 +815,14 @@ async def extension_uninstall(sid, data):
         current_config['extensions'] = [e for e in current_config['extensions'] if e['id'] != ext_id]
         
         if len(current_config['extensions']) < config_len:
-            await virtual_fs.write_json(ext_config_path, current_config)
+            await session.virtual_fs.write_json(ext_config_path, current_config)
+            await broadcast_outside_writes(session)
             
-            asyncio.create_task(log_activity(f"uninstalled extension: {ext_id}", user_id=sid))
+            log_activity(f"uninstalled extension: {ext_id}", user_id=sid)
             # Broadcast update
             await sio.emit('extensions_update', {
                 'extensions': current_config['extensions']
-            })
+            }, room=session.room)
             
             await sio.emit('terminal_output', {
                 'output': f"\x1b[1;33m- Extension uninstalled.\x1b[0m\n",
@@ -397,8 +832,12 @@ async def extension_uninstall(sid, data):
 @sio.event
 async def get_extensions(sid):
     """Get list of installed extensions"""
+    session = sessions.for_sid(sid)
+    if session is None:
+        return
+
     ext_config_path = ".flux/extensions.json"
-    config = await virtual_fs.read_json(ext_config_path) or {"extensions": []}
+    config = await session.virtual_fs.read_json(ext_config_path) or {"extensions": []}
     await sio.emit('extensions_update', {
         'extensions': config['extensions']
     }, to=sid)
@@ -493,52 +932,153 @@ async def ai_query(sid, data):
             'error': f'AI request failed: {str(e)}'
         }, to=sid)
 
-active_ai_suggestions = {}
+async def expire_suggestions(session):
+    """Drop suggestions past their TTL and tell the room"""
+    for suggestion_id in session.ai_suggestions.expire():
+        await sio.emit('ai_suggestion_expired', {'id': suggestion_id}, room=session.room)
 
 @sio.event
 async def ai_suggest_code(sid, data):
     """Broadcast an AI suggestion to the team for review"""
-    suggestion_id = f"sug_{len(active_ai_suggestions) + 1}"
-    suggestion = {
-        'id': suggestion_id,
-        'userId': sid,
-        'userName': active_users.get(sid, {}).get('name', 'User'),
-        'file': data.get('file'),
-        'code': data.get('code'),
-        'description': data.get('description', ''),
-        'votes': {sid: 'approve'},
-        'timestamp': Date.now() if 'Date' in globals() else 0 # Fix: use asyncio time or similar
-    }
-    
-    # In python we need to import time or use datetime
-    import time
-    suggestion['timestamp'] = int(time.time() * 1000)
-    
-    active_ai_suggestions[suggestion_id] = suggestion
-    
-    await log_activity(f"shared an AI suggestion for {data.get('file')}", user_id=sid)
-    await sio.emit('ai_suggestion_broadcast', suggestion)
+    session = sessions.for_sid(sid)
+    if session is None:
+        return
+
+    await expire_suggestions(session)
+    suggestion, evicted = session.ai_suggestions.add(
+        sid,
+        session.users.get(sid, {}).get('name', 'User'),
+        data.get('file'),
+        data.get('code'),
+        data.get('description', '')
+    )
+
+    # Dropped to make room; to clients that is the same as running out of time
+    for suggestion_id in evicted:
+        await sio.emit('ai_suggestion_expired', {'id': suggestion_id}, room=session.room)
+
+    log_activity(f"shared an AI suggestion for {data.get('file')}", user_id=sid)
+    await sio.emit('ai_suggestion_broadcast', suggestion.to_dict(len(session.users)), room=session.room)
+    # A project with a single member approves by sharing
+    await decide_suggestion(session, suggestion)
 
 @sio.event
 async def ai_vote_suggestion(sid, data):
     """Vote on an AI suggestion"""
-    s_id = data.get('id')
-    vote = data.get('vote') # 'approve' or 'reject'
-    
-    if s_id in active_ai_suggestions:
-        active_ai_suggestions[s_id]['votes'][sid] = vote
-        await sio.emit('ai_suggestion_update', active_ai_suggestions[s_id])
-        
-        # Auto-apply if more than 50% approval (simple rule for now)
-        approvals = sum(1 for v in active_ai_suggestions[s_id]['votes'].values() if v == 'approve')
-        total_active = len(active_users)
-        
-        if approvals > total_active / 2:
-            await sio.emit('ai_suggestion_approved', active_ai_suggestions[s_id])
-            # Clear it after approval
-            # active_ai_suggestions.pop(s_id)
+    session = sessions.for_sid(sid)
+    if session is None:
+        return
 
+    await expire_suggestions(session)
+    suggestion = session.ai_suggestions.vote(data.get('id'), sid, data.get('vote'))
+    if suggestion is None:
+        return
 
+    await sio.emit('ai_suggestion_update', suggestion.to_dict(len(session.users)), room=session.room)
+    await decide_suggestion(session, suggestion)
+
+async def decide_suggestion(session, suggestion):
+    """Close the vote once a majority of the project's members approved or can no longer approve"""
+    members = len(session.users)
+    outcome = session.ai_suggestions.outcome(suggestion, members)
+    if outcome is None:
+        return
+    session.ai_suggestions.remove(suggestion.id)
+    await sio.emit(f'ai_suggestion_{outcome}', suggestion.to_dict(members), room=session.room)
+
+
+@app.get("/api/transport/stats")
+async def transport_stats():
+    """Outbound queue depth and drop counters"""
+    return sio.outbound.stats()
+
+async def evict_idle_sessions() -> int:
+    """Snapshot and unload sessions without clients for SESSION_IDLE_TTL_S; returns how many"""
+    evicted = 0
+    idle = sessions.idle()
+    if idle and chat_store:
+        # A restored session reads its chat back from the store
+        await chat_store.flush()
+    for project_id in idle:
+        session = sessions.sessions[project_id]
+        for job in scheduler.jobs(project_id):
+            scheduler.cancel(job)
+        if snapshots:
+            try:
+                await snapshots.snapshot(session)
+            except Exception as e:
+                logger.error(f"Keeping idle session {project_id}, its snapshot failed: {e}")
+                continue
+        # Nothing is evicted if a client joined while the image was written
+        if sessions.evict(project_id):
+            env_sync.forget(project_id)
+            if snapshots:
+                snapshots.forget(project_id)
+            evicted += 1
+    return evicted
+
+async def run_session_eviction():
+    interval = max(1, min(60, sessions.idle_ttl / 2))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await evict_idle_sessions()
+        except Exception as e:
+            logger.error(f"Idle session eviction failed: {e}")
+
+@app.on_event("startup")
+async def start_background_tasks():
+    global eviction_task
+    # First, so stalls in the rest of startup are seen too
+    loop_monitor.start()
+    await heartbeat.start()
+    if database:
+        pruned = await asyncio.to_thread(open_database)
+        if pruned:
+            metadata_store.record('eviction', pruned)
+    if snapshots:
+        snapshots.start()
+    if sessions.idle_ttl > 0:
+        eviction_task = asyncio.get_running_loop().create_task(run_session_eviction())
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    if eviction_task:
+        eviction_task.cancel()
+    # Send and record the last activity entries before the final snapshot
+    await activity.stop()
+    if chat_store:
+        await chat_store.stop()
+    if snapshots:
+        await snapshots.stop()
+    if database:
+        database.close()
+    await heartbeat.stop()
+    await loop_monitor.stop()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/api/loop/stats")
+async def loop_stats():
+    """Event-loop lag and per-handler timings"""
+    return loop_monitor.stats()
+
+@app.get("/api/ratelimit/stats")
+async def rate_limit_stats():
+    """Configured limits and how often they held events back"""
+    return rate_limiter.stats()
+
+@app.get("/api/registry/cache/stats")
+async def registry_cache_stats():
+    """Registry metadata cache counters per tier, in-flight fetch sharing and circuit states"""
+    return {
+        **registry_client.cache.stats(),
+        'inflight': registry_client.inflight.stats(),
+        'circuits': {name: breaker.to_dict() for name, breaker in registry_client.breakers.items()}
+    }
 
 # Mount Socket.IO
 socket_app = socketio.ASGIApp(sio, other_asgi_app=app, socketio_path='/socket.io')
@@ -553,6 +1093,19 @@ app.add_middleware(
 
 app = socket_app
 
+async def run_git(operation, *args):
+    """Run a blocking GitService call in a worker thread, recording its latency and outcome"""
+    name = operation.__name__
+    start = time.perf_counter()
+    status = 'error'
+    try:
+        result = await asyncio.to_thread(operation, *args)
+        status = 'success' if not isinstance(result, dict) or result.get('success', True) else 'failure'
+        return result
+    finally:
+        GIT_OP_SECONDS.observe(time.perf_counter() - start, name)
+        GIT_OPS_TOTAL.inc(name, status)
+
 @sio.event
 async def git_auth_store(sid, data):
     """Store git token"""
@@ -575,11 +1128,11 @@ async def git_clone(sid, data):
         url = git_service._inject_credentials(url, token)
         
     logger.info(f"Git clone request from {sid}: {url}")
-    result = await asyncio.to_thread(git_service.clone_repository, url, data.get('targetDir'))
+    result = await run_git(git_service.clone_repository, url, data.get('targetDir'))
     
     if result.get('success'):
-        files_result = await asyncio.to_thread(git_service.get_repo_files, result['path'])
-        result['files'] = files_result['files']
+        files_result = await run_git(git_service.get_repo_files, result['path'])
+        result['files'] = {path: FileContent(content) for path, content in files_result['files'].items()}
         result['fileList'] = files_result['fileList']
     
     await sio.emit('git_response', {'action': 'clone', 'result': result}, to=sid)
@@ -589,7 +1142,7 @@ async def git_merge(sid, data):
     """Handle git merge"""
     path = data.get('path')
     source = data.get('source')
-    result = await asyncio.to_thread(git_service.merge_branches, path, source)
+    result = await run_git(git_service.merge_branches, path, source)
     await sio.emit('git_response', {'action': 'merge', 'result': result}, to=sid)
 
 @sio.event
@@ -598,31 +1151,31 @@ async def git_branch_delete(sid, data):
     path = data.get('path')
     name = data.get('name')
     force = data.get('force', False)
-    result = await asyncio.to_thread(git_service.delete_branch, path, name, force)
+    result = await run_git(git_service.delete_branch, path, name, force)
     await sio.emit('git_response', {'action': 'branchDelete', 'result': result}, to=sid)
 
 @sio.event
 async def git_repo_create(sid, data):
     """Handle git repo create"""
     name = data.get('name')
-    result = await asyncio.to_thread(git_service.create_repository, name)
+    result = await run_git(git_service.create_repository, name)
     await sio.emit('git_response', {'action': 'repoCreate', 'result': result}, to=sid)
 
 @sio.event
 async def git_repo_delete(sid, data):
     """Handle git repo delete"""
     name = data.get('name')
-    result = await asyncio.to_thread(git_service.delete_repository, name)
+    result = await run_git(git_service.delete_repository, name)
     await sio.emit('git_response', {'action': 'repoDelete', 'result': result}, to=sid)
 
 @sio.event
 async def git_status(sid, data):
     """Handle git status"""
     path = data.get('path')
-    result = await asyncio.to_thread(git_service.get_status, path)
+    result = await run_git(git_service.get_status, path)
     
     # Also get branches
-    branches_result = await asyncio.to_thread(git_service.get_branches, path)
+    branches_result = await run_git(git_service.get_branches, path)
     if branches_result['success']:
         result['branches'] = branches_result['branches']
         result['currentBranch'] = branches_result['current']
@@ -634,7 +1187,7 @@ async def git_add(sid, data):
     """Handle git add"""
     path = data.get('path')
     file = data.get('file')
-    result = await asyncio.to_thread(git_service.stage_file, path, file)
+    result = await run_git(git_service.stage_file, path, file)
     await sio.emit('git_response', {'action': 'add', 'result': result}, to=sid)
 
 @sio.event
@@ -642,27 +1195,27 @@ async def git_reset(sid, data):
     """Handle git reset"""
     path = data.get('path')
     file = data.get('file')
-    result = await asyncio.to_thread(git_service.unstage_file, path, file)
+    result = await run_git(git_service.unstage_file, path, file)
     await sio.emit('git_response', {'action': 'reset', 'result': result}, to=sid)
 
 @sio.event
 async def git_commit(sid, data):
     """Handle git commit"""
-    if not check_permission(sid, 'host'):
+    if not await check_permission(sid, 'host'):
         await sio.emit('git_response', {'action': 'commit', 'result': {'success': False, 'error': 'Permission Denied'}}, to=sid)
         return
 
     path = data.get('path')
     message = data.get('message')
-    result = await asyncio.to_thread(git_service.commit, path, message)
+    result = await run_git(git_service.commit, path, message)
     if result.get('success'):
-        asyncio.create_task(log_activity(f"committed: {message[:30]}...", user_id=sid))
+        log_activity(f"committed: {message[:30]}...", user_id=sid)
     await sio.emit('git_response', {'action': 'commit', 'result': result}, to=sid)
 
 @sio.event
 async def git_push(sid, data):
     """Handle git push with auth"""
-    if not check_permission(sid, 'host'):
+    if not await check_permission(sid, 'host'):
         await sio.emit('git_response', {'action': 'push', 'result': {'success': False, 'error': 'Permission Denied'}}, to=sid)
         return
 
@@ -677,15 +1230,15 @@ async def git_push(sid, data):
     # Note: For push, we might need to update the remote URL temporarily or use environment variables
     # For this demo, we assume the remote is already authenticated or uses a helper
     
-    result = await asyncio.to_thread(git_service.push, path, remote, branch)
+    result = await run_git(git_service.push, path, remote, branch)
     if result.get('success'):
-        asyncio.create_task(log_activity(f"pushed to {remote}/{branch}", user_id=sid))
+        log_activity(f"pushed to {remote}/{branch}", user_id=sid)
     await sio.emit('git_response', {'action': 'push', 'result': result}, to=sid)
 
 @sio.event
 async def git_pull(sid, data):
     """Handle git pull with auth"""
-    if not check_permission(sid, 'host'):
+    if not await check_permission(sid, 'host'):
         await sio.emit('git_response', {'action': 'pull', 'result': {'success': False, 'error': 'Permission Denied'}}, to=sid)
         return
 
@@ -693,7 +1246,7 @@ async def git_pull(sid, data):
     platform = data.get('platform', 'github.com')
     username = data.get('username', 'default')
     
-    result = await asyncio.to_thread(git_service.pull, path)
+    result = await run_git(git_service.pull, path)
     await sio.emit('git_response', {'action': 'pull', 'result': result}, to=sid)
 
 @sio.event
@@ -701,7 +1254,7 @@ async def git_create_branch(sid, data):
     """Handle git create branch"""
     path = data.get('path')
     name = data.get('name')
-    result = await asyncio.to_thread(git_service.create_branch, path, name)
+    result = await run_git(git_service.create_branch, path, name)
     await sio.emit('git_response', {'action': 'createBranch', 'result': result}, to=sid)
 
 @sio.event
@@ -709,7 +1262,7 @@ async def git_checkout(sid, data):
     """Handle git checkout"""
     path = data.get('path')
     branch = data.get('branch')
-    result = await asyncio.to_thread(git_service.checkout_branch, path, branch)
+    result = await run_git(git_service.checkout_branch, path, branch)
     await sio.emit('git_response', {'action': 'checkout', 'result': result}, to=sid)
 
 @sio.event
@@ -717,7 +1270,10 @@ async def git_conflict_details(sid, data):
     """Get conflict details for a file"""
     path = data.get('path')
     file = data.get('file')
-    result = await asyncio.to_thread(git_service.get_conflict_details, path, file)
+    result = await run_git(git_service.get_conflict_details, path, file)
+    for side in ('ours', 'theirs'):
+        if side in result:
+            result[side] = FileContent(result[side])
     await sio.emit('git_response', {'action': 'conflictDetails', 'result': result}, to=sid)
 
 @sio.event
@@ -726,16 +1282,23 @@ async def git_resolve_conflict(sid, data):
     path = data.get('path')
     file = data.get('file')
     content = data.get('content')
-    result = await asyncio.to_thread(git_service.resolve_conflict, path, file, content)
+    result = await run_git(git_service.resolve_conflict, path, file, content)
     if result.get('success'):
-        await log_activity(f"resolved conflict in {file}", user_id=sid)
+        log_activity(f"resolved conflict in {file}", user_id=sid)
     await sio.emit('git_response', {'action': 'resolveConflict', 'result': result}, to=sid)
 async def git_repo_list(sid, data):
     """Handle git repo list"""
-    result = await asyncio.to_thread(git_service.list_repositories)
+    result = await run_git(git_service.list_repositories)
     await sio.emit('git_response', {'action': 'repoList', 'result': result}, to=sid)
 
 
+if os.getenv('LOOP_MONITOR', 'true').lower() == 'true':
+    loop_monitor.instrument_server(sio)
+
+# Outermost, so limited events are turned away before any handler work or timing
+if os.getenv('RATE_LIMIT', 'true').lower() == 'true':
+    rate_limiter.instrument_server(sio)
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting WebSocket server with Package Management on http://localhost:8000")
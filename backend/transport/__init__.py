@@ -0,0 +1,20 @@
+"""
+Transport Module
+"""
+from .ratelimit import EventRateLimiter, RateLimit, parse_limits
+from .serializer import (
+    FileContent,
+    NegotiatingManager,
+    NegotiatingServer,
+    MSGPACK_AVAILABLE
+)
+
+__all__ = [
+    'EventRateLimiter',
+    'FileContent',
+    'NegotiatingManager',
+    'NegotiatingServer',
+    'RateLimit',
+    'parse_limits',
+    'MSGPACK_AVAILABLE'
+]
@@ -0,0 +1,139 @@
+"""
+Outbound Queues - Bounded per-client send queues so one slow client cannot
+stall broadcasts to the rest of its room
+"""
+import asyncio
+from collections import deque
+from typing import Any, Dict, Iterable, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Events that only carry the latest state; losing one costs a stale cursor,
+# typing flag or timeline entry, never document content
+DROPPABLE_EVENTS = {
+    'presence_batch',
+    'cursor_update',
+    'typing_update',
+    'activity_batch'
+}
+
+
+class ClientQueue:
+    """Packets waiting to be handed to one client's Engine.IO socket"""
+
+    def __init__(self):
+        self.packets: deque = deque()
+        self.task: Optional[asyncio.Task] = None
+        self.lagging = False
+
+
+class OutboundQueues:
+    """
+    Per-client queues between the Socket.IO manager and Engine.IO.
+
+    Broadcasting only appends to each recipient's queue, so a room fan-out never
+    waits on any one socket. A drain task per client forwards packets while that
+    client's Engine.IO socket has fewer than `max_in_flight` unsent packets,
+    which is how a stalled connection shows up.
+
+    When a client falls `max_queue` packets behind, droppable events (presence,
+    activity) addressed to it are discarded. Everything else must be delivered,
+    so a client that falls `max_backlog` packets behind is disconnected instead;
+    it catches up through the usual resync on reconnect.
+    """
+
+    def __init__(
+        self,
+        server,
+        max_queue: int = 256,
+        max_backlog: int = 2048,
+        max_in_flight: int = 16,
+        poll_interval: float = 0.01,
+        droppable: Optional[Set[str]] = None
+    ):
+        self.server = server
+        self.max_queue = max_queue
+        self.max_backlog = max(max_backlog, max_queue)
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.droppable = DROPPABLE_EVENTS if droppable is None else droppable
+        self.queues: Dict[str, ClientQueue] = {}
+
+        self.dropped: Dict[str, int] = {}
+        self.slow_disconnects = 0
+        self.max_depth_seen = 0
+
+    def push(self, eio_sid: str, packets: Iterable[Any], event: Optional[str] = None) -> bool:
+        """
+        Queue encoded Engine.IO packets for a client
+
+        Returns:
+            False if they were dropped or the client is being disconnected
+        """
+        queue = self.queues.get(eio_sid)
+        if queue is None:
+            queue = self.queues[eio_sid] = ClientQueue()
+        depth = len(queue.packets)
+
+        if event in self.droppable and depth >= self.max_queue:
+            self.dropped[event] = self.dropped.get(event, 0) + 1
+            if not queue.lagging:
+                queue.lagging = True
+                logger.warning(f"Client {eio_sid} is {depth} packets behind, dropping droppable events")
+            return False
+
+        if depth >= self.max_backlog:
+            self.slow_disconnects += 1
+            logger.warning(f"Client {eio_sid} is {depth} packets behind, disconnecting")
+            self.discard(eio_sid)
+            asyncio.get_running_loop().create_task(self.server.eio.disconnect(eio_sid))
+            return False
+
+        queue.packets.extend(packets)
+        self.max_depth_seen = max(self.max_depth_seen, len(queue.packets))
+        if queue.task is None or queue.task.done():
+            queue.task = asyncio.get_running_loop().create_task(self._drain(eio_sid, queue))
+        return True
+
+    def discard(self, eio_sid: str):
+        """Forget a client's queue, e.g. after it disconnected"""
+        queue = self.queues.pop(eio_sid, None)
+        if queue and queue.task and not queue.task.done():
+            queue.task.cancel()
+
+    def depth(self, eio_sid: str) -> int:
+        queue = self.queues.get(eio_sid)
+        return len(queue.packets) if queue else 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and drop counters for monitoring"""
+        depths = [len(queue.packets) for queue in self.queues.values()]
+        return {
+            'clients': len(depths),
+            'queued': sum(depths),
+            'maxDepth': max(depths, default=0),
+            'maxDepthSeen': self.max_depth_seen,
+            'lagging': sum(1 for queue in self.queues.values() if queue.lagging),
+            'dropped': dict(self.dropped),
+            'slowDisconnects': self.slow_disconnects
+        }
+
+    async def _drain(self, eio_sid: str, queue: ClientQueue):
+        try:
+            while queue.packets:
+                socket = self.server.eio.sockets.get(eio_sid)
+                if socket is None or socket.closed:
+                    queue.packets.clear()
+                    break
+                if socket.queue.qsize() >= self.max_in_flight:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self.server._send_eio_packet(eio_sid, queue.packets.popleft())
+                if queue.lagging and len(queue.packets) < self.max_queue // 2:
+                    queue.lagging = False
+        except Exception as e:
+            logger.error(f"Outbound queue error for {eio_sid}: {e}")
+        finally:
+            if not queue.packets and self.queues.get(eio_sid) is queue:
+                del self.queues[eio_sid]
@@ -0,0 +1,231 @@
+"""
+Event Rate Limiting - Per-connection token buckets enforced before Socket.IO
+handlers run
+"""
+import asyncio
+import functools
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+import logging
+
+from monitoring.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED_TOTAL = REGISTRY.counter(
+    'flux_rate_limited_total',
+    'Socket.IO events held back by per-connection rate limits',
+    ['event', 'action']
+)
+
+# Events a client is most likely to flood, and what an honest client needs:
+# cursors follow the mouse, edits follow typing and pastes, commands are typed
+DEFAULT_LIMITS = (
+    'cursor_move=30/30,typing_status=10/10,code_change=50/100,'
+    'terminal_command=2/5,terminal_input=100/200,chat_message=5/10,'
+    'ai_query=1/3,ai_suggest_code=1/3'
+)
+
+# Events where only the latest payload matters, so a burst collapses into one call
+DEFAULT_COALESCED = ('cursor_move', 'typing_status')
+
+
+@dataclass
+class RateLimit:
+    """Sustained `rate` events per second with bursts of up to `burst`"""
+    rate: float
+    burst: float
+
+    def to_dict(self) -> Dict[str, float]:
+        return {'rate': self.rate, 'burst': self.burst}
+
+
+def parse_limits(spec: str) -> Dict[str, RateLimit]:
+    """
+    Parse 'event=rate/burst,...' (burst defaults to the rate)
+
+    Raises:
+        ValueError: For malformed entries
+    """
+    limits = {}
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        event, _, value = item.partition('=')
+        rate, _, burst = value.partition('/')
+        if not event or not rate:
+            raise ValueError(f"Invalid rate limit '{item}', expected event=rate/burst")
+        limits[event.strip()] = RateLimit(float(rate), float(burst or rate))
+    return limits
+
+
+class TokenBucket:
+    """Tokens refill continuously at the limit's rate up to its burst size"""
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, limit: RateLimit, now: float) -> float:
+        """Take a token; returns 0 on success, else seconds until one is available"""
+        self.tokens = min(limit.burst, self.tokens + (now - self.updated) * limit.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / limit.rate if limit.rate > 0 else float('inf')
+
+
+class EventRateLimiter:
+    """
+    Applies per-event, per-connection token-bucket limits to Socket.IO handlers.
+
+    A connection over its limit for an event is handled one of two ways:
+
+    - Coalesced events (cursor moves, typing) are not dropped outright: the
+      newest payload is kept and delivered once a token frees up, replacing
+      any payload that was waiting. A flood therefore costs at most `rate`
+      handler calls per second and the last state always arrives.
+    - Every other event is rejected. The handler does not run; the client
+      gets a `rate_limited` event (and the same dict as the ack) with the
+      event name, the limit and how long to wait.
+
+    Buckets are created lazily on the first limited event of a connection and
+    dropped by forget() when it disconnects.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, RateLimit],
+        coalesce: Iterable[str] = DEFAULT_COALESCED,
+        notify: Optional[Callable[[str, Dict[str, Any]], Awaitable[Any]]] = None
+    ):
+        """
+        Args:
+            limits: Event name -> limit; events not listed are never limited
+            coalesce: Events whose bursts collapse into their latest payload
+            notify: Coroutine called as notify(sid, error) when an event is rejected
+        """
+        self.limits = limits
+        self.coalesce = set(coalesce)
+        self.notify = notify
+        # sid -> event -> bucket
+        self.buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        # (sid, event) -> (handler args waiting to run, timer)
+        self.deferred: Dict[Tuple[str, str], Tuple[tuple, asyncio.TimerHandle]] = {}
+        self.rejected: Dict[str, int] = {}
+        self.coalesced: Dict[str, int] = {}
+
+    def check(self, sid: str, event: str) -> float:
+        """Take a token for an event; returns 0 if allowed, else seconds to wait"""
+        limit = self.limits.get(event)
+        if limit is None:
+            return 0.0
+        now = time.monotonic()
+        buckets = self.buckets.setdefault(sid, {})
+        bucket = buckets.get(event)
+        if bucket is None:
+            bucket = buckets[event] = TokenBucket(limit.burst, now)
+        return bucket.take(limit, now)
+
+    def instrument(self, event: str, handler: Callable) -> Callable:
+        """Wrap an async event handler with the event's limit"""
+        coalesce = event in self.coalesce
+
+        @functools.wraps(handler)
+        async def wrapper(sid, *args):
+            key = (sid, event)
+            if coalesce and key in self.deferred:
+                # A call is already waiting for a token; it will carry this payload
+                self._count(self.coalesced, event, 'coalesced')
+                self.deferred[key] = (args, self.deferred[key][1])
+                return None
+
+            wait = self.check(sid, event)
+            if not wait:
+                return await handler(sid, *args)
+
+            if coalesce:
+                self._count(self.coalesced, event, 'coalesced')
+                timer = asyncio.get_running_loop().call_later(wait, self._release, handler, sid, event)
+                self.deferred[key] = (args, timer)
+                return None
+
+            return await self._reject(sid, event, wait, args)
+
+        return wrapper
+
+    async def charge(self, sid: str, event: str, *args) -> Optional[Dict[str, Any]]:
+        """
+        Take a token for an event from outside its handler, for handlers that
+        do another event's work; returns the rejection (already sent to the
+        client) if the event is over its limit, else None
+        """
+        wait = self.check(sid, event)
+        if not wait:
+            return None
+        return await self._reject(sid, event, wait, args)
+
+    def instrument_server(self, sio, namespace: str = '/'):
+        """Wrap the handlers of every limited event registered on a Socket.IO server"""
+        handlers = sio.handlers.get(namespace, {})
+        for event in self.limits:
+            if event in handlers:
+                handlers[event] = self.instrument(event, handlers[event])
+            else:
+                logger.warning(f"Rate limit configured for unknown event '{event}'")
+
+    def forget(self, sid: str):
+        """Drop a disconnected client's buckets and waiting calls"""
+        self.buckets.pop(sid, None)
+        for event in self.coalesce:
+            waiting = self.deferred.pop((sid, event), None)
+            if waiting:
+                waiting[1].cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'limits': {event: limit.to_dict() for event, limit in self.limits.items()},
+            'connections': len(self.buckets),
+            'rejected': dict(self.rejected),
+            'coalesced': dict(self.coalesced)
+        }
+
+    async def _reject(self, sid: str, event: str, wait: float, args: tuple) -> Dict[str, Any]:
+        self._count(self.rejected, event, 'rejected')
+        error = {
+            'error': 'rate_limited',
+            'event': event,
+            'retryAfterMs': int(wait * 1000) + 1,
+            'limit': self.limits[event].to_dict()
+        }
+        # Lets the client repair what was lost, e.g. resend a file's content
+        if args and isinstance(args[0], dict) and 'file' in args[0]:
+            error['file'] = args[0]['file']
+        if self.notify:
+            await self.notify(sid, error)
+        return error
+
+    def _release(self, handler: Callable, sid: str, event: str):
+        """Run the newest waiting call of a coalesced event"""
+        waiting = self.deferred.pop((sid, event), None)
+        if waiting is None or sid not in self.buckets:
+            return
+        # Consume the token that was waited for; if the timer fired a little
+        # early the balance goes negative and the next refill makes up for it
+        if self.check(sid, event):
+            self.buckets[sid][event].tokens -= 1
+        task = asyncio.get_running_loop().create_task(handler(sid, *waiting[0]))
+        task.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Coalesced handler failed: {task.exception()}")
+
+    def _count(self, counts: Dict[str, int], event: str, action: str):
+        counts[event] = counts.get(event, 0) + 1
+        RATE_LIMITED_TOTAL.inc(event, action)
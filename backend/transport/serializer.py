@@ -0,0 +1,187 @@
+"""
+Packet Serializer - Per-client negotiation between JSON and MessagePack
+Socket.IO packets
+"""
+import asyncio
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs
+import logging
+
+import socketio
+from socketio import packet
+from socketio.async_manager import AsyncManager
+from engineio import packet as eio_packet
+
+from .outbound import OutboundQueues
+
+try:
+    import msgpack
+    from socketio.msgpack_packet import MsgPackPacket
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MsgPackPacket = None
+    MSGPACK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class FileContent(str):
+    """
+    File content that MessagePack clients receive as raw bytes.
+
+    Behaves as a plain string everywhere else, so JSON clients are unaffected.
+    """
+    __slots__ = ()
+
+
+def _msgpack_default(obj):
+    """Pack FileContent as bin and everything strict mode rejects as its base type"""
+    if isinstance(obj, FileContent):
+        return obj.encode('utf-8')
+    if isinstance(obj, str):
+        return str(obj)
+    if isinstance(obj, dict):
+        return dict(obj)
+    if isinstance(obj, (list, tuple)):
+        return list(obj)
+    if isinstance(obj, int):
+        return int(obj)
+    if isinstance(obj, float):
+        return float(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+if MSGPACK_AVAILABLE:
+    class BinaryFilePacket(MsgPackPacket):
+        """MessagePack packet that ships FileContent values as bin instead of str"""
+
+        def encode(self):
+            return msgpack.packb(self._to_dict(), default=_msgpack_default, strict_types=True)
+else:
+    BinaryFilePacket = None
+
+
+def _as_msgpack(pkt):
+    """Re-wrap a JSON packet for a MessagePack client"""
+    packet_type = pkt.packet_type
+    if packet_type == packet.BINARY_EVENT:
+        packet_type = packet.EVENT
+    elif packet_type == packet.BINARY_ACK:
+        packet_type = packet.ACK
+    return BinaryFilePacket(packet_type, data=pkt.data, namespace=pkt.namespace, id=pkt.id)
+
+
+class NegotiatingManager(AsyncManager):
+    """
+    Client manager that encodes each broadcast once per serializer in use.
+
+    Recipients are split by the serializer they negotiated, so a room with only
+    JSON clients costs exactly what it did before and a mixed room costs one
+    extra encoding, not one per client. Message bus managers are combined with
+    this class so messages relayed from other workers are delivered the same way.
+
+    If the server has outbound queues, packets are queued per client instead of
+    being sent inline, tagged with the event name so the queue can tell
+    droppable events from must-deliver ones.
+    """
+
+    async def emit(self, event, data, namespace, room=None, skip_sid=None,
+                   callback=None, to=None, **kwargs):
+        msgpack_clients = getattr(self.server, 'msgpack_clients', set())
+        outbound = getattr(self.server, 'outbound', None)
+        if callback:
+            return await super().emit(event, data, namespace, room=room, skip_sid=skip_sid,
+                                      callback=callback, to=to, **kwargs)
+
+        room = to or room
+        if namespace not in self.rooms:
+            return
+        if isinstance(data, tuple):
+            data = list(data)
+        elif data is not None:
+            data = [data]
+        else:
+            data = []
+        if not isinstance(skip_sid, list):
+            skip_sid = [skip_sid]
+
+        encoded = {}
+        tasks = []
+        for sid, eio_sid in self.get_participants(namespace, room):
+            if sid in skip_sid:
+                continue
+            use_msgpack = eio_sid in msgpack_clients
+            if use_msgpack not in encoded:
+                encoded[use_msgpack] = self._encode(event, data, namespace, use_msgpack)
+            if outbound is not None:
+                outbound.push(eio_sid, encoded[use_msgpack], event)
+                continue
+            for p in encoded[use_msgpack]:
+                tasks.append(asyncio.create_task(self.server._send_eio_packet(eio_sid, p)))
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def _encode(self, event, data, namespace, use_msgpack):
+        packet_class = BinaryFilePacket if use_msgpack else self.server.packet_class
+        encoded_packet = packet_class(packet.EVENT, namespace=namespace, data=[event] + data).encode()
+        if not isinstance(encoded_packet, list):
+            encoded_packet = [encoded_packet]
+        return [eio_packet.Packet(eio_packet.MESSAGE, p) for p in encoded_packet]
+
+
+class NegotiatingServer(socketio.AsyncServer):
+    """
+    Socket.IO server where each client picks its own packet serializer.
+
+    Clients connect with `?serializer=msgpack` to get MessagePack packets (and
+    send them); everyone else keeps the default JSON protocol. Pair it with a
+    NegotiatingManager so broadcasts honour the choice too.
+
+    Pass `outbound_options` (OutboundQueues keyword arguments) to give every
+    client a bounded send queue.
+    """
+
+    def __init__(self, *args, outbound_options: Optional[Dict[str, Any]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Engine.IO sids of clients that negotiated MessagePack
+        self.msgpack_clients = set()
+        self.outbound = OutboundQueues(self, **outbound_options) if outbound_options is not None else None
+
+    async def _handle_eio_connect(self, eio_sid, environ):
+        query = parse_qs(environ.get('QUERY_STRING', ''))
+        if query.get('serializer', [''])[0] == 'msgpack':
+            if MSGPACK_AVAILABLE:
+                self.msgpack_clients.add(eio_sid)
+            else:
+                logger.warning("Client asked for MessagePack but msgpack is not installed")
+        return await super()._handle_eio_connect(eio_sid, environ)
+
+    async def _handle_eio_disconnect(self, eio_sid, reason):
+        try:
+            return await super()._handle_eio_disconnect(eio_sid, reason)
+        finally:
+            self.msgpack_clients.discard(eio_sid)
+            if self.outbound is not None:
+                self.outbound.discard(eio_sid)
+
+    async def _handle_eio_message(self, eio_sid, data):
+        if eio_sid not in self.msgpack_clients or not isinstance(data, bytes):
+            return await super()._handle_eio_message(eio_sid, data)
+
+        pkt = BinaryFilePacket(encoded_packet=data)
+        if pkt.packet_type == packet.CONNECT:
+            await self._handle_connect(eio_sid, pkt.namespace, pkt.data)
+        elif pkt.packet_type == packet.DISCONNECT:
+            await self._handle_disconnect(eio_sid, pkt.namespace, self.reason.CLIENT_DISCONNECT)
+        elif pkt.packet_type == packet.EVENT:
+            await self._handle_event(eio_sid, pkt.namespace, pkt.id, pkt.data)
+        elif pkt.packet_type == packet.ACK:
+            await self._handle_ack(eio_sid, pkt.namespace, pkt.id, pkt.data)
+        else:
+            raise ValueError('Unknown packet type.')
+
+    async def _send_packet(self, eio_sid, pkt):
+        if eio_sid in self.msgpack_clients:
+            pkt = _as_msgpack(pkt)
+        return await super()._send_packet(eio_sid, pkt)
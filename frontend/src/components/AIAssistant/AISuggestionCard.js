@@ -3,8 +3,9 @@ import { ThumbsUp, ThumbsDown, X, Sparkles, User } from 'lucide-react';
 import './AISuggestionCard.css';
 
 const AISuggestionCard = ({ suggestion, onVote, onDismiss }) => {
-    const approvals = Object.values(suggestion.votes).filter(v => v === 'approve').length;
-    const totalVotes = Object.keys(suggestion.votes).length;
+    // Tallies and the quorum come from the server
+    const approvals = suggestion.approvals ?? 0;
+    const required = suggestion.required || 1;
 
     return (
         <div className="ai-suggestion-card">
@@ -32,10 +33,10 @@ const AISuggestionCard = ({ suggestion, onVote, onDismiss }) => {
                     <div className="progress-bar">
                         <div
                             className="progress-fill"
-                            style={{ width: `${(approvals / 2) * 100}%` }} // Simplified visual
+                            style={{ width: `${Math.min(approvals / required, 1) * 100}%` }}
                         ></div>
                     </div>
-                    <span>{approvals} approvals</span>
+                    <span>{approvals}/{required} approvals</span>
                 </div>
 
                 <div className="vote-actions">
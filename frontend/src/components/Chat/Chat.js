@@ -2,12 +2,17 @@ import React, { useState, useEffect, useRef } from 'react';
 import { Send, MessageSquare, X, Minimize2, Maximize2 } from 'lucide-react';
 import './Chat.css';
 
+// Messages kept on screen; the server holds the full history
+const MAX_MESSAGES = 300;
+
 const Chat = ({ socket, currentUser, users }) => {
     const [messages, setMessages] = useState([]);
     const [inputMessage, setInputMessage] = useState('');
     const [isMinimized, setIsMinimized] = useState(false);
     const [isExpanded, setIsExpanded] = useState(false);
     const [unreadCount, setUnreadCount] = useState(0);
+    const [hasMore, setHasMore] = useState(false);
+    const loadingOlderRef = useRef(false);
     const messagesEndRef = useRef(null);
     const inputRef = useRef(null);
 
@@ -15,7 +20,14 @@ const Chat = ({ socket, currentUser, users }) => {
         messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
     };
 
+    // Prepending an older page keeps the reader where they were
+    const keepScrollRef = useRef(false);
+
     useEffect(() => {
+        if (keepScrollRef.current) {
+            keepScrollRef.current = false;
+            return;
+        }
         scrollToBottom();
     }, [messages]);
 
@@ -29,20 +41,13 @@ const Chat = ({ socket, currentUser, users }) => {
         if (!socket) return;
 
         const handleChatMessage = (data) => {
-            console.log('Received chat message:', data);
-            const newMessage = {
-                id: `${data.userId}-${data.timestamp}-${Math.random()}`,
-                userId: data.userId,
-                userName: data.userName,
-                userColor: data.userColor,
-                userAvatar: data.userAvatar,
-                message: data.message,
-                timestamp: data.timestamp || Date.now(),
-            };
-
             setMessages(prev => {
-                const updated = [...prev, newMessage];
-                console.log('Messages state updated:', updated);
+                const updated = [...prev, data];
+                // Older messages can be paged back in from the server
+                if (updated.length > MAX_MESSAGES) {
+                    setHasMore(true);
+                    return updated.slice(-MAX_MESSAGES);
+                }
                 return updated;
             });
 
@@ -52,13 +57,44 @@ const Chat = ({ socket, currentUser, users }) => {
             }
         };
 
+        // A page without a request cursor is the latest one and replaces what we have
+        const handleChatHistory = (page) => {
+            const replace = !loadingOlderRef.current;
+            loadingOlderRef.current = false;
+            keepScrollRef.current = !replace;
+            setMessages(prev => {
+                if (replace) return page.messages;
+                const known = new Set(prev.map(m => m.id));
+                return [...page.messages.filter(m => !known.has(m.id)), ...prev];
+            });
+            setHasMore(page.hasMore);
+        };
+
+        const requestLatest = () => {
+            loadingOlderRef.current = false;
+            socket.emit('chat_history', {});
+        };
+
         socket.on('chat_message', handleChatMessage);
+        socket.on('chat_history', handleChatHistory);
+        // (Re)joining a project resets the history to that project's latest page
+        socket.on('session_joined', requestLatest);
+        if (socket.connected) requestLatest();
 
         return () => {
             socket.off('chat_message', handleChatMessage);
+            socket.off('chat_history', handleChatHistory);
+            socket.off('session_joined', requestLatest);
         };
     }, [socket]);
 
+    const loadOlder = () => {
+        if (!socket || messages.length === 0) return;
+        const oldest = messages[0];
+        loadingOlderRef.current = true;
+        socket.emit('chat_history', { before: oldest.timestamp, beforeId: oldest.id });
+    };
+
     const sendMessage = (e) => {
         e?.preventDefault();
 
@@ -163,40 +199,47 @@ const Chat = ({ socket, currentUser, users }) => {
                                 <p className="text-neutral-600 text-xs">Start chatting with your team!</p>
                             </div>
                         ) : (
-                            messages.map((msg) => {
-                                const isOwnMessage = currentUser && msg.userId === currentUser.id;
-                                return (
-                                    <div
-                                        key={msg.id}
-                                        className={`chat-message ${isOwnMessage ? 'own-message' : ''}`}
-                                    >
-                                        {!isOwnMessage && (
-                                            <img
-                                                src={msg.userAvatar}
-                                                alt={msg.userName}
-                                                className="chat-avatar"
-                                                style={{ borderColor: msg.userColor }}
-                                            />
-                                        )}
-                                        <div className="chat-message-content">
-                                            <div className="chat-message-header">
-                                                <span
-                                                    className="chat-message-author"
-                                                    style={{ color: msg.userColor }}
-                                                >
-                                                    {isOwnMessage ? 'You' : msg.userName}
-                                                </span>
-                                                <span className="chat-message-time">
-                                                    {formatTime(msg.timestamp)}
-                                                </span>
-                                            </div>
-                                            <div className="chat-message-text">
-                                                {msg.message}
+                            <>
+                                {hasMore && (
+                                    <button onClick={loadOlder} className="chat-load-more">
+                                        Load earlier messages
+                                    </button>
+                                )}
+                                {messages.map((msg) => {
+                                    const isOwnMessage = currentUser && msg.userId === currentUser.id;
+                                    return (
+                                        <div
+                                            key={msg.id}
+                                            className={`chat-message ${isOwnMessage ? 'own-message' : ''}`}
+                                        >
+                                            {!isOwnMessage && (
+                                                <img
+                                                    src={msg.userAvatar}
+                                                    alt={msg.userName}
+                                                    className="chat-avatar"
+                                                    style={{ borderColor: msg.userColor }}
+                                                />
+                                            )}
+                                            <div className="chat-message-content">
+                                                <div className="chat-message-header">
+                                                    <span
+                                                        className="chat-message-author"
+                                                        style={{ color: msg.userColor }}
+                                                    >
+                                                        {isOwnMessage ? 'You' : msg.userName}
+                                                    </span>
+                                                    <span className="chat-message-time">
+                                                        {formatTime(msg.timestamp)}
+                                                    </span>
+                                                </div>
+                                                <div className="chat-message-text">
+                                                    {msg.message}
+                                                </div>
                                             </div>
                                         </div>
-                                    </div>
-                                );
-                            })
+                                    );
+                                })}
+                            </>
                         )}
                         <div ref={messagesEndRef} />
                     </div>
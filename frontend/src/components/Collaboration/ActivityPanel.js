@@ -2,14 +2,16 @@ import React, { useEffect, useRef } from 'react';
 import { History, Clock, User, FileText, GitCommit, Shield, Package } from 'lucide-react';
 import './ActivityPanel.css';
 
-const ActivityPanel = ({ logs }) => {
+const ActivityPanel = ({ logs, hasMore, onLoadMore }) => {
     const scrollRef = useRef(null);
 
+    // Only jump back to the top for new activity, not when older pages load
+    const latestId = logs.length > 0 ? logs[logs.length - 1].id : null;
     useEffect(() => {
         if (scrollRef.current) {
             scrollRef.current.scrollTop = 0; // Show latest at top
         }
-    }, [logs]);
+    }, [latestId]);
 
     const getIcon = (action) => {
         if (action.includes('joined')) return <User size={12} className="text-emerald-500" />;
@@ -58,6 +60,11 @@ const ActivityPanel = ({ logs }) => {
                         </div>
                     ))
                 )}
+                {hasMore && (
+                    <button className="activity-load-more" onClick={onLoadMore}>
+                        Load older activity
+                    </button>
+                )}
             </div>
         </div>
     );
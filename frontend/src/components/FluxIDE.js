@@ -2,6 +2,9 @@ import React, { useState, useEffect, useRef } from 'react';
 import Editor from '@monaco-editor/react';
 import io from 'socket.io-client';
 import { executeCode, extractVariables, analyzeCode } from '../utils/codeExecution';
+import {
+  applyLineDelta, diffLines, isNoopDelta, splitLines, transformLineDelta, transformRemoteDelta
+} from '../utils/operationalTransform';
 import {
   Play, Pause, SkipForward, CornerDownRight, CornerUpLeft,
   RotateCcw, Square, Circle, FileText, FolderOpen,
@@ -68,29 +71,6 @@ export const FluxIDE = () => {
   const [isPaused, setIsPaused] = useState(false);
   const [executionLine, setExecutionLine] = useState(null);
 
-  // Delta-based Sync Helper
-  const calculateDelta = (oldStr, newStr) => {
-    if (!oldStr) return { type: 'full', content: newStr };
-    const oldLines = oldStr.split('\n');
-    const newLines = newStr.split('\n');
-    let start = 0;
-    while (start < oldLines.length && start < newLines.length && oldLines[start] === newLines[start]) {
-      start++;
-    }
-    let oldEnd = oldLines.length - 1;
-    let newEnd = newLines.length - 1;
-    while (oldEnd >= start && newEnd >= start && oldLines[oldEnd] === newLines[newEnd]) {
-      oldEnd--;
-      newEnd--;
-    }
-    return {
-      type: 'delta',
-      start,
-      removeCount: oldEnd - start + 1,
-      newLines: newLines.slice(start, newEnd + 1)
-    };
-  };
-
   // Helper to add console messages
   const addConsoleMessage = (type, message) => {
     setConsoleOutput(prev => [...prev, { type, message, timestamp: Date.now() }]);
@@ -169,10 +149,20 @@ export const FluxIDE = () => {
   const [offlineChanges, setOfflineChanges] = useState(new Set());
   const [remoteHighlights, setRemoteHighlights] = useState({});
   const [activityLogs, setActivityLogs] = useState([]);
+  const [activityPage, setActivityPage] = useState({ cursor: null, hasMore: false }); // cursor for older timeline pages
   const [activeConflict, setActiveConflict] = useState(null); // { file, ours, theirs }
   const [aiSuggestions, setAiSuggestions] = useState([]); // List of active shared suggestions
   const [envSyncRequest, setEnvSyncRequest] = useState(null); // { file, userName }
-  const lastPublishedContent = useRef({});
+  // Per file: the server's lines as they will be once our edit in flight is
+  // applied, and that edit until its code_ack; anything typed meanwhile is
+  // sent as one delta after the ack
+  const shadowLines = useRef({});
+  const inFlightEdits = useRef({});
+  const fileRevisions = useRef({}); // Last server revision seen per file
+  const resendAt = useRef({}); // Per file: no edits are sent before this time after a rejection
+  const filesRef = useRef(files); // Latest editor text, readable from socket handlers
+  filesRef.current = files;
+  const rosterVersion = useRef(0); // Last roster version applied, see roster_diff
 
   const [extensions, setExtensions] = useState([
     { id: 'eslint', name: 'ESLint', author: 'Microsoft', description: 'JavaScript linter for code quality', downloads: '50M', rating: 4.8, version: '2.4.0', category: 'formatters', icon: '🔍' },
@@ -574,8 +564,11 @@ export const FluxIDE = () => {
 
   // Initialize Socket.IO connection
   useEffect(() => {
+    const projectId = new URLSearchParams(window.location.search).get('project') || 'default';
     const socket = io(SOCKET_URL, {
       path: '/socket.io',
+      // Lets a sticky load balancer route every worker request for a project to the same worker
+      query: { project: projectId },
       transports: ['websocket', 'polling'],
       reconnection: true,
       reconnectionDelay: 1000,
@@ -613,6 +606,7 @@ export const FluxIDE = () => {
 
       socket.emit('join_session', {
         name: `User-${Math.floor(Math.random() * 1000)}`,
+        project: projectId,
         cursor: initialCursor
       });
 
@@ -641,11 +635,57 @@ export const FluxIDE = () => {
     socket.on('session_joined', (data) => {
       console.log('Session Joined Data:', data);
       setUsers(data.users);
+      rosterVersion.current = data.rosterVersion ?? 0;
       if (data.activityLogs) setActivityLogs(data.activityLogs);
+      setActivityPage({ cursor: data.activityCursor ?? null, hasMore: !!data.activityHasMore });
+      if (data.aiSuggestions) setAiSuggestions(data.aiSuggestions);
+      // Ask only for what changed since the revisions we already hold
+      if (data.documents) {
+        const wanted = {};
+        Object.keys(data.documents).forEach(file => {
+          // An edit lost in flight may or may not have landed: start from the snapshot
+          if (inFlightEdits.current[file]) {
+            wanted[file] = null;
+          } else if (fileRevisions.current[file] !== data.documents[file]) {
+            wanted[file] = fileRevisions.current[file] ?? null;
+          }
+        });
+        if (Object.keys(wanted).length > 0) socket.emit('sync_documents', { files: wanted });
+      }
     });
 
-    socket.on('activity_update', (log) => {
-      setActivityLogs(prev => [...prev, log]);
+    socket.on('documents_sync', (data) => {
+      const synced = {};
+      data.documents.forEach(doc => {
+        let lines = doc.snapshot
+          ? doc.snapshot.content.split('\n')
+          : (shadowLines.current[doc.file] ?? (filesRef.current[doc.file] ?? '').split('\n'));
+        // Without a snapshot, skip ops that already arrived as code_update
+        const held = doc.snapshot ? doc.snapshot.revision : (fileRevisions.current[doc.file] ?? -1);
+        doc.ops.forEach(({ revision, delta }) => {
+          if (revision > held) lines = applyLineDelta(lines, delta);
+        });
+        shadowLines.current[doc.file] = lines;
+        fileRevisions.current[doc.file] = doc.revision;
+        delete inFlightEdits.current[doc.file];
+        synced[doc.file] = lines.join('\n');
+      });
+      filesRef.current = { ...filesRef.current, ...synced };
+      setFiles(prev => ({ ...prev, ...synced }));
+    });
+
+    // New entries arrive in batches; skip any already in session_joined's page
+    socket.on('activity_batch', (batch) => {
+      setActivityLogs(prev => {
+        const lastSeq = prev.length ? prev[prev.length - 1].seq : 0;
+        return [...prev, ...batch.logs.filter(log => !(log.seq <= lastSeq))];
+      });
+    });
+
+    // Older timeline page requested via get_activity_logs
+    socket.on('activity_logs', (page) => {
+      setActivityLogs(prev => [...page.logs, ...prev]);
+      setActivityPage({ cursor: page.cursor, hasMore: page.hasMore });
     });
 
     socket.on('ai_suggestion_broadcast', (suggestion) => {
@@ -662,37 +702,63 @@ export const FluxIDE = () => {
       addConsoleMessage('success', `AI Suggestion approved!`);
     });
 
+    socket.on('ai_suggestion_rejected', (rejected) => {
+      setAiSuggestions(prev => prev.filter(s => s.id !== rejected.id));
+      addConsoleMessage('info', `AI Suggestion from ${rejected.userName} was rejected`);
+    });
+
+    socket.on('ai_suggestion_expired', ({ id }) => {
+      setAiSuggestions(prev => prev.filter(s => s.id !== id));
+    });
+
+    // Raised once manifest edits settle and only when dependencies changed
     socket.on('env_sync_required', (data) => {
       setEnvSyncRequest(data);
       addConsoleMessage('info', `Environment sync required due to changes in ${data.file}`);
     });
 
+    // The dependency change was reverted before anyone synced
+    socket.on('env_sync_cleared', (data) => {
+      setEnvSyncRequest(prev => (prev && prev.file === data.file ? null : prev));
+    });
+
     socket.on('env_sync_complete', (data) => {
       setEnvSyncRequest(null);
       addConsoleMessage('success', `Environment sync completed for ${data.file}!`);
     });
 
-    socket.on('user_joined', (user) => {
-      setUsers(prev => [...prev.filter(u => u.id !== user.id), user]);
-    });
-
-    socket.on('user_left', (data) => {
-      setUsers(prev => prev.filter(u => u.id !== data.userId));
-      setRemoteCursors(prev => {
-        const next = { ...prev };
-        delete next[data.userId];
-        return next;
+    // Roster changes arrive as diffs; a skipped version means we missed one, so resync
+    socket.on('roster_diff', (diff) => {
+      if (diff.version <= rosterVersion.current) return;
+      if (diff.version !== rosterVersion.current + 1) {
+        socket.emit('roster_sync');
+        return;
+      }
+      rosterVersion.current = diff.version;
+      const removed = new Set(diff.removed || []);
+      const modified = {};
+      (diff.modified || []).forEach(m => { modified[m.id] = m; });
+      setUsers(prev => {
+        const kept = prev
+          .filter(u => !removed.has(u.id))
+          .map(u => (modified[u.id] ? { ...u, ...modified[u.id] } : u));
+        const added = (diff.added || [])
+          .filter(u => !kept.some(k => k.id === u.id))
+          .map(u => ({ ...u, isLocal: u.id === socket.id }));
+        return [...kept, ...added];
       });
+      if (removed.size > 0) {
+        setRemoteCursors(prev => {
+          const next = { ...prev };
+          removed.forEach(id => { delete next[id]; });
+          return next;
+        });
+      }
     });
 
-    socket.on('users_update', (data) => {
-      console.log('Real Users Update Data:', data);
-      const myId = socket.id;
-      const fixedUsers = data.users.map(u => ({
-        ...u,
-        isLocal: u.id === myId
-      }));
-      setUsers(fixedUsers);
+    socket.on('roster_snapshot', (data) => {
+      rosterVersion.current = data.version;
+      setUsers(data.users);
     });
 
     socket.on('cursor_update', (data) => {
@@ -705,29 +771,99 @@ export const FluxIDE = () => {
       ));
     });
 
+    socket.on('presence_batch', (batch) => {
+      const updates = batch.updates.filter(u => u.userId !== socket.id);
+      if (updates.length === 0) return;
+      const byId = {};
+      updates.forEach(u => { byId[u.userId] = u; });
+      setRemoteCursors(prev => {
+        const next = { ...prev };
+        updates.forEach(u => { if (u.cursor) next[u.userId] = u.cursor; });
+        return next;
+      });
+      setUsers(prev => prev.map(u => {
+        const update = byId[u.id];
+        if (!update) return u;
+        const { userId, ...fields } = update;
+        return { ...u, ...fields };
+      }));
+    });
+
     socket.on('typing_update', (data) => {
       setUsers(prev => prev.map(u =>
         u.id === data.userId ? { ...u, isTyping: data.isTyping } : u
       ));
     });
 
+    socket.on('code_ack', (data) => {
+      fileRevisions.current[data.file] = data.revision;
+      delete inFlightEdits.current[data.file];
+      publishEdit(data.file);
+    });
+
+    // The server turned an event away; a dropped edit is answered with a
+    // code_resync, other events are just reported
+    socket.on('rate_limited', (data) => {
+      if (data.event === 'code_change') return;
+      addConsoleMessage('error', `Slow down: too many ${data.event} requests, retry in ${Math.ceil(data.retryAfterMs / 1000)}s`);
+    });
+
+    // The server refused to open the project (bad id, or too many loaded)
+    socket.on('session_error', (data) => {
+      addConsoleMessage('error', `Cannot join project ${data.project}: ${data.error}`);
+    });
+
+    // Our edit in flight was not applied (rate limited, or based on a revision
+    // the server no longer tracks). Every update sent before this one has been
+    // applied here, so the editor holds the server's head plus our own edits:
+    // take the head as the new base and send the difference again
+    socket.on('code_resync', (data) => {
+      const file = data.file;
+      fileRevisions.current[file] = data.revision;
+      shadowLines.current[file] = data.content.split('\n');
+      delete inFlightEdits.current[file];
+      if (data.retryAfterMs) {
+        resendAt.current[file] = Date.now() + data.retryAfterMs;
+        setTimeout(() => {
+          delete resendAt.current[file];
+          publishEdit(file);
+        }, data.retryAfterMs);
+      } else {
+        publishEdit(file);
+      }
+    });
+
     socket.on('code_update', (data) => {
       // Don't apply our own updates (handled by local state)
       if (data.userId === socket.id) return;
+      if (data.revision !== undefined) fileRevisions.current[data.file] = data.revision;
 
       if (data.operation === 'delta') {
-        setFiles(prev => {
-          const currentContent = prev[data.file] || "";
-          const lines = currentContent.split('\n');
-          // Apply line-level delta
-          lines.splice(data.delta.start, data.delta.removeCount, ...data.delta.newLines);
-          const updatedContent = lines.join('\n');
-
-          // Update lastPublishedContent to keep delta sync aligned
-          lastPublishedContent.current[data.file] = updatedContent;
-
-          return { ...prev, [data.file]: updatedContent };
-        });
+        const file = data.file;
+        const inFlight = inFlightEdits.current[file];
+        // Our full-content update is applied after this one and replaces it
+        if (inFlight && inFlight.full) return;
+
+        // The server committed this before our edit in flight and transforms
+        // that edit past it; do the same here so both sides match
+        let remote = data.delta;
+        if (inFlight) {
+          inFlightEdits.current[file] = transformLineDelta(inFlight, remote);
+          remote = transformRemoteDelta(remote, inFlight);
+        }
+        const known = shadowLines.current[file];
+        const lines = splitLines(filesRef.current[file] ?? '', known);
+        const shadow = known ?? lines;
+        shadowLines.current[file] = applyLineDelta(shadow, remote);
+
+        // Edits typed since the last send have not left yet; rebase past them too
+        const unsent = diffLines(shadow, lines);
+        const updatedContent = applyLineDelta(
+          lines,
+          isNoopDelta(unsent) ? remote : transformRemoteDelta(remote, unsent)
+        ).join('\n');
+        filesRef.current = { ...filesRef.current, [file]: updatedContent };
+        setFiles(prev => ({ ...prev, [file]: updatedContent }));
 
         // Add visual highlight for the remote change
         setRemoteHighlights(prev => ({
@@ -740,11 +876,10 @@ export const FluxIDE = () => {
           }
         }));
       } else {
-        setFiles(prev => {
-          const updated = { ...prev, [data.file]: data.content };
-          lastPublishedContent.current[data.file] = data.content;
-          return updated;
-        });
+        shadowLines.current[data.file] = data.content.split('\n');
+        delete inFlightEdits.current[data.file];
+        filesRef.current = { ...filesRef.current, [data.file]: data.content };
+        setFiles(prev => ({ ...prev, [data.file]: data.content }));
       }
     });
 
@@ -908,6 +1043,32 @@ export const FluxIDE = () => {
     }
   };
 
+  // Send a file's local changes unless an edit is already waiting for its ack
+  const publishEdit = (file) => {
+    const socket = socketRef.current;
+    if (!socket || inFlightEdits.current[file] || Date.now() < (resendAt.current[file] ?? 0)) return;
+
+    const text = filesRef.current[file] ?? '';
+    const shadow = shadowLines.current[file];
+    const lines = splitLines(text, shadow);
+    if (shadow === undefined) {
+      // Nothing known about the server's copy yet: send the whole file
+      inFlightEdits.current[file] = { full: true };
+      socket.emit('code_change', { file, content: text, operation: 'update' });
+    } else {
+      const delta = diffLines(shadow, lines);
+      if (isNoopDelta(delta)) return;
+      inFlightEdits.current[file] = delta;
+      socket.emit('code_change', {
+        file,
+        delta,
+        revision: fileRevisions.current[file],
+        operation: 'delta'
+      });
+    }
+    shadowLines.current[file] = lines;
+  };
+
   const handleEditorChange = (value) => {
     // Determine language from active file extension
     const lang = fileList.find(f => f.name === activeFile)?.language || 'javascript';
@@ -946,16 +1107,8 @@ export const FluxIDE = () => {
     }
 
     if (socketRef.current && isOnline) {
-      const prevContent = lastPublishedContent.current[activeFile] || "";
-      const delta = calculateDelta(prevContent, value);
-
-      socketRef.current.emit('code_change', {
-        file: activeFile,
-        delta,
-        operation: delta.type === 'full' ? 'update' : 'delta'
-      });
-
-      lastPublishedContent.current[activeFile] = value;
+      filesRef.current = { ...filesRef.current, [activeFile]: value };
+      publishEdit(activeFile);
       socketRef.current.emit('typing_status', { isTyping: true });
 
       clearTimeout(window.typingTimeout);
@@ -1466,6 +1619,8 @@ export const FluxIDE = () => {
         localRepos={localRepos}
         users={users}
         activityLogs={activityLogs}
+        activityHasMore={activityPage.hasMore}
+        onLoadOlderActivity={() => socketRef.current?.emit('get_activity_logs', { cursor: activityPage.cursor })}
         socket={socketInstance}
         username="User"
         settings={settings}
@@ -1499,6 +1654,15 @@ export const FluxIDE = () => {
           <div className="flex items-center gap-2 text-blue-400">
             <Package size={18} />
             <span className="text-sm font-bold tracking-tight">Dependencies modified by {envSyncRequest.userName}</span>
+            {envSyncRequest.added && (
+              <span className="text-xs text-neutral-400" title={[
+                ...envSyncRequest.added.map(d => `+ ${d.name}@${d.to}`),
+                ...envSyncRequest.changed.map(d => `~ ${d.name}@${d.from} → ${d.to}`),
+                ...envSyncRequest.removed.map(d => `- ${d.name}`)
+              ].join('\n')}>
+                +{envSyncRequest.added.length} ~{envSyncRequest.changed.length} -{envSyncRequest.removed.length}
+              </span>
+            )}
           </div>
           <div className="h-4 w-px bg-white/10" />
           <button
@@ -58,6 +58,8 @@ export const ProfessionalLayout = ({
     localRepos,
     users,
     activityLogs,
+    activityHasMore,
+    onLoadOlderActivity,
     socket,
     username,
     settings,
@@ -239,7 +241,11 @@ export const ProfessionalLayout = ({
                             </div>
                         )}
                         {rightPanel.activePanel === 'timeline' && (
-                            <ActivityPanel logs={activityLogs || []} />
+                            <ActivityPanel
+                                logs={activityLogs || []}
+                                hasMore={activityHasMore}
+                                onLoadMore={onLoadOlderActivity}
+                            />
                         )}
                         {rightPanel.activePanel === 'ai' && (
                             <AIAssistant
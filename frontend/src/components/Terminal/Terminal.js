@@ -83,7 +83,13 @@ const Terminal = ({ socket }) => {
 
     // Handle user input with command line support
     const dataDisposable = term.onData(data => {
-      if (isExecuting) return;
+      if (isExecuting) {
+        // Ctrl+C interrupts the running command; terminal_status ends it
+        if (data.charCodeAt(0) === 3 && socket && socket.connected) {
+          socket.emit('terminal_interrupt');
+        }
+        return;
+      }
 
       const code = data.charCodeAt(0);
 
@@ -152,21 +158,28 @@ const Terminal = ({ socket }) => {
       }
     });
 
-    // Handle terminal output from server
+    // Handle terminal output from server; partial chunks stream while the
+    // command runs and terminal_status ends it
     const handleOutput = (data) => {
-      isExecuting = false;
+      if (!data.partial) isExecuting = false;
       if (term && data.output) {
         if (data.output === '\x1b[2J\x1b[H') {
           term.clear();
         } else {
           term.write(data.output);
         }
-        term.write('$ ');
+        if (!data.partial) term.write('$ ');
       }
     };
 
+    const handleStatus = () => {
+      isExecuting = false;
+      if (term) term.write('$ ');
+    };
+
     if (socket) {
       socket.on('terminal_output', handleOutput);
+      socket.on('terminal_status', handleStatus);
     }
 
     // ResizeObserver for responsive fitting
@@ -220,6 +233,7 @@ const Terminal = ({ socket }) => {
       dataDisposable.dispose();
       if (socket) {
         socket.off('terminal_output', handleOutput);
+        socket.off('terminal_status', handleStatus);
       }
       if (terminalRef.current) {
         terminalRef.current.removeEventListener('click', focusHandler);
@@ -110,4 +110,85 @@ export function mergeCursor(baseCursor, operation) {
   }
 
   return newCursor;
-}
\ No newline at end of file
+}
+
+// Line splices exchanged with the collaboration server: replace `removeCount`
+// lines from `start` with `newLines`. These mirror backend/collaboration/document.py
+// so the editor can rebase remote updates past its own unacknowledged edits.
+
+export function diffLines(oldLines, newLines) {
+  let start = 0;
+  while (start < oldLines.length && start < newLines.length && oldLines[start] === newLines[start]) {
+    start++;
+  }
+  let oldEnd = oldLines.length - 1;
+  let newEnd = newLines.length - 1;
+  while (oldEnd >= start && newEnd >= start && oldLines[oldEnd] === newLines[newEnd]) {
+    oldEnd--;
+    newEnd--;
+  }
+  return {
+    type: 'delta',
+    start,
+    removeCount: oldEnd - start + 1,
+    newLines: newLines.slice(start, newEnd + 1)
+  };
+}
+
+// Lines of `text`, reusing `known` when it already spells the same text: ''
+// is both zero lines and one empty line, and must not turn into an edit
+export function splitLines(text, known) {
+  if (known && known.join('\n') === text) return known;
+  return text.split('\n');
+}
+
+export function isNoopDelta(delta) {
+  return delta.removeCount === 0 && delta.newLines.length === 0;
+}
+
+export function applyLineDelta(lines, delta) {
+  const next = lines.slice();
+  const start = Math.min(delta.start, next.length);
+  next.splice(start, Math.min(delta.removeCount, next.length - start), ...delta.newLines);
+  return next;
+}
+
+// `op` rebased onto `applied`, both made against the same revision (server side)
+export function transformLineDelta(op, applied) {
+  const aStart = applied.start, aEnd = applied.start + applied.removeCount;
+  const bStart = op.start, bEnd = op.start + op.removeCount;
+  const shift = applied.newLines.length - applied.removeCount;
+
+  if (op.removeCount === 0 && applied.removeCount === 0 && bStart === aStart) {
+    return { ...op, start: bStart + applied.newLines.length };
+  }
+  if (bEnd <= aStart) return { ...op };
+  if (bStart >= aEnd) return { ...op, start: bStart + shift };
+
+  const newStart = Math.min(bStart, aStart);
+  const newEnd = bEnd <= aEnd ? aStart + applied.newLines.length : bEnd + shift;
+  return { ...op, start: newStart, removeCount: newEnd - newStart };
+}
+
+// `applied`, committed by the server first, rebased onto `pending`, a local
+// edit the server has not seen yet; the server turns `pending` into
+// transformLineDelta(pending, applied), so both orders end up identical
+export function transformRemoteDelta(applied, pending) {
+  const aStart = applied.start, aEnd = applied.start + applied.removeCount;
+  const bStart = pending.start, bEnd = pending.start + pending.removeCount;
+  const shift = pending.newLines.length - pending.removeCount;
+
+  if (pending.removeCount === 0 && applied.removeCount === 0 && bStart === aStart) {
+    return { ...applied };
+  }
+  if (bEnd <= aStart) return { ...applied, start: aStart + shift };
+  if (bStart >= aEnd) return { ...applied };
+
+  const newStart = Math.min(aStart, bStart);
+  return {
+    ...applied,
+    start: newStart,
+    removeCount: (bStart - newStart) + pending.newLines.length + (Math.max(aEnd, bEnd) - bEnd),
+    newLines: pending.newLines.slice()
+  };
+}
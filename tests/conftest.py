@@ -0,0 +1,8 @@
+"""
+Test configuration - backend modules import each other from the backend
+directory, so it goes on the path first
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
@@ -0,0 +1,69 @@
+"""
+Tests for the activity timeline and its SQLite spill
+"""
+import asyncio
+import threading
+
+from collaboration.activity import ActivityLog, SQLiteActivitySpill
+from database.db import Database
+
+
+def make_spill(tmp_path):
+    database = Database(str(tmp_path / 'flux_ide.db'))
+    database.initialize()
+    return SQLiteActivitySpill(database)
+
+
+class ThreadCheckingSpill(SQLiteActivitySpill):
+    """Records which threads touched the database"""
+
+    def __init__(self, database):
+        super().__init__(database)
+        self.threads = set()
+
+    def last_seq(self, project_id):
+        self.threads.add(threading.get_ident())
+        return super().last_seq(project_id)
+
+    def write(self, project_id, entries):
+        self.threads.add(threading.get_ident())
+        return super().write(project_id, entries)
+
+    def read_before(self, project_id, before, limit):
+        self.threads.add(threading.get_ident())
+        return super().read_before(project_id, before, limit)
+
+
+def test_evicted_entries_are_paged_back_from_the_spill(tmp_path):
+    spill = ThreadCheckingSpill(make_spill(tmp_path).database)
+
+    async def scenario():
+        log = ActivityLog('p', capacity=2, page_size=3, spill=spill)
+        await log.load()
+        for i in range(6):
+            log.append({'action': f"a{i}"})
+        first = await log.page()
+        second = await log.page(before=first['cursor'])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert [e['action'] for e in first['logs']] == ['a3', 'a4', 'a5']
+    assert first['hasMore']
+    assert [e['action'] for e in second['logs']] == ['a0', 'a1', 'a2']
+    assert not second['hasMore']
+    # The test's own thread ran the loop; every query ran in a worker thread
+    assert spill.threads and threading.get_ident() not in spill.threads
+
+
+def test_sequence_continues_from_the_spill_once_loaded(tmp_path):
+    spill = make_spill(tmp_path)
+    spill.write('p', [{'seq': 41, 'action': 'old'}])
+
+    async def scenario():
+        log = ActivityLog('p', spill=spill)
+        # Nothing is read until the log is used
+        assert log.seq == 0
+        await asyncio.gather(log.load(), log.load())
+        return log.append({'action': 'new'})
+
+    assert asyncio.run(scenario())['seq'] == 42
@@ -0,0 +1,83 @@
+"""
+Tests for the shared batching loop and the batchers built on it
+"""
+import asyncio
+
+from collaboration.activity import ActivityBatcher, ActivityLog
+from collaboration.batching import Batcher
+from collaboration.presence import PresenceAggregator
+
+
+class ListBatcher(Batcher):
+    def __init__(self, window):
+        super().__init__(window)
+        self.pending = []
+        self.flushed = []
+
+    def add(self, item):
+        self.pending.append(item)
+        self.schedule()
+
+    async def flush(self):
+        pending, self.pending = self.pending, []
+        if pending:
+            self.flushed.append(pending)
+
+
+def test_loop_flushes_per_window_and_exits_when_idle():
+    async def scenario():
+        batcher = ListBatcher(0.01)
+        batcher.add(1)
+        batcher.add(2)
+        await asyncio.sleep(0.05)
+        idle = batcher._task.done()
+        batcher.add(3)
+        await asyncio.sleep(0.05)
+        return batcher.flushed, idle
+
+    assert asyncio.run(scenario()) == ([[1, 2], [3]], True)
+
+
+def test_stop_flushes_what_is_pending():
+    async def scenario():
+        batcher = ListBatcher(60)
+        batcher.add(1)
+        await batcher.stop()
+        return batcher.flushed, batcher._task
+
+    assert asyncio.run(scenario()) == ([[1]], None)
+
+
+def test_presence_updates_merge_per_user():
+    async def scenario():
+        sent = []
+
+        async def emit(batch, room):
+            sent.append((room, batch))
+
+        presence = PresenceAggregator(emit, tick_interval=60)
+        presence.update('a', room='r', cursor=1)
+        presence.update('a', room='r', cursor=2, isTyping=True)
+        presence.update('b', room='r', cursor=5)
+        presence.discard('b', room='r')
+        await presence.stop()
+        return sent
+
+    assert asyncio.run(scenario()) == [('r', {'updates': [{'userId': 'a', 'cursor': 2, 'isTyping': True}]})]
+
+
+def test_activity_entries_are_batched_in_order():
+    async def scenario():
+        sent = []
+
+        async def emit(batch, room):
+            sent.append((room, [entry['action'] for entry in batch['logs']]))
+
+        activity = ActivityBatcher(emit, window=60)
+        log = ActivityLog('p')
+        for action in ('joined', 'edited', 'left'):
+            activity.add(log, 'r', {'action': action})
+        await activity.stop()
+        return sent, log.seq
+
+    assert asyncio.run(scenario()) == ([('r', ['joined', 'edited', 'left'])], 3)
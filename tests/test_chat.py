@@ -0,0 +1,78 @@
+"""
+Tests for chat history and its batched SQLite store
+"""
+import asyncio
+
+from collaboration.chat import ChatHistory, SQLiteChatStore
+from database.db import Database
+
+
+def make_store(tmp_path):
+    database = Database(str(tmp_path / 'flux_ide.db'))
+    database.initialize()
+    return SQLiteChatStore(database, window=0.01)
+
+
+def send(chat, count, start=0):
+    async def scenario():
+        return [await chat.append({'userId': 'a', 'message': f"m{i}"}) for i in range(start, start + count)]
+    return asyncio.run(scenario())
+
+
+def test_pages_walk_back_from_memory():
+    chat = ChatHistory('p', capacity=10, page_size=3)
+    send(chat, 5)
+    first = asyncio.run(chat.page())
+    assert [m['message'] for m in first['messages']] == ['m2', 'm3', 'm4']
+    assert first['hasMore']
+    cursor = first['cursor']
+    second = asyncio.run(chat.page(before=cursor['timestamp'], before_id=cursor['id']))
+    assert [m['message'] for m in second['messages']] == ['m0', 'm1']
+    assert not second['hasMore']
+
+
+def test_older_pages_come_from_the_store(tmp_path):
+    store = make_store(tmp_path)
+
+    async def scenario():
+        chat = ChatHistory('p', capacity=2, page_size=3, store=store)
+        for i in range(6):
+            await chat.append({'userId': 'a', 'message': f"m{i}"})
+        # Queued messages are written before the store is read
+        return await chat.page()
+
+    page = asyncio.run(scenario())
+    assert [m['message'] for m in page['messages']] == ['m3', 'm4', 'm5']
+    assert page['hasMore']
+
+
+def test_history_is_loaded_lazily_and_ids_continue(tmp_path):
+    store = make_store(tmp_path)
+
+    async def scenario():
+        chat = ChatHistory('p', store=store)
+        for i in range(3):
+            await chat.append({'userId': 'a', 'message': f"m{i}"})
+        await store.stop()
+
+        restarted = ChatHistory('p', store=store)
+        assert len(restarted) == 0
+        message = await restarted.append({'userId': 'b', 'message': 'again'})
+        return restarted, message
+
+    restarted, message = asyncio.run(scenario())
+    assert message['id'] == 4
+    assert [m['message'] for m in restarted.messages] == ['m0', 'm1', 'm2', 'again']
+
+
+def test_concurrent_first_use_loads_once(tmp_path):
+    store = make_store(tmp_path)
+    store.add('p', {'id': 1, 'timestamp': 1, 'message': 'old'})
+
+    async def scenario():
+        chat = ChatHistory('p', store=store)
+        return chat, await asyncio.gather(*(chat.append({'message': str(i)}) for i in range(3)))
+
+    chat, messages = asyncio.run(scenario())
+    assert [m['id'] for m in messages] == [2, 3, 4]
+    assert [m['message'] for m in chat.messages] == ['old', '0', '1', '2']
@@ -0,0 +1,85 @@
+"""
+Tests for the registry circuit breaker
+"""
+import pytest
+
+from registry import circuit
+from registry.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(circuit.random, 'uniform', lambda low, high: 1.0)
+    return now
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker('npm', failure_threshold=3, base_delay=1, max_delay=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+
+def test_lets_exactly_one_probe_through_once_the_delay_passed(clock):
+    breaker = CircuitBreaker('npm', failure_threshold=1, base_delay=1)
+    breaker.record_failure()
+    clock[0] += 0.5
+    assert not breaker.allow()
+
+    clock[0] += 0.5
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probes_double_the_delay_up_to_the_maximum(clock):
+    breaker = CircuitBreaker('npm', failure_threshold=1, base_delay=1, max_delay=5)
+    breaker.record_failure()
+    delays = []
+    for _ in range(4):
+        delays.append(breaker.retry_at - clock[0])
+        clock[0] = breaker.retry_at
+        assert breaker.allow()
+        breaker.record_failure()
+    assert delays == [1, 2, 4, 5]
+
+    # Recovery starts the backoff over
+    clock[0] = breaker.retry_at
+    breaker.allow()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.retry_at - clock[0] == 1
+
+
+def test_abandoned_probe_frees_the_slot(clock):
+    breaker = CircuitBreaker('npm', failure_threshold=1, base_delay=1)
+    breaker.record_failure()
+    clock[0] += 1
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_late_failures_do_not_extend_an_open_circuit(clock):
+    breaker = CircuitBreaker('npm', failure_threshold=1, base_delay=1)
+    breaker.record_failure()
+    retry_at = breaker.retry_at
+    # A call that started before the circuit opened
+    breaker.record_failure()
+    assert breaker.retry_at == retry_at
+    assert breaker.to_dict() == {'state': OPEN, 'failures': 1, 'retryInMs': 1000, 'rejected': 0}
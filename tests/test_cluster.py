@@ -0,0 +1,112 @@
+"""
+Tests for the file-backed message bus and state backend shared by workers
+"""
+import asyncio
+import threading
+
+from cluster.bus import FileBusManager
+from cluster.state import FileStateBackend
+
+
+class ThreadCheckingBus(FileBusManager):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = set()
+
+    def _append(self, line):
+        self.threads.add(threading.get_ident())
+        return super()._append(line)
+
+
+def receive(path, publish, count, **kwargs):
+    """Start a listener on the bus at `path`, run publish(), and collect `count` messages"""
+    async def scenario():
+        listener = FileBusManager(path, poll_interval=0.001, **kwargs)
+        messages = listener._listen()
+        received = []
+
+        async def collect():
+            async for message in messages:
+                received.append(message)
+                if len(received) == count:
+                    return
+
+        task = asyncio.ensure_future(collect())
+        # Let the listener open the file and seek to its end
+        await asyncio.sleep(0.05)
+        await publish()
+        await asyncio.wait_for(task, 5)
+        await messages.aclose()
+        return received
+
+    return asyncio.run(scenario())
+
+
+def test_messages_published_by_one_worker_reach_another(tmp_path):
+    path = str(tmp_path / 'bus.log')
+    publisher = ThreadCheckingBus(path)
+
+    async def publish():
+        await asyncio.gather(*(publisher._publish({'method': 'emit', 'n': n}) for n in range(20)))
+
+    received = receive(path, publish, 20)
+    assert [message['n'] for message in received] == list(range(20))
+    assert publisher.threads and threading.get_ident() not in publisher.threads
+
+
+def test_listener_follows_the_bus_across_rotation(tmp_path):
+    path = str(tmp_path / 'bus.log')
+    publisher = FileBusManager(path, max_bytes=200)
+
+    async def publish():
+        for n in range(30):
+            await publisher._publish({'method': 'emit', 'n': n})
+            # Leave the listener time to drain the file before it is rotated twice
+            await asyncio.sleep(0.005)
+
+    received = receive(path, publish, 30)
+    assert [message['n'] for message in received] == list(range(30))
+
+
+def test_other_channels_are_ignored(tmp_path):
+    path = str(tmp_path / 'bus.log')
+    other = FileBusManager(path, channel='other')
+    publisher = FileBusManager(path)
+
+    async def publish():
+        await other._publish({'n': 'other'})
+        await publisher._publish({'n': 'mine'})
+
+    assert receive(path, publish, 1) == [{'n': 'mine'}]
+
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    # Two workers sharing the directory, each updating from many tasks
+    workers = [FileStateBackend(str(tmp_path)), FileStateBackend(str(tmp_path))]
+
+    async def scenario():
+        await asyncio.gather(*(
+            workers[n % 2].update('counter', lambda value: value + 1, 0)
+            for n in range(40)
+        ))
+        return await workers[0].get('counter')
+
+    assert asyncio.run(scenario()) == 40
+
+
+def test_state_round_trip(tmp_path):
+    async def scenario():
+        state = FileStateBackend(str(tmp_path))
+        default = {'users': {}}
+        missing = await state.get('roster:p', default)
+        missing['users']['a'] = 1
+        await state.set('roster:p', {'users': {'b': 2}})
+        stored = await state.get('roster:p')
+        await state.delete('roster:p')
+        return default, stored, await state.get('roster:p', 'gone')
+
+    default, stored, deleted = asyncio.run(scenario())
+    # Defaults are copied, never handed out to be mutated
+    assert default == {'users': {}}
+    assert stored == {'users': {'b': 2}}
+    assert deleted == 'gone'
@@ -0,0 +1,215 @@
+"""
+Tests for the line-level OT document model
+"""
+import random
+
+import pytest
+
+from collaboration.document import (
+    Document, LineOperation, StaleRevisionError, diff_lines, transform, transform_remote
+)
+
+
+def op(start, remove_count, new_lines=()):
+    return LineOperation(start, remove_count, list(new_lines))
+
+
+def splice(lines, operation):
+    lines = list(lines)
+    start = min(operation.start, len(lines))
+    lines[start:start + min(operation.remove_count, len(lines) - start)] = operation.new_lines
+    return lines
+
+
+class TestTransform:
+    def test_edit_before_applied_region_is_unchanged(self):
+        assert transform(op(0, 1, ['x']), op(2, 1, ['y'])) == op(0, 1, ['x'])
+
+    def test_edit_after_applied_region_is_shifted(self):
+        assert transform(op(3, 1, ['x']), op(0, 1, ['a', 'b', 'c'])).start == 5
+
+    def test_concurrent_inserts_at_same_line_keep_applied_first(self):
+        assert transform(op(1, 0, ['x']), op(1, 0, ['a', 'b'])).start == 3
+
+    def test_overlap_replaces_applied_region(self):
+        result = transform(op(1, 2, ['x']), op(2, 2, ['y']))
+        assert (result.start, result.remove_count, result.new_lines) == (1, 2, ['x'])
+
+    @pytest.mark.parametrize('first, second', [
+        (op(2, 1, ['C']), op(0, 0, ['X'])),
+        (op(0, 0, ['X']), op(0, 0, ['Y'])),
+        (op(1, 2, ['x']), op(2, 1, ['y', 'z'])),
+        (op(0, 3, []), op(1, 0, ['i'])),
+        (op(3, 0, ['end']), op(0, 3, ['only']))
+    ])
+    def test_both_orders_converge(self, first, second):
+        base = ['a', 'b', 'c']
+        # The server applied `first`, then `second` transformed past it; a client
+        # holding `second` applies `first` rebased past its edit
+        server = splice(splice(base, first), transform(second, first))
+        client = splice(splice(base, second), transform_remote(first, second))
+        assert server == client
+
+
+class TestDocument:
+    def test_apply_transforms_against_ops_since_base_revision(self):
+        doc = Document('f', 'a\nb\nc')
+        doc.apply(op(0, 0, ['X']), base_revision=0)
+        applied = doc.apply(op(2, 1, ['C']), base_revision=0)
+        assert applied.start == 3
+        assert applied.revision == 2
+        assert doc.content == 'X\na\nb\nC'
+
+    def test_noop_does_not_bump_revision(self):
+        doc = Document('f', 'a')
+        result = doc.apply(op(0, 0))
+        assert result.is_noop
+        assert doc.revision == 0
+
+    def test_out_of_bounds_op_is_clamped(self):
+        doc = Document('f', 'a\nb')
+        doc.apply(op(5, 3, ['z']))
+        assert doc.lines == ['a', 'b', 'z']
+
+    def test_emptied_document_has_no_phantom_line(self):
+        doc = Document('f', 'a\nb')
+        doc.apply(op(0, 2))
+        assert doc.lines == []
+        doc.apply(op(0, 0, ['x']))
+        assert doc.content == 'x'
+
+    def test_stale_base_revision_raises(self):
+        doc = Document('f', 'a', max_history=2)
+        for i in range(4):
+            doc.apply(op(0, 1, [str(i)]))
+        with pytest.raises(StaleRevisionError):
+            doc.apply(op(0, 1, ['late']), base_revision=0)
+
+    def test_replace_content_applies_minimal_splice(self):
+        doc = Document('f', 'a\nb\nc')
+        result = doc.replace_content('a\nB\nc')
+        assert (result.start, result.remove_count, result.new_lines) == (1, 1, ['B'])
+
+    def test_diff_lines_round_trips(self):
+        old, new = ['a', 'b', 'c', 'd'], ['a', 'x', 'y', 'd']
+        assert splice(old, diff_lines(old, new)) == new
+
+
+class Client:
+    """
+    The editor's sync loop: one edit in flight until it is acknowledged,
+    later edits held back, remote updates rebased past both
+    """
+
+    def __init__(self, name, doc):
+        self.name = name
+        self.shadow = list(doc.lines)
+        self.text = doc.content
+        self.revision = doc.revision
+        self.in_flight = None
+
+    def lines(self, known):
+        return known if '\n'.join(known) == self.text else self.text.split('\n')
+
+    def edit(self, rnd):
+        lines = self.lines(self.shadow)
+        start = rnd.randint(0, len(lines))
+        remove = rnd.randint(0, min(2, len(lines) - start))
+        new = [f"{self.name}{rnd.randint(0, 99)}" for _ in range(rnd.randint(0, 2))]
+        self.text = '\n'.join(splice(lines, op(start, remove, new)))
+
+    def send(self):
+        lines = self.lines(self.shadow)
+        if self.in_flight is not None or lines == self.shadow:
+            return None
+        self.in_flight = diff_lines(self.shadow, lines)
+        self.shadow = lines
+        return self.name, self.in_flight.to_delta(), self.revision
+
+    def receive(self, message):
+        kind, payload, revision = message
+        self.revision = revision
+        if kind == 'ack':
+            self.in_flight = None
+            return
+        remote = payload
+        if self.in_flight is not None:
+            remote, self.in_flight = transform_remote(remote, self.in_flight), transform(self.in_flight, remote)
+        shadow = self.shadow
+        lines = self.lines(shadow)
+        self.shadow = splice(shadow, remote)
+        unsent = diff_lines(shadow, lines)
+        self.text = '\n'.join(splice(lines, remote if unsent.is_noop else transform_remote(remote, unsent)))
+
+
+def test_reported_divergence_converges():
+    """A replaces line 2 while B concurrently inserts at line 0"""
+    doc = Document('f', 'a\nb\nc')
+    a, b = Client('A', doc), Client('B', doc)
+    a.text = 'a\nb\nC'
+    b.text = 'X\na\nb\nc'
+    _, a_delta, a_rev = a.send()
+    _, b_delta, b_rev = b.send()
+
+    a_op = doc.apply(LineOperation.from_delta(a_delta), a_rev)
+    b_op = doc.apply(LineOperation.from_delta(b_delta), b_rev)
+    # Each client hears about the ops in the order the server committed them;
+    # B gets A's op while its own insert is still in flight
+    a.receive(('ack', None, a_op.revision))
+    a.receive(('op', op(b_op.start, b_op.remove_count, b_op.new_lines), b_op.revision))
+    b.receive(('op', op(a_op.start, a_op.remove_count, a_op.new_lines), a_op.revision))
+    b.receive(('ack', None, b_op.revision))
+
+    assert doc.content == a.text == b.text == 'X\na\nb\nC'
+
+
+def test_random_concurrent_edits_converge():
+    for seed in range(300):
+        converge(random.Random(seed))
+
+
+def converge(rnd):
+    """Three clients editing, sending and receiving in a random interleaving"""
+    doc = Document('f', 'a\nb\nc')
+    clients = {name: Client(name, doc) for name in 'ABC'}
+    outbox = {name: [] for name in clients}
+    inbox = []
+
+    def commit():
+        name, delta, revision = inbox.pop(0)
+        applied = doc.apply(LineOperation.from_delta(delta), revision)
+        for other in clients:
+            if other == name:
+                outbox[other].append(('ack', None, doc.revision))
+            elif not applied.is_noop:
+                outbox[other].append(('op', op(applied.start, applied.remove_count, applied.new_lines), doc.revision))
+
+    for _ in range(60):
+        client = rnd.choice(list(clients.values()))
+        action = rnd.random()
+        if action < 0.4:
+            client.edit(rnd)
+        elif action < 0.6:
+            message = client.send()
+            if message:
+                inbox.append(message)
+        elif action < 0.8 and inbox:
+            commit()
+        elif outbox[client.name]:
+            client.receive(outbox[client.name].pop(0))
+
+    while True:
+        for client in clients.values():
+            message = client.send()
+            if message:
+                inbox.append(message)
+        if not inbox and not any(outbox.values()):
+            break
+        while inbox:
+            commit()
+        for name, client in clients.items():
+            while outbox[name]:
+                client.receive(outbox[name].pop(0))
+
+    for client in clients.values():
+        assert client.text == doc.content, client.name
@@ -0,0 +1,81 @@
+"""
+Tests for the snapshotting document store
+"""
+from collaboration.document_store import DocumentStore
+from filesystem.virtual_fs import VirtualFileSystem
+
+
+def make_store(files=None, **kwargs):
+    fs = VirtualFileSystem()
+    fs.files = dict(files or {})
+    return fs, DocumentStore(fs, **kwargs)
+
+
+def delta(start, remove_count, new_lines=()):
+    return {'type': 'delta', 'start': start, 'removeCount': remove_count, 'newLines': list(new_lines)}
+
+
+def test_delta_is_applied_and_snapshotted_at_interval():
+    fs, store = make_store({'a.txt': 'one\ntwo'}, snapshot_interval=2)
+    store.apply_delta('a.txt', delta(0, 1, ['ONE']), base_revision=0)
+    assert fs.files['a.txt'] == 'one\ntwo'
+    store.apply_delta('a.txt', delta(1, 1, ['TWO']), base_revision=1)
+    assert fs.files['a.txt'] == 'ONE\nTWO'
+    assert store.snapshots['a.txt'][0] == 2
+
+
+def test_noop_delta_returns_none():
+    _, store = make_store({'a.txt': 'x'})
+    assert store.apply_delta('a.txt', delta(0, 0)) is None
+
+
+def test_full_update_is_diffed_against_head():
+    _, store = make_store({'a.txt': 'a\nb\nc'})
+    op = store.apply_delta('a.txt', {'type': 'full', 'content': 'a\nB\nc'})
+    assert (op.start, op.remove_count, op.new_lines) == (1, 1, ['B'])
+
+
+def test_changes_since_returns_op_tail_when_covered():
+    _, store = make_store({'a.txt': 'a'})
+    store.apply_delta('a.txt', delta(1, 0, ['b']), base_revision=0)
+    store.apply_delta('a.txt', delta(2, 0, ['c']), base_revision=1)
+    changes = store.changes_since('a.txt', 1)
+    assert 'snapshot' not in changes
+    assert [op['revision'] for op in changes['ops']] == [2]
+
+
+def test_changes_since_falls_back_to_snapshot():
+    _, store = make_store({'a.txt': 'a'}, snapshot_interval=2, max_log=2)
+    for i in range(5):
+        store.apply_delta('a.txt', delta(0, 1, [str(i)]))
+    changes = store.changes_since('a.txt', 0)
+    assert changes['snapshot']['revision'] == 4
+    assert changes['snapshot']['content'] == '3'
+    assert [op['revision'] for op in changes['ops']] == [5]
+
+
+def test_outside_write_is_folded_in_and_handed_over_once():
+    fs, store = make_store({'package.json': '{\n"a": 1\n}'})
+    doc = store.get('package.json')
+    fs.files['package.json'] = '{\n"a": 1,\n"b": 2\n}'
+
+    picked_up = store.pick_up_outside_writes()
+    assert [(path, op.revision) for path, op in picked_up] == [('package.json', 1)]
+    assert doc.content == fs.files['package.json']
+    assert store.pick_up_outside_writes() == []
+
+
+def test_outside_write_seen_by_get_is_still_handed_over():
+    fs, store = make_store({'a.txt': 'a'})
+    store.get('a.txt')
+    fs.files['a.txt'] = 'b'
+    # A client edit picks up the write first; the op must still reach the others
+    store.apply_delta('a.txt', delta(1, 0, ['c']), base_revision=0)
+    assert [op.new_lines for _, op in store.pick_up_outside_writes()] == [['b']]
+    assert store.get('a.txt').content == 'b\nc'
+
+
+def test_own_snapshot_is_not_an_outside_write():
+    _, store = make_store({'a.txt': 'a'}, snapshot_interval=1)
+    store.apply_delta('a.txt', delta(0, 1, ['b']))
+    assert store.pick_up_outside_writes() == []
@@ -0,0 +1,71 @@
+"""
+Tests for manifest diffs and the environment sync they drive
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+from collaboration.env_sync import EnvSyncDetector
+from commands.executor import CommandExecutor
+from package_managers.manifest import diff_dependencies, parse_dependencies
+
+
+class RecordingNPM:
+    def __init__(self):
+        self.installed = []
+
+    async def install(self, name, version=None, save_dev=False, global_install=False, on_output=None):
+        self.installed.append((name, version, save_dev))
+        return SimpleNamespace(output_lines=SimpleNamespace(unsent=lambda: []), warnings=[], errors=[], success=True)
+
+
+def test_scoped_dependencies_install_under_their_own_name():
+    old = parse_dependencies('package.json', json.dumps({'dependencies': {'react': '^18.0.0'}}))
+    new = parse_dependencies('package.json', json.dumps({
+        'dependencies': {'react': '^18.2.0', '@babel/core': '7.24.0'},
+        'devDependencies': {'@types/node': '^20.1.0'}
+    }))
+    npm = RecordingNPM()
+    executor = CommandExecutor(npm, None, None)
+
+    async def scenario():
+        return [await executor.execute(command) for command in diff_dependencies('package.json', old, new).commands()]
+
+    results = asyncio.run(scenario())
+    assert all(result['success'] for result in results)
+    assert sorted(npm.installed) == [
+        ('@babel/core', '7.24.0', False),
+        ('@types/node', '^20.1.0', True),
+        ('react', '^18.2.0', False)
+    ]
+
+
+def test_scope_without_version_is_not_split():
+    npm = RecordingNPM()
+    asyncio.run(CommandExecutor(npm, None, None).execute('npm install @types/node'))
+    assert npm.installed == [('@types/node', None, False)]
+
+
+def test_forget_drops_a_projects_manifest_state():
+    async def emit(event, payload, room):
+        pass
+
+    def session(project_id):
+        documents = SimpleNamespace(get=lambda path: SimpleNamespace(content='{}'))
+        return SimpleNamespace(project_id=project_id, documents=documents, room=project_id)
+
+    async def scenario():
+        detector = EnvSyncDetector(emit, debounce=60)
+        detector.touch(session('a'), 'package.json', 'u', 'U')
+        detector.touch(session('b'), 'package.json', 'u', 'U')
+        timer = detector._timers[('a', 'package.json')]
+        detector.forget('a')
+        await asyncio.sleep(0)
+        state = (detector.baselines, detector.editors, detector._timers)
+        result = [sorted(key[0] for key in tracked) for tracked in state], timer.done()
+        detector.forget('b')
+        return result
+
+    remaining, cancelled = asyncio.run(scenario())
+    assert remaining == [['b'], ['b'], ['b']]
+    assert cancelled
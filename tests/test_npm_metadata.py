@@ -0,0 +1,102 @@
+"""
+Tests for the incremental npm packument reader
+"""
+import asyncio
+import json
+
+import pytest
+
+from registry.npm_metadata import JSONStream, read_packument
+
+ABBREVIATED = {
+    'name': 'lib',
+    'modified': '2024-01-01T00:00:00.000Z',
+    'dist-tags': {'latest': '2.0.0', 'next': '3.0.0-rc.1'},
+    'versions': {
+        '1.0.0': {'name': 'lib', 'version': '1.0.0', 'dependencies': {'dep': '^1.0.0'}},
+        '2.0.0': {'name': 'lib', 'version': '2.0.0', 'dist': {'fileCount': 12, 'unpackedSize': 34567.5}},
+        '3.0.0-rc.1': {'name': 'lib', 'version': '3.0.0-rc.1'}
+    }
+}
+
+FULL = {
+    '_id': 'lib',
+    'name': 'lib',
+    'description': 'Ünïcödé — 描述 🚀',
+    'readme': '# lib\n' + 'Long readme with "quotes" and \\ escapes. ' * 200,
+    'maintainers': [{'name': 'someone', 'email': 'a@b.c'}],
+    'time': {'created': '2020-01-01', '1.0.0': '2020-01-02', '2.0.0': '2021-01-01'},
+    'versions': {
+        '1.0.0': {'name': 'lib', 'version': '1.0.0', 'description': 'première'},
+        '2.0.0': {'name': 'lib', 'version': '2.0.0', 'description': 'zweite 😀', 'size': 1e3},
+    },
+    'dist-tags': {'latest': '2.0.0'},
+    'users': {},
+    'score': -1.25e-3
+}
+
+
+def split(data: bytes, size: int):
+    async def chunks():
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+    return chunks()
+
+
+def read(document, size, version=None):
+    data = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    return asyncio.run(read_packument(split(data, size), version))
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 64, 4096])
+def test_abbreviated_document_at_any_chunk_boundary(size):
+    document = read(ABBREVIATED, size, '1.0.0')
+    assert document == {
+        'description': '',
+        'dist-tags': ABBREVIATED['dist-tags'],
+        'versions': {v: ABBREVIATED['versions'][v] for v in ('1.0.0', '2.0.0')}
+    }
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 64, 4096])
+def test_full_document_with_dist_tags_after_versions(size):
+    document = read(FULL, size)
+    assert document == {
+        'description': FULL['description'],
+        'dist-tags': {'latest': '2.0.0'},
+        'versions': {'2.0.0': FULL['versions']['2.0.0']}
+    }
+
+
+def test_unknown_version_keeps_only_latest():
+    assert list(read(ABBREVIATED, 10, '9.9.9')['versions']) == ['2.0.0']
+
+
+@pytest.mark.parametrize('size', [1, 2, 3])
+def test_numbers_split_across_chunks(size):
+    data = b'{"a": 12345, "b": -1.5e+10, "c": 0.25, "d": [7, 80]}'
+
+    async def scenario():
+        stream = JSONStream(split(data, size))
+        return {key: await stream.value() async for key in stream.keys()}
+
+    assert asyncio.run(scenario()) == {'a': 12345, 'b': -1.5e+10, 'c': 0.25, 'd': [7, 80]}
+
+
+def test_multibyte_characters_split_between_chunks():
+    text = 'é描🚀'
+    data = json.dumps({'s': text}, ensure_ascii=False).encode('utf-8')
+    # Every character above is 2, 3 or 4 bytes; one byte per chunk cuts each one up
+    assert len(data) > len(text) + 8
+
+    async def scenario():
+        stream = JSONStream(split(data, 1))
+        return {key: await stream.value() async for key in stream.keys()}
+
+    assert asyncio.run(scenario()) == {'s': text}
+
+
+def test_truncated_document_is_an_error():
+    data = json.dumps(ABBREVIATED).encode('utf-8')[:-10]
+    with pytest.raises(ValueError):
+        asyncio.run(read_packument(split(data, 16)))
@@ -0,0 +1,118 @@
+"""
+Tests for the per-connection event rate limiter
+"""
+import asyncio
+
+import pytest
+
+from transport.ratelimit import EventRateLimiter, RateLimit, TokenBucket, parse_limits
+
+
+def test_parse_limits():
+    limits = parse_limits('cursor_move=30/60, chat_message=5,')
+    assert limits == {'cursor_move': RateLimit(30, 60), 'chat_message': RateLimit(5, 5)}
+
+
+def test_parse_limits_rejects_malformed_entries():
+    with pytest.raises(ValueError):
+        parse_limits('cursor_move')
+
+
+def test_token_bucket_refills_at_rate():
+    limit = RateLimit(rate=2, burst=2)
+    bucket = TokenBucket(limit.burst, now=0)
+    assert bucket.take(limit, 0) == 0
+    assert bucket.take(limit, 0) == 0
+    assert bucket.take(limit, 0) == pytest.approx(0.5)
+    assert bucket.take(limit, 0.5) == 0
+
+
+def make_limiter(**limits):
+    sent = []
+
+    async def notify(sid, error):
+        sent.append((sid, error))
+
+    limiter = EventRateLimiter(
+        {event: RateLimit(*limit) for event, limit in limits.items()},
+        coalesce=('cursor_move',),
+        notify=notify
+    )
+    return limiter, sent
+
+
+def test_rejects_over_limit_and_reports_file():
+    async def scenario():
+        limiter, sent = make_limiter(code_change=(0.001, 1))
+        calls = []
+
+        async def handler(sid, data):
+            calls.append(data)
+            return 'ok'
+
+        wrapped = limiter.instrument('code_change', handler)
+        assert await wrapped('a', {'file': 'x.js'}) == 'ok'
+        error = await wrapped('a', {'file': 'x.js'})
+        # Other connections have their own buckets
+        assert await wrapped('b', {'file': 'x.js'}) == 'ok'
+        return calls, sent, error, limiter
+
+    calls, sent, error, limiter = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert error['error'] == 'rate_limited'
+    assert error['file'] == 'x.js'
+    assert sent == [('a', error)]
+    assert limiter.stats()['rejected'] == {'code_change': 1}
+
+
+def test_coalesced_event_delivers_latest_payload():
+    async def scenario():
+        limiter, sent = make_limiter(cursor_move=(50, 1))
+        calls = []
+
+        async def handler(sid, data):
+            calls.append(data)
+
+        wrapped = limiter.instrument('cursor_move', handler)
+        for line in range(5):
+            await wrapped('a', {'line': line})
+        await asyncio.sleep(0.1)
+        return calls, sent
+
+    calls, sent = asyncio.run(scenario())
+    assert calls == [{'line': 0}, {'line': 4}]
+    assert sent == []
+
+
+def test_forget_cancels_waiting_calls():
+    async def scenario():
+        limiter, _ = make_limiter(cursor_move=(20, 1))
+        calls = []
+
+        async def handler(sid, data):
+            calls.append(data)
+
+        wrapped = limiter.instrument('cursor_move', handler)
+        await wrapped('a', {'line': 0})
+        await wrapped('a', {'line': 1})
+        limiter.forget('a')
+        await asyncio.sleep(0.1)
+        return calls, limiter
+
+    calls, limiter = asyncio.run(scenario())
+    assert calls == [{'line': 0}]
+    assert limiter.deferred == {}
+
+
+def test_charge_spends_another_events_tokens():
+    async def scenario():
+        limiter, sent = make_limiter(terminal_command=(0.001, 1))
+        first = await limiter.charge('a', 'terminal_command', {'input': 'ls'})
+        second = await limiter.charge('a', 'terminal_command', {'input': 'ls'})
+        unlimited = await limiter.charge('a', 'terminal_input', {'input': 'ls'})
+        return first, second, unlimited, sent
+
+    first, second, unlimited, sent = asyncio.run(scenario())
+    assert first is None and unlimited is None
+    assert second['event'] == 'terminal_command'
+    assert sent == [('a', second)]
@@ -0,0 +1,104 @@
+"""
+Tests for the two-tier registry metadata cache
+"""
+import asyncio
+import threading
+import time
+
+from database.db import Database
+from registry import cache as cache_module
+from registry.cache import CachedMetadata, LRUCache, RegistryMetadataCache, SQLiteMetadataStore, cache_key
+
+
+def make_store(tmp_path, ttl=60.0, retention=600.0):
+    database = Database(str(tmp_path / 'flux_ide.db'))
+    database.initialize()
+    store = SQLiteMetadataStore(database, ttl=ttl, retention=retention)
+    store.prepare()
+    return store
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(capacity=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats.evictions == 1
+
+
+def test_lru_expired_entries_are_only_peeked():
+    cache = LRUCache(ttl=60)
+    cache.set('a', 1, stored_at=time.time() - 120)
+    assert cache.get('a') is None
+    assert cache.peek('a') == 1
+    assert cache.stats.expirations == 1
+
+
+def test_disk_hit_is_promoted_with_its_age(tmp_path):
+    store = make_store(tmp_path)
+    first = RegistryMetadataCache(LRUCache(ttl=60), store=store)
+    entry = CachedMetadata({'name': 'left-pad'}, etag='"v1"', fetched_at=time.time() - 30)
+    asyncio.run(first.set('npm', 'left-pad', None, entry))
+
+    # A fresh process: empty memory, same database
+    second = RegistryMetadataCache(LRUCache(ttl=60), store=store)
+    assert asyncio.run(second.get('npm', 'left-pad')) == {'name': 'left-pad'}
+    expires, promoted = second.memory.entries[cache_key('npm', 'left-pad')]
+    assert promoted.etag == '"v1"'
+    assert expires == entry.fetched_at + 60
+
+
+def test_expired_entry_is_still_available_for_revalidation(tmp_path):
+    store = make_store(tmp_path, ttl=60)
+    cache = RegistryMetadataCache(LRUCache(ttl=60), store=store)
+    old = CachedMetadata({'name': 'pkg'}, etag='"v1"', fetched_at=time.time() - 120)
+    asyncio.run(cache.set('npm', 'pkg', '1.0.0', old))
+    cache.memory.clear()
+
+    assert asyncio.run(cache.get('npm', 'pkg', '1.0.0')) is None
+    stale = asyncio.run(cache.stale('npm', 'pkg', '1.0.0'))
+    assert stale.data == {'name': 'pkg'}
+    assert stale.conditional_headers() == {'If-None-Match': '"v1"'}
+
+
+def test_storing_a_package_clears_its_negative_entry():
+    cache = RegistryMetadataCache(LRUCache())
+    cache.set_missing('npm', 'pkg')
+    assert cache.missing('npm', 'pkg')
+    asyncio.run(cache.set('npm', 'pkg', None, CachedMetadata({'name': 'pkg'})))
+    assert not cache.missing('npm', 'pkg')
+
+
+def test_prune_drops_rows_past_retention(tmp_path):
+    store = make_store(tmp_path, ttl=60, retention=600)
+    store.set(cache_key('npm', 'old'), CachedMetadata({}, fetched_at=time.time() - 1200))
+    store.set(cache_key('npm', 'new'), CachedMetadata({}))
+    assert store.prune() == 1
+    assert store.get(cache_key('npm', 'old'), allow_stale=True)[0] is None
+    assert store.get(cache_key('npm', 'new'))[0] is not None
+
+
+def test_disk_events_are_counted_on_the_event_loop(tmp_path, monkeypatch):
+    threads = []
+    monkeypatch.setattr(
+        cache_module.CACHE_EVENTS_TOTAL, 'inc',
+        lambda *labels, amount=1: threads.append(threading.get_ident())
+    )
+    store = make_store(tmp_path, ttl=60)
+    cache = RegistryMetadataCache(LRUCache(capacity=1), store)
+
+    async def scenario():
+        await cache.get('npm', 'pkg')
+        await cache.set('npm', 'pkg', None, CachedMetadata({'name': 'pkg'}))
+        await cache.set('npm', 'other', None, CachedMetadata({'name': 'other'}))
+        # Pushed out of memory, so served from disk
+        return await cache.get('npm', 'pkg')
+
+    assert asyncio.run(scenario()) == {'name': 'pkg'}
+    assert store.stats.hits == 1
+    assert store.stats.misses == 1
+    assert store.stats.writes == 2
+    assert threads and set(threads) == {threading.get_ident()}
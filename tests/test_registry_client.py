@@ -0,0 +1,106 @@
+"""
+Tests for registry fetches against a local stand-in registry
+"""
+import asyncio
+import json
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from dependency.resolver import DependencyResolver
+from package_managers.npm_manager import NPMManager
+from registry.cache import LRUCache, RegistryMetadataCache, cache_key
+from registry.circuit import CircuitBreaker, RegistryUnavailable
+from registry.registry_client import RegistryClient
+
+PACKUMENT = {
+    'name': 'left-pad',
+    'dist-tags': {'latest': '1.3.0'},
+    'versions': {'1.3.0': {'name': 'left-pad', 'version': '1.3.0', 'dependencies': {}}}
+}
+
+
+def stand_in_registry(requests):
+    """npm registry that serves one package with an ETag and answers 304 to a matching If-None-Match"""
+    async def packument(request):
+        requests.append(dict(request.headers))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304, headers={'ETag': '"v1"'})
+        if request.match_info['name'] != 'left-pad':
+            return web.Response(status=404)
+        return web.Response(body=json.dumps(PACKUMENT), content_type='application/json', headers={'ETag': '"v1"'})
+
+    app = web.Application()
+    app.router.add_get('/{name}', packument)
+    return TestServer(app)
+
+
+def test_expired_entry_is_revalidated_with_its_etag():
+    requests = []
+
+    async def scenario():
+        async with stand_in_registry(requests) as server:
+            cache = RegistryMetadataCache(LRUCache(ttl=0.2))
+            client = RegistryClient(cache, npm_url=str(server.make_url('')))
+            try:
+                first = await client.get_package_info('npm', 'left-pad')
+                fetched_at = cache.memory.peek(cache_key('npm', 'left-pad')).fetched_at
+                await asyncio.sleep(0.25)
+
+                second = await client.get_package_info('npm', 'left-pad')
+                renewed = cache.memory.peek(cache_key('npm', 'left-pad'))
+                # Fresh again after the 304, so no request is made
+                third = await client.get_package_info('npm', 'left-pad')
+            finally:
+                await client.close()
+        return first, second, third, fetched_at, renewed
+
+    first, second, third, fetched_at, renewed = asyncio.run(scenario())
+    assert first['version'] == '1.3.0'
+    assert second is first and third is first
+    assert renewed.fetched_at > fetched_at
+    assert renewed.etag == '"v1"'
+    assert len(requests) == 2
+    assert 'If-None-Match' not in requests[0]
+    assert requests[1]['If-None-Match'] == '"v1"'
+
+
+def test_open_circuit_is_not_reported_as_a_missing_package():
+    async def scenario():
+        breaker = CircuitBreaker('npm', failure_threshold=1, base_delay=60)
+        # Nothing listens on this port, so the first fetch fails and opens the circuit
+        client = RegistryClient(breakers={'npm': breaker, 'pypi': CircuitBreaker('pypi')}, npm_url='http://127.0.0.1:9')
+        errors = []
+        try:
+            for _ in range(2):
+                try:
+                    await client.get_package_info('npm', 'left-pad')
+                except RegistryUnavailable as e:
+                    errors.append(str(e))
+            install = await NPMManager(None, client, DependencyResolver(client)).install('left-pad')
+        finally:
+            await client.close()
+        return breaker, errors, install
+
+    breaker, errors, install = asyncio.run(scenario())
+    assert breaker.state == 'open'
+    assert len(errors) == 2
+    assert 'unavailable' in errors[1]
+    assert not install.success
+    assert not any('404' in line for line in install.errors)
+
+
+def test_missing_package_is_still_not_found():
+    requests = []
+
+    async def scenario():
+        async with stand_in_registry(requests) as server:
+            client = RegistryClient(npm_url=str(server.make_url('')))
+            try:
+                return await client.get_package_info('npm', 'no-such-package'), client
+            finally:
+                await client.close()
+
+    info, client = asyncio.run(scenario())
+    assert info is None
+    assert client.cache.missing('npm', 'no-such-package')
@@ -0,0 +1,118 @@
+"""
+Tests for the terminal job scheduler
+"""
+import asyncio
+
+import pytest
+
+from commands.scheduler import JobRejected, JobScheduler
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_limits_and_round_robin():
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=2, max_per_session=1, max_queued_per_session=8)
+        gates = {}
+        order = []
+
+        def job(name):
+            gates[name] = asyncio.Event()
+
+            async def run():
+                order.append(name)
+                await gates[name].wait()
+                return name
+            return run
+
+        a1 = scheduler.submit('a', job('a1'))
+        scheduler.submit('a', job('a2'))
+        scheduler.submit('a', job('a3'))
+        scheduler.submit('b', job('b1'))
+        await settle()
+        assert order == ['a1', 'b1']
+        assert scheduler.stats() == {'running': 2, 'queued': 2, 'sessions': 2}
+
+        gates['a1'].set()
+        assert await a1.task == 'a1'
+        await settle()
+        assert order == ['a1', 'b1', 'a2']
+        for gate in gates.values():
+            gate.set()
+        await asyncio.gather(*(job.task for job in scheduler.jobs()))
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.stats() == {'running': 0, 'queued': 0, 'sessions': 0}
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1, max_per_session=1, max_queued_per_session=1)
+        blocker = asyncio.Event()
+        scheduler.submit('a', blocker.wait)
+        await settle()
+        scheduler.submit('a', blocker.wait)
+        with pytest.raises(JobRejected):
+            scheduler.submit('a', blocker.wait)
+        blocker.set()
+        await asyncio.gather(*(job.task for job in scheduler.jobs()))
+
+    asyncio.run(scenario())
+
+
+def test_job_cancelled_before_its_task_starts_is_released():
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1, max_per_session=1)
+        job = scheduler.submit('a', asyncio.Event().wait, owner='sid')
+        # Cancelled in the same step it was submitted: its coroutine never runs
+        assert scheduler.cancel_owned('sid') == [job]
+        with pytest.raises(asyncio.CancelledError):
+            await job.task
+        state = job.state
+
+        # The slot it was handed is free again
+        follow_up = scheduler.submit('a', lambda: asyncio.sleep(0, 'ok'))
+        return state, await asyncio.wait_for(follow_up.task, 1), scheduler
+
+    state, result, scheduler = asyncio.run(scenario())
+    assert state == 'cancelled'
+    assert result == 'ok'
+    assert scheduler.stats() == {'running': 0, 'queued': 0, 'sessions': 0}
+
+
+def test_cancel_waiting_and_running_jobs():
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1, max_per_session=1)
+        running = scheduler.submit('a', asyncio.Event().wait)
+        waiting = scheduler.submit('a', asyncio.Event().wait)
+        await settle()
+        assert running.state == 'running' and waiting.state == 'queued'
+        scheduler.cancel(waiting)
+        scheduler.cancel(running)
+        await asyncio.gather(running.task, waiting.task, return_exceptions=True)
+        return running, waiting, scheduler
+
+    running, waiting, scheduler = asyncio.run(scenario())
+    assert running.state == waiting.state == 'cancelled'
+    assert not scheduler.cancel(running)
+    assert scheduler.jobs() == []
+
+
+def test_failed_job_frees_its_slot():
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1, max_per_session=1)
+
+        async def boom():
+            raise RuntimeError('boom')
+
+        failed = scheduler.submit('a', boom)
+        after = scheduler.submit('a', lambda: asyncio.sleep(0, 'ok'))
+        with pytest.raises(RuntimeError):
+            await failed.task
+        return failed.state, await asyncio.wait_for(after.task, 1)
+
+    assert asyncio.run(scenario()) == ('failed', 'ok')
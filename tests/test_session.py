@@ -0,0 +1,183 @@
+"""
+Tests for per-project session state
+"""
+import asyncio
+
+from cluster.state import FileStateBackend
+from cluster.workers import WorkerHeartbeat
+import pytest
+
+from collaboration.session import SessionLimitError, SessionRegistry, SessionState
+
+
+def make_session(project_id='p'):
+    return SessionState(project_id, registry_client=None, dependency_resolver=None)
+
+
+def test_roster_changes_report_their_own_version():
+    async def scenario():
+        session = make_session()
+        joins = await asyncio.gather(
+            session.add_user('a', {'name': 'A'}),
+            session.add_user('b', {'name': 'B'})
+        )
+        leave = await session.remove_user('a')
+        return joins, leave, session
+
+    joins, leave, session = asyncio.run(scenario())
+    (user_a, version_a), (user_b, version_b) = joins
+    assert (user_a['role'], user_b['role']) == ('host', 'member')
+    assert sorted([version_a, version_b]) == [1, 2]
+    # The host left, so the role was handed over
+    assert leave == ('b', 3)
+    assert session.roster_version == 3
+    assert session.users['b']['role'] == 'host'
+
+
+def join(registry, sid, project_id):
+    return asyncio.run(registry.join(sid, project_id))
+
+
+def make_worker_session(state):
+    heartbeat = WorkerHeartbeat(state, interval=10, ttl=30)
+    return SessionState('p', None, None, state_backend=state, heartbeat=heartbeat), heartbeat
+
+
+def test_users_of_a_stopped_worker_are_pruned(tmp_path):
+    async def scenario():
+        state = FileStateBackend(str(tmp_path))
+        old, old_heartbeat = make_worker_session(state)
+        await old_heartbeat.start()
+        await old.add_user('host', {'name': 'H'})
+        await old.add_user('member', {'name': 'M'})
+        # The old worker goes away, e.g. a restart
+        await old_heartbeat.stop()
+
+        new, new_heartbeat = make_worker_session(state)
+        await new_heartbeat.start()
+        user, version = await new.add_user('fresh', {'name': 'F'})
+        await new_heartbeat.stop()
+        return user, version, new
+
+    user, version, session = asyncio.run(scenario())
+    assert user['role'] == 'host'
+    # Two joins, the pruning, then this join
+    assert version == 4
+    assert list(session.users) == ['fresh']
+
+
+def test_users_of_live_workers_are_kept(tmp_path):
+    async def scenario():
+        state = FileStateBackend(str(tmp_path))
+        first, first_heartbeat = make_worker_session(state)
+        second, second_heartbeat = make_worker_session(state)
+        await first_heartbeat.start()
+        await second_heartbeat.start()
+        await first.add_user('a', {'name': 'A'})
+        user, _ = await second.add_user('b', {'name': 'B'})
+        new_host, _ = await first.remove_user('a')
+        for heartbeat in (first_heartbeat, second_heartbeat):
+            await heartbeat.stop()
+        return user, new_host, second
+
+    user, new_host, second = asyncio.run(scenario())
+    assert user['role'] == 'member'
+    assert new_host == 'b'
+
+
+def test_expired_leases_are_forgotten(tmp_path):
+    async def scenario():
+        state = FileStateBackend(str(tmp_path))
+        crashed = WorkerHeartbeat(state, interval=10, ttl=30)
+        await crashed.beat()
+        # No clean shutdown: the lease just stops being renewed
+        workers = await state.get(WorkerHeartbeat.KEY)
+        workers[crashed.worker_id] -= 60
+        await state.set(WorkerHeartbeat.KEY, workers)
+
+        alive = WorkerHeartbeat(state, interval=10, ttl=30)
+        await alive.beat()
+        return crashed, alive, await alive.live(), await state.get(WorkerHeartbeat.KEY)
+
+    crashed, alive, live, stored = asyncio.run(scenario())
+    assert live == {alive.worker_id}
+    assert crashed.worker_id not in stored
+
+
+def test_sessions_go_idle_when_their_last_client_leaves():
+    registry = SessionRegistry(make_session, idle_ttl=60)
+    join(registry, 'a', 'p')
+    join(registry, 'b', 'p')
+    registry.leave('a')
+    assert registry.idle(now=float('inf')) == []
+
+    registry.leave('b')
+    left = registry.idle_since['p']
+    assert registry.idle(now=left + 59) == []
+    assert registry.idle(now=left + 60) == ['p']
+
+
+def test_rejoined_session_is_not_evicted():
+    registry = SessionRegistry(make_session, idle_ttl=60)
+    join(registry, 'a', 'p')
+    registry.leave('a')
+    assert 'p' in registry.idle(now=float('inf'))
+    # Someone comes back while the eviction pass is snapshotting
+    join(registry, 'b', 'p')
+    assert registry.evict('p') is None
+    assert 'p' in registry.sessions
+
+
+def test_evicted_session_is_recreated_on_join():
+    registry = SessionRegistry(make_session, idle_ttl=60)
+    first = join(registry, 'a', 'p')
+    registry.leave('a')
+    assert registry.evict('p') is first
+    assert len(registry) == 0
+    assert join(registry, 'b', 'p') is not first
+
+
+def test_zero_ttl_keeps_sessions():
+    registry = SessionRegistry(make_session)
+    join(registry, 'a', 'p')
+    registry.leave('a')
+    assert registry.idle(now=float('inf')) == []
+
+
+def test_join_rejects_bad_project_ids_and_excess_sessions():
+    registry = SessionRegistry(make_session, max_sessions=1)
+    for project_id in ('', '../etc', 'x' * 65, 'with space'):
+        with pytest.raises(ValueError):
+            join(registry, 'a', project_id)
+    join(registry, 'a', 'p')
+    with pytest.raises(SessionLimitError):
+        join(registry, 'b', 'q')
+    # Joining a loaded session is always fine
+    join(registry, 'b', 'p')
+    assert registry.sid_projects == {'a': 'p', 'b': 'p'}
+
+
+def test_rejoining_the_same_project_is_counted_once():
+    registry = SessionRegistry(make_session, idle_ttl=60)
+    first = join(registry, 'a', 'p')
+    assert join(registry, 'a', 'p') is first
+    assert registry.members == {'p': 1}
+
+    registry.leave('a')
+    assert registry.members == {}
+    assert registry.idle(now=float('inf')) == ['p']
+
+
+def test_host_rejoining_keeps_the_host_role():
+    async def scenario():
+        session = make_session()
+        await session.add_user('a', {'name': 'A'})
+        await session.add_user('b', {'name': 'B'})
+        user, _ = await session.add_user('a', {'name': 'A again'})
+        return user, session, await session.has_role('a', 'host')
+
+    user, session, is_host = asyncio.run(scenario())
+    assert user['role'] == 'host'
+    assert session.host == 'a'
+    assert is_host
+    assert session.users['b']['role'] == 'member'
@@ -0,0 +1,96 @@
+"""
+Tests for coalescing concurrent registry fetches
+"""
+import asyncio
+
+import pytest
+
+from registry.singleflight import SingleFlight
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'data'
+
+        results = await asyncio.gather(*(flight.do('pkg', fetch) for _ in range(5)))
+        return results, calls, flight
+
+    results, calls, flight = asyncio.run(scenario())
+    assert results == ['data'] * 5
+    assert calls == [1]
+    assert flight.stats() == {'inFlight': 0, 'started': 1, 'shared': 4}
+
+
+def test_failure_is_shared_and_not_remembered():
+    async def scenario():
+        flight = SingleFlight()
+        attempts = []
+
+        async def fetch():
+            attempts.append(1)
+            await asyncio.sleep(0)
+            if len(attempts) == 1:
+                raise RuntimeError('registry down')
+            return 'data'
+
+        results = await asyncio.gather(flight.do('pkg', fetch), flight.do('pkg', fetch), return_exceptions=True)
+        return results, await flight.do('pkg', fetch)
+
+    results, retried = asyncio.run(scenario())
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert retried == 'data'
+
+
+def test_one_caller_cancelling_leaves_the_call_running():
+    async def scenario():
+        flight = SingleFlight()
+        done = asyncio.Event()
+
+        async def fetch():
+            await done.wait()
+            return 'data'
+
+        first = asyncio.create_task(flight.do('pkg', fetch))
+        second = asyncio.create_task(flight.do('pkg', fetch))
+        await settle()
+        first.cancel()
+        await settle()
+        done.set()
+        return first.cancelled(), await second
+
+    assert asyncio.run(scenario()) == (True, 'data')
+
+
+def test_caller_arriving_after_last_waiter_cancelled_starts_a_new_call():
+    async def scenario():
+        flight = SingleFlight()
+        started = []
+
+        async def fetch():
+            started.append(1)
+            await asyncio.sleep(0.01)
+            return len(started)
+
+        only = asyncio.create_task(flight.do('pkg', fetch))
+        await settle()
+        only.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await only
+        # The cancelled call's done callback has not necessarily run yet
+        late = await flight.do('pkg', fetch)
+        return late, flight
+
+    late, flight = asyncio.run(scenario())
+    assert late == 2
+    assert flight.stats()['inFlight'] == 0
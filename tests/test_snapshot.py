@@ -0,0 +1,102 @@
+"""
+Tests for workspace snapshots
+"""
+import asyncio
+from types import SimpleNamespace
+
+from collaboration.session import SessionRegistry, SessionState
+from collaboration.snapshot import WorkspaceSnapshotter
+
+
+def make_session(project_id='p'):
+    return SessionState(project_id, registry_client=None, dependency_resolver=None)
+
+
+def test_only_changed_sessions_are_captured(tmp_path, monkeypatch):
+    session = make_session()
+    snapshots = WorkspaceSnapshotter(SimpleNamespace(sessions={'p': session}), str(tmp_path))
+    captured = []
+    capture = snapshots.capture
+    monkeypatch.setattr(snapshots, 'capture', lambda s: captured.append(s.project_id) or capture(s))
+
+    assert asyncio.run(snapshots.snapshot_all()) == 1
+    assert asyncio.run(snapshots.snapshot_all()) == 0
+    assert captured == ['p']
+
+    session.documents.apply_content('index.js', 'changed')
+    assert asyncio.run(snapshots.snapshot_all()) == 1
+    session.ai_suggestions.add('a', 'A', None, 'code')
+    assert asyncio.run(snapshots.snapshot_all()) == 1
+    asyncio.run(session.virtual_fs.write_file('new.txt', 'x'))
+    assert asyncio.run(snapshots.snapshot_all()) == 1
+    assert captured == ['p'] * 4
+
+
+def test_touched_session_with_same_content_is_not_rewritten(tmp_path):
+    session = make_session()
+    snapshots = WorkspaceSnapshotter(SimpleNamespace(sessions={'p': session}), str(tmp_path))
+    asyncio.run(snapshots.snapshot_all())
+    session.touch()
+    assert asyncio.run(snapshots.snapshot_all()) == 0
+    assert snapshots.generations['p'] == session.generation
+
+
+def test_restore_round_trip(tmp_path):
+    session = make_session()
+    session.documents.apply_content('index.js', 'restored')
+    suggestion, _ = session.ai_suggestions.add('a', 'A', 'index.js', 'code')
+    session.activity_logs.append({'action': 'edited'})
+    asyncio.run(WorkspaceSnapshotter(SimpleNamespace(sessions={'p': session}), str(tmp_path)).snapshot_all())
+
+    restored = make_session()
+    snapshots = WorkspaceSnapshotter(SimpleNamespace(sessions={'p': restored}), str(tmp_path))
+    assert asyncio.run(snapshots.restore(restored))
+    assert restored.virtual_fs.files['index.js'] == 'restored'
+    assert restored.ai_suggestions.get(suggestion.id) is not None
+    assert restored.activity_logs.seq == session.activity_logs.seq
+    # A freshly restored session is not written straight back
+    assert asyncio.run(snapshots.snapshot_all()) == 0
+
+
+def test_evicted_session_is_restored_on_rejoin(tmp_path):
+    registry = SessionRegistry(make_session, idle_ttl=60)
+    snapshots = WorkspaceSnapshotter(registry, str(tmp_path))
+    registry.restore = snapshots.restore
+
+    async def scenario():
+        session = await registry.join('a', 'p')
+        await session.virtual_fs.write_file('kept.txt', 'still here')
+        registry.leave('a')
+        assert await snapshots.snapshot(session)
+        registry.evict('p')
+        snapshots.forget('p')
+        return await registry.join('b', 'p')
+
+    restored = asyncio.run(scenario())
+    assert restored.virtual_fs.files['kept.txt'] == 'still here'
+
+
+def test_concurrent_joins_share_one_restore(tmp_path):
+    source = make_session()
+    source.documents.apply_content('index.js', 'restored')
+    asyncio.run(WorkspaceSnapshotter(SimpleNamespace(sessions={'p': source}), str(tmp_path)).snapshot_all())
+
+    registry = SessionRegistry(make_session)
+    snapshots = WorkspaceSnapshotter(registry, str(tmp_path))
+    restores = []
+
+    async def restore(session):
+        restores.append(session)
+        return await snapshots.restore(session)
+
+    registry.restore = restore
+
+    async def scenario():
+        return await asyncio.gather(registry.join('a', 'p'), registry.join('b', 'p'))
+
+    first, second = asyncio.run(scenario())
+    assert first is second
+    assert len(restores) == 1
+    assert first.virtual_fs.files['index.js'] == 'restored'
+    assert registry.members == {'p': 2}
+    assert registry.loading == {}
@@ -0,0 +1,53 @@
+"""
+Tests for the AI suggestion store
+"""
+from collaboration.suggestions import SuggestionStore
+
+
+def test_capacity_evicts_oldest_and_reports_it():
+    store = SuggestionStore(capacity=2)
+    first, evicted = store.add('a', 'A', 'x.js', 'one')
+    assert evicted == []
+    store.add('a', 'A', 'x.js', 'two')
+    third, evicted = store.add('a', 'A', 'x.js', 'three')
+    assert evicted == [first.id]
+    assert store.get(first.id) is None
+    assert store.get(third.id) is third
+
+
+def test_votes_are_tallied_incrementally():
+    store = SuggestionStore()
+    suggestion, _ = store.add('a', 'A', None, 'code')
+    store.vote(suggestion.id, 'b', 'reject')
+    store.vote(suggestion.id, 'b', 'approve')
+    assert (suggestion.approvals, suggestion.rejections) == (2, 0)
+    assert store.outcome(suggestion, members=3) == 'approved'
+
+
+def test_rejections_decide_once_a_majority_is_out_of_reach():
+    store = SuggestionStore()
+    suggestion, _ = store.add('a', 'A', None, 'code')
+    store.vote(suggestion.id, 'b', 'reject')
+    assert store.outcome(suggestion, members=4) is None
+    store.vote(suggestion.id, 'c', 'reject')
+    assert store.outcome(suggestion, members=4) == 'rejected'
+
+
+def test_expired_suggestions_are_removed():
+    store = SuggestionStore(ttl=0)
+    suggestion, _ = store.add('a', 'A', None, 'code')
+    assert store.vote(suggestion.id, 'b', 'approve') is None
+    assert store.expire() == [suggestion.id]
+    assert len(store) == 0
+
+
+def test_round_trip_through_list():
+    store = SuggestionStore()
+    suggestion, _ = store.add('a', 'A', 'x.js', 'code', 'desc')
+    store.vote(suggestion.id, 'b', 'reject')
+    restored = SuggestionStore()
+    restored.load(store.to_list())
+    copy = restored.get(suggestion.id)
+    assert (copy.file, copy.code, copy.description) == ('x.js', 'code', 'desc')
+    assert copy.votes == {'a': 'approve', 'b': 'reject'}
+    assert (copy.approvals, copy.rejections) == (1, 1)